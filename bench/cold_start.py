@@ -0,0 +1,105 @@
+"""
+Cold-start cost per Lambda handler: imports each handler module in a fresh
+interpreter (what the Lambda init phase does) and reports the import/init time,
+plus the slowest imports from `python -X importtime`. Clients are created on
+first use (src/py/clients.py), so the time to create the first one is reported
+separately: the first invocation that needs a client pays it instead of init.
+
+    python bench/cold_start.py --runs 10
+    python bench/cold_start.py --handlers search_cut_workflow approve_video --output cold_start.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'py'))
+
+HANDLERS = [
+    'search_cut_workflow',
+    'invoke_search_cut_workflow',
+    'approve_video',
+    'save_embeddings',
+    'batch_search',
+    'embeddings_workflow',
+    'shot_segmentation',
+    'dedup_upload',
+]
+
+MEASURE = """
+import json, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+import clients
+clients.get_client('s3', region_name='us-east-1')
+print(json.dumps({{'import_ms': (imported - started) * 1000, 'first_client_ms': (time.perf_counter() - imported) * 1000}}))
+"""
+
+
+def handler_env() -> dict:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (SRC_DIR, env.get('PYTHONPATH')) if p)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # Handlers read these at import; values only need to be present
+    for name in ('VECTOR_BUCKET_NAME', 'VECTOR_INDEX_NAME', 'EVENT_BUS_NAME', 'SOURCE_BUCKET_NAME',
+                 'SEARCH_CUT_WORKFLOW_FUNCTION_ARN'):
+        env.setdefault(name, 'cold-start')
+    return env
+
+
+def measure_import(module: str, env: dict) -> dict:
+    output = subprocess.run([sys.executable, '-c', MEASURE.format(module=module)], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, env: dict, limit: int) -> list:
+    """Direct imports of the handler module by cumulative -X importtime (microseconds -> ms)."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], env=env, check=True,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # The handler is indented by one space, the modules it imports directly by three
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append({'module': name.strip(), 'ms': round(int(cumulative_us) / 1000, 1)})
+    return sorted(rows, key=lambda r: -r['ms'])[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure handler import (Lambda init) time.")
+    parser.add_argument('--handlers', nargs='*', default=HANDLERS)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help="Slowest direct imports to list per handler")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    env = handler_env()
+    results = {}
+    for module in args.handlers:
+        samples = [measure_import(module, env) for _ in range(args.runs)]
+        import_ms = [s['import_ms'] for s in samples]
+        results[module] = {
+            'import_ms_p50': round(float(np.percentile(import_ms, 50)), 1),
+            'import_ms_max': round(max(import_ms), 1),
+            'first_client_ms_p50': round(float(np.percentile([s['first_client_ms'] for s in samples], 50)), 1),
+            'slowest_imports': slowest_imports(module, env, args.top),
+        }
+        result = results[module]
+        top = ', '.join(f"{r['module']} {r['ms']}ms" for r in result['slowest_imports'])
+        print(f"{module:30s} import p50 {result['import_ms_p50']:8.1f} ms  max {result['import_ms_max']:8.1f} ms"
+              f"  first client {result['first_client_ms_p50']:7.1f} ms  [{top}]")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
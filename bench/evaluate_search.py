@@ -0,0 +1,259 @@
+"""
+Recall / latency evaluation for the search path.
+
+Runs a set of labeled queries against the local engine (a vector snapshot) or
+any query_vectors-compatible client under several configurations and reports,
+per configuration:
+    recall@k     share of expected clips overlapped by one of the top-k results
+    iou@1        temporal IoU of the clip the workflow would cut (top result)
+    p50/p95/p99  search latency in ms (query_vectors + result merging)
+
+Labeled queries (JSONL, one per line):
+    {"query": "a dog catching a frisbee",
+     "expected": [{"s3_uri": "s3://media/park.mp4", "start_time": 35.0, "end_time": 40.0}],
+     "filters": {"tags": ["outdoor"]}}            # optional, SearchFilters shape
+
+Configurations (JSON list); every key is optional:
+    [{"name": "exact", "exact": true},
+     {"name": "ivf-p4", "n_probe": 4, "top_k": 5},
+     {"name": "int8", "snapshot": "/data/snapshot-int8", "rerank_factor": 4},
+     {"name": "pq", "snapshot": "/data/snapshot-pq", "pq_rerank_factor": 16},
+     {"name": "s3vectors", "backend": "s3vectors", "merge_gap_seconds": 1.0}]
+
+Query embeddings are computed once with Bedrock (per dimension) and cached next
+to the labeled queries, so repeated runs only measure search.
+
+    python bench/evaluate_search.py --queries labeled.jsonl --snapshot /data/snapshot --configs configs.json
+
+With --min-recall the run exits non-zero if any configuration's recall@k falls
+below it (compressed indexes trade recall for size; see local_search.PQ_RERANK_FACTOR).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'py'))
+
+from local_search import PQ_RERANK_FACTOR, RERANK_FACTOR, LocalVectorIndex, LocalVectorsClient  # noqa: E402
+from search_filters import build_filter  # noqa: E402
+from vector_search import embed_text, extract_match, query_index  # noqa: E402
+
+DEFAULT_CONFIGS = [
+    {"name": "exact", "exact": True},
+    {"name": "default"},
+]
+
+
+def load_queries(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def interval_iou(a_start: float, a_end: float, b_start: float, b_end: float) -> float:
+    overlap = max(0.0, min(a_end, b_end) - max(a_start, b_start))
+    union = max(a_end, b_end) - min(a_start, b_start)
+    return overlap / union if union > 0 else float(a_start == b_start)
+
+
+def overlaps(match: dict, expected: dict) -> bool:
+    return (match['s3_uri'] == expected['s3_uri']
+            and match['start_time'] <= expected['end_time'] and expected['start_time'] <= match['end_time'])
+
+
+def similarity(match: dict) -> float:
+    # query_vectors returns distances only; S3 Vectors-like stand-ins may add a score
+    if match.get('score') is not None:
+        return match['score']
+    return -match['distance'] if match.get('distance') is not None else 0.0
+
+
+def merge_adjacent(matches: list, gap_seconds: float) -> list:
+    """
+    Joins results from the same source that are at most gap_seconds apart into
+    one clip (keeping the best score), then re-ranks the clips by score.
+    """
+    if gap_seconds is None or gap_seconds < 0:
+        return matches
+    by_source = {}
+    for match in matches:
+        by_source.setdefault(match['s3_uri'], []).append(match)
+    merged = []
+    for source_matches in by_source.values():
+        source_matches.sort(key=lambda m: m['start_time'])
+        current = dict(source_matches[0])
+        for match in source_matches[1:]:
+            if match['start_time'] - current['end_time'] <= gap_seconds:
+                end_time = max(current['end_time'], match['end_time'])
+                if similarity(match) > similarity(current):
+                    current = dict(match, start_time=current['start_time'])
+                current['end_time'] = end_time
+            else:
+                merged.append(current)
+                current = dict(match)
+        merged.append(current)
+    return sorted(merged, key=lambda m: -similarity(m))
+
+
+def score_query(matches: list, expected: list) -> dict:
+    found = sum(1 for e in expected if any(overlaps(m, e) for m in matches))
+    iou = 0.0
+    if matches:
+        top = matches[0]
+        iou = max((interval_iou(top['start_time'], top['end_time'], e['start_time'], e['end_time'])
+                   for e in expected if e['s3_uri'] == top['s3_uri']), default=0.0)
+    return {'recall': found / len(expected) if expected else 1.0, 'iou': iou}
+
+
+def percentiles(latencies_ms: list) -> dict:
+    if not latencies_ms:
+        return {'p50': None, 'p95': None, 'p99': None}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+
+
+class EmbeddingCache:
+    """Query embeddings keyed by dimension and text, persisted as JSON."""
+
+    def __init__(self, path: str, bedrock_runtime=None):
+        self.path = path
+        self.bedrock_runtime = bedrock_runtime
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+        self.dirty = False
+
+    def get(self, text: str, dimension: int) -> list:
+        key = f"{dimension}:{text}"
+        if key not in self.entries:
+            if self.bedrock_runtime is None:
+                raise ValueError(f"No cached embedding for '{text}' and no Bedrock client to compute it")
+            self.entries[key] = embed_text(self.bedrock_runtime, text, dimension)
+            self.dirty = True
+        return self.entries[key]
+
+    def save(self):
+        if self.dirty and self.path:
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+
+
+def evaluate(client, bucket: str, index: str, queries: list, embeddings, dimension: int, config: dict) -> dict:
+    """Runs every labeled query once through query_index and aggregates the scores."""
+    top_k = config.get('top_k', 5)
+    merge_gap = config.get('merge_gap_seconds')
+    # One untimed query first so lazy loading does not land in p99
+    if queries:
+        query_index(client, bucket, index, embeddings.get(queries[0]['query'], dimension), top_k=top_k)
+
+    recalls, ious, latencies, errors = [], [], [], 0
+    for labeled in queries:
+        embedding = embeddings.get(labeled['query'], dimension)
+        filter_expression = build_filter(labeled.get('filters'))
+        started = time.perf_counter()
+        try:
+            vectors = query_index(client, bucket, index, embedding, top_k=top_k, filter_expression=filter_expression)
+            matches = merge_adjacent([extract_match(v) for v in vectors], merge_gap)
+        except Exception as e:
+            print(f"Query '{labeled['query']}' failed: {e}")
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        scores = score_query(matches, labeled.get('expected', []))
+        recalls.append(scores['recall'])
+        ious.append(scores['iou'])
+
+    return {
+        'name': config.get('name'),
+        'config': config,
+        'queries': len(queries),
+        'errors': errors,
+        f'recall@{top_k}': round(float(np.mean(recalls)), 4) if recalls else None,
+        'iou@1': round(float(np.mean(ious)), 4) if ious else None,
+        **percentiles(latencies),
+    }
+
+
+def make_client(config: dict, args, snapshots: dict, s3vectors_client):
+    """Returns (client, bucket, index, dimension) for a configuration."""
+    if config.get('backend', 'local') == 's3vectors':
+        return s3vectors_client(), args.vector_bucket, args.index, config.get('dimension', args.dimension)
+
+    path = config.get('snapshot', args.snapshot)
+    if path not in snapshots:
+        snapshots[path] = LocalVectorIndex.open(path)
+    local_index = snapshots[path]
+    local_index.n_probe = config.get('n_probe', 8)
+    local_index.rerank_factor = config.get('rerank_factor', RERANK_FACTOR)
+    local_index.pq_rerank_factor = config.get('pq_rerank_factor', PQ_RERANK_FACTOR)
+    client = LocalVectorsClient(local_index, exact=config.get('exact', False))
+    return client, None, None, config.get('dimension', local_index.snapshot.dimension)
+
+
+def recall_of(result: dict):
+    return next(v for k, v in result.items() if k.startswith('recall@'))
+
+
+def format_table(results: list) -> str:
+    rows = [['config', 'recall', 'iou@1', 'p50 ms', 'p95 ms', 'p99 ms', 'errors']]
+    for r in results:
+        recall_key = next(k for k in r if k.startswith('recall@'))
+        rows.append([str(r['name']), f"{r[recall_key]} ({recall_key})", str(r['iou@1']),
+                     str(r['p50']), str(r['p95']), str(r['p99']), str(r['errors'])])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure search recall and latency per configuration.")
+    parser.add_argument('--queries', required=True, help="Labeled queries (JSONL)")
+    parser.add_argument('--configs', help="JSON list of configurations (default: exact vs default local search)")
+    parser.add_argument('--snapshot', help="Default local snapshot directory")
+    parser.add_argument('--vector-bucket', default=os.environ.get('VECTOR_BUCKET_NAME'))
+    parser.add_argument('--index', default=os.environ.get('VECTOR_INDEX_NAME'))
+    parser.add_argument('--dimension', type=int, default=1024, help="Query dimension for the s3vectors backend")
+    parser.add_argument('--embedding-cache', help="Embedding cache file (default: <queries>.embeddings.json)")
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    parser.add_argument('--output', help="Write the full report as JSON")
+    parser.add_argument('--min-recall', type=float, help="Fail if any configuration's recall@k is below this")
+    args = parser.parse_args(argv)
+
+    import boto3
+
+    queries = load_queries(args.queries)
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+
+    embeddings = EmbeddingCache(args.embedding_cache or args.queries + '.embeddings.json',
+                                boto3.client('bedrock-runtime', region_name=args.region))
+    s3vectors_client = lambda: boto3.client('s3vectors', region_name=args.region)  # noqa: E731
+    snapshots = {}
+    results = []
+    try:
+        for config in configs:
+            client, bucket, index, dimension = make_client(config, args, snapshots, s3vectors_client)
+            results.append(evaluate(client, bucket, index, queries, embeddings, dimension, config))
+    finally:
+        embeddings.save()
+
+    print(format_table(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.min_recall is not None:
+        below = [r['name'] for r in results if (recall_of(r) or 0.0) < args.min_recall]
+        if below:
+            print(f"recall below {args.min_recall}: {', '.join(map(str, below))}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
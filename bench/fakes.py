@@ -0,0 +1,543 @@
+"""
+Offline stand-ins for the AWS clients used by src/py, for benchmarks on a laptop.
+They implement only the calls (and response shapes) the pipeline uses:
+
+    LocalS3               s3, backed by a directory
+    InMemoryS3Vectors     s3vectors put/get/query/list_vectors
+    DeterministicEmbedder bedrock-runtime invoke_model for text embeddings
+    EventBridgeSink       events put_events
+    LocalDurableService   durable execution backend for the real SDK
+    FakeLambda            lambda invoke + durable callback APIs
+"""
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import replace
+
+import numpy as np
+from aws_durable_execution_sdk_python.execution import (
+    DurableExecutionInvocationInputWithClient,
+    InitialExecutionState,
+)
+from aws_durable_execution_sdk_python.lambda_service import (
+    CallbackDetails,
+    CheckpointOutput,
+    CheckpointUpdatedExecutionState,
+    ContextDetails,
+    ErrorObject,
+    ExecutionDetails,
+    Operation,
+    OperationAction,
+    OperationStatus,
+    OperationType,
+    StateOutput,
+    StepDetails,
+    WaitDetails,
+)
+from botocore.exceptions import ClientError
+
+LIST_PAGE_SIZE = 1000
+META_DIR = '.meta'
+
+
+def _not_found(operation: str, key: str):
+    return ClientError({'Error': {'Code': 'NoSuchKey', 'Message': f"No such key: {key}"}}, operation)
+
+
+class LocalBody:
+    """StreamingBody look-alike over a local file."""
+
+    def __init__(self, path: str, start: int = 0, length: int = None):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = length if length is not None else os.path.getsize(path) - start
+
+    def read(self, amt: int = None) -> bytes:
+        amt = self._remaining if amt is None else min(amt, self._remaining)
+        data = self._file.read(amt)
+        self._remaining -= len(data)
+        return data
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def iter_lines(self, chunk_size: int = 1024 * 1024, keepends: bool = False):
+        pending = b''
+        for chunk in self.iter_chunks(chunk_size):
+            lines = (pending + chunk).splitlines(True)
+            pending = lines.pop() if lines and not lines[-1].endswith(b'\n') else b''
+            for line in lines:
+                yield line if keepends else line.rstrip(b'\r\n')
+        if pending:
+            yield pending
+
+    def close(self):
+        self._file.close()
+
+
+class _Paginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.method(**kwargs, **({'ContinuationToken': token} if token else {}))
+            yield page
+            token = page.get('NextContinuationToken')
+            if not token:
+                return
+
+
+class LocalS3:
+    """
+    S3 client backed by a directory: <root>/<bucket>/<key>. Object tags live
+    under <root>/<bucket>/.meta/ so they never show up in listings.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def _tags_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, META_DIR, key + '.tags.json')
+
+    def _require(self, operation: str, bucket: str, key: str) -> str:
+        path = self._path(bucket, key)
+        if not os.path.isfile(path):
+            raise _not_found(operation, key)
+        return path
+
+    def put_object(self, Bucket, Key, Body=b'', Tagging=None, **_):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(Body, str):
+            Body = Body.encode()
+        with open(path, 'wb') as f:
+            if isinstance(Body, (bytes, bytearray)):
+                f.write(Body)
+            else:
+                shutil.copyfileobj(Body, f)
+        if Tagging:
+            tags = [dict(zip(('Key', 'Value'), pair.split('=', 1) + [''])) for pair in Tagging.split('&')]
+            self.put_object_tagging(Bucket=Bucket, Key=Key, Tagging={'TagSet': tags})
+        return {'ETag': f'"{os.path.getsize(path)}"'}
+
+    def get_object(self, Bucket, Key, Range=None, **_):
+        path = self._require('GetObject', Bucket, Key)
+        size = os.path.getsize(path)
+        start, length = 0, size
+        if Range:
+            first, _, last = Range.replace('bytes=', '').partition('-')
+            start = int(first)
+            length = (int(last) if last else size - 1) - start + 1
+        return {
+            'Body': LocalBody(path, start, length),
+            'ContentLength': length,
+            'LastModified': self._last_modified(path),
+        }
+
+    def head_object(self, Bucket, Key, **_):
+        path = self._require('HeadObject', Bucket, Key)
+        return {'ContentLength': os.path.getsize(path), 'LastModified': self._last_modified(path)}
+
+    @staticmethod
+    def _last_modified(path: str) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(os.path.getmtime(path), tz=datetime.timezone.utc)
+
+    def delete_object(self, Bucket, Key, **_):
+        for path in (self._path(Bucket, Key), self._tags_path(Bucket, Key)):
+            if os.path.exists(path):
+                os.remove(path)
+        return {}
+
+    def put_object_tagging(self, Bucket, Key, Tagging, **_):
+        self._require('PutObjectTagging', Bucket, Key)
+        path = self._tags_path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(Tagging.get('TagSet', []), f)
+        return {}
+
+    def get_object_tagging(self, Bucket, Key, **_):
+        self._require('GetObjectTagging', Bucket, Key)
+        path = self._tags_path(Bucket, Key)
+        if not os.path.exists(path):
+            return {'TagSet': []}
+        with open(path) as f:
+            return {'TagSet': json.load(f)}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=LIST_PAGE_SIZE, **_):
+        bucket_root = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, dirs, files in os.walk(bucket_root):
+            dirs[:] = [d for d in dirs if d != META_DIR]
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), bucket_root).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        start = int(ContinuationToken or 0)
+        page_keys = keys[start:start + MaxKeys]
+        page = {'KeyCount': len(page_keys), 'IsTruncated': start + MaxKeys < len(keys)}
+        if page_keys:
+            page['Contents'] = [{'Key': k, 'Size': os.path.getsize(self._path(Bucket, k))} for k in page_keys]
+        if page['IsTruncated']:
+            page['NextContinuationToken'] = str(start + MaxKeys)
+        return page
+
+    def get_paginator(self, operation_name: str):
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(operation_name)
+        return _Paginator(self.list_objects_v2)
+
+    def upload_file(self, Filename, Bucket, Key, **_):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f)
+
+    def download_file(self, Bucket, Key, Filename, **_):
+        shutil.copyfile(self._require('GetObject', Bucket, Key), Filename)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **_):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj)
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **_):
+        with open(self._require('GetObject', Bucket, Key), 'rb') as f:
+            shutil.copyfileobj(f, Fileobj)
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **_):
+        return 'file://' + os.path.abspath(self._path(Params['Bucket'], Params['Key']))
+
+
+class RecordingS3Vectors:
+    """
+    S3 Vectors stand-in that keeps put_vectors calls in memory and records batch
+    sizes, for ingestion benchmarks.
+    """
+
+    def __init__(self, keep_vectors: bool = False):
+        self.keep_vectors = keep_vectors
+        self.vectors = {}
+        self.batch_sizes = []
+
+    def put_vectors(self, vectorBucketName, indexName, vectors, **_):
+        self.batch_sizes.append(len(vectors))
+        if self.keep_vectors:
+            for vector in vectors:
+                self.vectors[(vectorBucketName, indexName, vector['key'])] = vector
+        return {}
+
+    def get_vectors(self, vectorBucketName, indexName, keys, returnData=False, returnMetadata=False, **_):
+        found = []
+        for key in keys:
+            vector = self.vectors.get((vectorBucketName, indexName, key))
+            if vector is None:
+                continue
+            result = {'key': key}
+            if returnData:
+                result['data'] = vector['data']
+            if returnMetadata:
+                result['metadata'] = dict(vector.get('metadata', {}))
+            found.append(result)
+        return {'vectors': found}
+
+    @property
+    def vector_count(self) -> int:
+        return sum(self.batch_sizes)
+
+
+class InMemoryS3Vectors(RecordingS3Vectors):
+    """
+    S3 Vectors stand-in with brute-force cosine query_vectors (same filter
+    language as the service, via local_search.matches_filter).
+    """
+
+    def __init__(self):
+        super().__init__(keep_vectors=True)
+        self._matrices = {}
+
+    def put_vectors(self, vectorBucketName, indexName, vectors, **kwargs):
+        self._matrices.pop((vectorBucketName, indexName), None)
+        return super().put_vectors(vectorBucketName, indexName, vectors, **kwargs)
+
+    def _matrix(self, bucket: str, index: str):
+        if (bucket, index) not in self._matrices:
+            entries = [v for (b, i, _), v in self.vectors.items() if (b, i) == (bucket, index)]
+            matrix = np.array([e['data']['float32'] for e in entries], dtype=np.float32).reshape(len(entries), -1)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrices[(bucket, index)] = (entries, matrix / np.where(norms == 0, 1, norms))
+        return self._matrices[(bucket, index)]
+
+    def query_vectors(self, vectorBucketName, indexName, queryVector, topK=1, filter=None, returnMetadata=False,
+                      returnDistance=False, **_):
+        from local_search import matches_filter
+
+        entries, matrix = self._matrix(vectorBucketName, indexName)
+        if not entries:
+            return {'vectors': []}
+        query = np.asarray(queryVector['float32'], dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1))
+        results = []
+        for row in np.argsort(-scores, kind='stable'):
+            entry = entries[row]
+            if filter and not matches_filter(entry.get('metadata', {}), filter):
+                continue
+            result = {'key': entry['key']}
+            if returnMetadata:
+                result['metadata'] = dict(entry.get('metadata', {}))
+            if returnDistance:
+                result['distance'] = float(1.0 - scores[row])
+            results.append(result)
+            if len(results) == topK:
+                break
+        return {'vectors': results}
+
+    def list_vectors(self, vectorBucketName, indexName, nextToken=None, maxResults=500, returnData=False,
+                     returnMetadata=False, segmentIndex=None, segmentCount=None, **_):
+        entries, _ = self._matrix(vectorBucketName, indexName)
+        if segmentCount:
+            entries = entries[segmentIndex::segmentCount]
+        start = int(nextToken or 0)
+        page = []
+        for entry in entries[start:start + maxResults]:
+            item = {'key': entry['key']}
+            if returnData:
+                item['data'] = entry['data']
+            if returnMetadata:
+                item['metadata'] = entry.get('metadata', {})
+            page.append(item)
+        response = {'vectors': page}
+        if start + maxResults < len(entries):
+            response['nextToken'] = str(start + maxResults)
+        return response
+
+
+class DeterministicEmbedder:
+    """
+    bedrock-runtime stand-in for Nova SINGLE_EMBEDDING text requests. Known texts
+    (e.g. labeled queries) map to fixed vectors; any other text gets a stable
+    bag-of-words vector seeded from its tokens, so equal queries embed equally.
+    """
+
+    def __init__(self, anchors: dict = None, latency_ms: float = 0.0):
+        self.anchors = anchors or {}
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def embed(self, text: str, dimension: int) -> list:
+        if f"{dimension}:{text}" in self.anchors:
+            return list(self.anchors[f"{dimension}:{text}"])
+        vector = np.zeros(dimension, dtype=np.float64)
+        for token in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(token.encode()).digest()[:8], 'little')
+            vector += np.random.default_rng(seed).normal(size=dimension)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def invoke_model(self, modelId, body, **_):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        params = json.loads(body)['singleEmbeddingParams']
+        embedding = self.embed(params['text']['value'], params['embeddingDimension'])
+        return {'body': io.BytesIO(json.dumps({'embeddings': [{'embedding': embedding}]}).encode())}
+
+
+class EventBridgeSink:
+    """events client stand-in that keeps every PutEvents entry."""
+
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def put_events(self, Entries, **_):
+        with self._lock:
+            self.entries.extend(Entries)
+        return {'FailedEntryCount': 0, 'Entries': [{'EventId': str(uuid.uuid4())} for _ in Entries]}
+
+    def statuses(self) -> list:
+        return [json.loads(e['Detail'])['status'] for e in self.entries]
+
+
+class LocalDurableService:
+    """
+    In-memory durable execution backend for the real SDK (a DurableServiceClient).
+    Checkpoints are applied to a per-execution operation log; waits and step
+    retries become due immediately, and completing a callback re-invokes the
+    execution with its log, like the service does, so replay is exercised too.
+    """
+
+    def __init__(self):
+        self.executions = {}
+        self.invocations = 0
+        self._callbacks = {}
+        self._lock = threading.RLock()
+
+    def start(self, handler, payload: dict) -> str:
+        invocation_id = str(uuid.uuid4())
+        arn = f"arn:aws:lambda:local:000000000000:function:bench:$LATEST/durable-execution/{invocation_id}"
+        # The SDK finds the execution operation (and its input) by the invocation id at the end of the ARN
+        execution_op = Operation(
+            operation_id=invocation_id, operation_type=OperationType.EXECUTION, status=OperationStatus.STARTED,
+            start_timestamp=_now(), execution_details=ExecutionDetails(input_payload=json.dumps(payload)),
+        )
+        self.executions[arn] = {'handler': handler, 'operations': {invocation_id: execution_op}, 'token': 0,
+                                'output': None}
+        self.invoke(arn)
+        return arn
+
+    def invoke(self, arn: str) -> dict:
+        execution = self.executions[arn]
+        while True:
+            self._advance_timers(execution)
+            with self._lock:
+                operations = list(execution['operations'].values())
+                token = str(execution['token'])
+            invocation = DurableExecutionInvocationInputWithClient(
+                durable_execution_arn=arn, checkpoint_token=token,
+                initial_execution_state=InitialExecutionState(operations=operations, next_marker=''),
+                service_client=self,
+            )
+            self.invocations += 1
+            execution['output'] = execution['handler'](invocation, None)
+            if execution['output']['Status'] != 'PENDING' or not self._has_due_timers(execution):
+                return execution['output']
+
+    def status(self, arn: str) -> str:
+        return self.executions[arn]['output']['Status']
+
+    def result(self, arn: str):
+        output = self.executions[arn]['output']
+        return json.loads(output['Result']) if output.get('Result') else None
+
+    def pending_callbacks(self, arn: str) -> list:
+        return [op.callback_details.callback_id for op in self.executions[arn]['operations'].values()
+                if op.operation_type is OperationType.CALLBACK and op.status is OperationStatus.STARTED]
+
+    def complete_callback(self, callback_id: str, result: str = None, error: ErrorObject = None) -> dict:
+        with self._lock:
+            arn, operation_id = self._callbacks.pop(callback_id)
+            execution = self.executions[arn]
+            op = execution['operations'][operation_id]
+            execution['operations'][operation_id] = replace(
+                op, status=OperationStatus.FAILED if error else OperationStatus.SUCCEEDED, end_timestamp=_now(),
+                callback_details=CallbackDetails(callback_id=callback_id, result=result, error=error),
+            )
+        return self.invoke(arn)
+
+    # DurableServiceClient
+
+    def checkpoint(self, durable_execution_arn, checkpoint_token, updates, client_token=None) -> CheckpointOutput:
+        with self._lock:
+            execution = self.executions[durable_execution_arn]
+            changed = [self._apply(durable_execution_arn, execution, update) for update in updates]
+            execution['token'] += 1
+            return CheckpointOutput(checkpoint_token=str(execution['token']),
+                                    new_execution_state=CheckpointUpdatedExecutionState(operations=changed))
+
+    def get_execution_state(self, durable_execution_arn, checkpoint_token, next_marker, max_items=1000) -> StateOutput:
+        with self._lock:
+            return StateOutput(operations=list(self.executions[durable_execution_arn]['operations'].values()))
+
+    def _apply(self, arn: str, execution: dict, update) -> Operation:
+        operations = execution['operations']
+        current = operations.get(update.operation_id)
+        now = _now()
+        op = current or Operation(
+            operation_id=update.operation_id, operation_type=update.operation_type, status=OperationStatus.STARTED,
+            parent_id=update.parent_id, name=update.name, sub_type=update.sub_type, start_timestamp=now,
+        )
+        action, kind = update.action, update.operation_type
+        terminal = {OperationAction.SUCCEED: OperationStatus.SUCCEEDED, OperationAction.FAIL: OperationStatus.FAILED,
+                    OperationAction.CANCEL: OperationStatus.CANCELLED}
+
+        if kind is OperationType.STEP:
+            attempt = op.step_details.attempt if op.step_details else 0
+            if action is OperationAction.RETRY:
+                delay = update.step_options.next_attempt_delay_seconds if update.step_options else 0
+                op = replace(op, status=OperationStatus.PENDING, step_details=StepDetails(
+                    attempt=attempt + 1, next_attempt_timestamp=now + datetime.timedelta(seconds=delay),
+                    result=update.payload, error=update.error))
+            elif action is OperationAction.START:
+                op = replace(op, status=OperationStatus.STARTED, step_details=StepDetails(attempt=attempt))
+            else:
+                op = replace(op, status=terminal[action], end_timestamp=now,
+                             step_details=StepDetails(attempt=attempt, result=update.payload, error=update.error))
+        elif kind is OperationType.WAIT:
+            if action is OperationAction.START:
+                seconds = update.wait_options.wait_seconds if update.wait_options else 1
+                op = replace(op, wait_details=WaitDetails(now + datetime.timedelta(seconds=seconds)))
+            else:
+                op = replace(op, status=terminal[action], end_timestamp=now)
+        elif kind is OperationType.CALLBACK:
+            if action is OperationAction.START:
+                callback_id = str(uuid.uuid4())
+                self._callbacks[callback_id] = (arn, update.operation_id)
+                op = replace(op, callback_details=CallbackDetails(callback_id=callback_id))
+        elif kind is OperationType.CONTEXT:
+            if action is not OperationAction.START:
+                op = replace(op, status=terminal[action], end_timestamp=now,
+                             context_details=ContextDetails(result=update.payload, error=update.error))
+        elif kind is OperationType.EXECUTION:
+            op = replace(op, status=terminal[action], end_timestamp=now)
+        operations[update.operation_id] = op
+        return op
+
+    @staticmethod
+    def _has_due_timers(execution: dict) -> bool:
+        return any(op.status is OperationStatus.PENDING
+                   or (op.operation_type is OperationType.WAIT and op.status is OperationStatus.STARTED)
+                   for op in execution['operations'].values())
+
+    def _advance_timers(self, execution: dict):
+        """Benchmarks skip the clock: due retries become READY and waits complete."""
+        with self._lock:
+            for operation_id, op in list(execution['operations'].items()):
+                if op.status is OperationStatus.PENDING:
+                    execution['operations'][operation_id] = replace(op, status=OperationStatus.READY)
+                elif op.operation_type is OperationType.WAIT and op.status is OperationStatus.STARTED:
+                    execution['operations'][operation_id] = replace(op, status=OperationStatus.SUCCEEDED,
+                                                                    end_timestamp=_now())
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+class FakeLambda:
+    """
+    lambda client stand-in: invoke() starts registered durable handlers on a
+    LocalDurableService, and the durable callback APIs complete callbacks on it.
+    """
+
+    def __init__(self, durable_service: LocalDurableService, functions: dict = None):
+        self.durable_service = durable_service
+        self.functions = functions or {}
+        self.started = []
+
+    def invoke(self, FunctionName, Payload=b'{}', InvocationType='RequestResponse', **_):
+        arn = self.durable_service.start(self.functions[FunctionName], json.loads(Payload))
+        self.started.append(arn)
+        return {'StatusCode': 202 if InvocationType == 'Event' else 200, 'ExecutedVersion': '$LATEST'}
+
+    def send_durable_execution_callback_success(self, CallbackId, Result=None, **_):
+        self.durable_service.complete_callback(CallbackId, result=Result)
+        return {}
+
+    def send_durable_execution_callback_failure(self, CallbackId, Error=None, **_):
+        error = ErrorObject.from_dict(Error) if Error else ErrorObject.from_message("Callback failed")
+        self.durable_service.complete_callback(CallbackId, error=error)
+        return {}
@@ -0,0 +1,97 @@
+"""
+Runs save_embeddings.lambda_handler over synthetic jobs (bench/synthetic_embeddings.py)
+with its S3 and S3 Vectors clients swapped for local stand-ins, and reports
+throughput, memory and put_vectors batching.
+
+    python bench/synthetic_embeddings.py --root /tmp/s3 --videos 500
+    python bench/ingest_benchmark.py --root /tmp/s3
+"""
+import argparse
+import collections
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src', 'py'))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import LocalS3, RecordingS3Vectors  # noqa: E402
+
+
+def load_save_embeddings(bucket: str):
+    """Imports save_embeddings with the environment its Lambda would have."""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ['SOURCE_BUCKET_NAME'] = bucket
+    os.environ.setdefault('VECTOR_BUCKET_NAME', 'bench-vectors')
+    os.environ.setdefault('VECTOR_INDEX_NAME', 'bench-index')
+    import save_embeddings
+    save_embeddings.SOURCE_BUCKET_NAME = bucket
+    return save_embeddings
+
+
+def run(root: str, bucket: str, limit: int = None) -> dict:
+    with open(os.path.join(root, 'events.json')) as f:
+        events = json.load(f)[:limit]
+
+    save_embeddings = load_save_embeddings(bucket)
+    s3 = LocalS3(root)
+    vectors = RecordingS3Vectors()
+    save_embeddings.s3_client = s3
+    save_embeddings.s3_vectors_client = vectors
+    save_embeddings.logger.setLevel('WARNING')
+
+    input_bytes = sum(obj['Size'] for event in events
+                      for page in s3.get_paginator('list_objects_v2').paginate(
+                          Bucket=bucket, Prefix=event['S3Uri'].split(f"s3://{bucket}/", 1)[1])
+                      for obj in page.get('Contents', []))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    per_job_ms = []
+    for event in events:
+        job_started = time.perf_counter()
+        save_embeddings.lambda_handler(event, None)
+        per_job_ms.append((time.perf_counter() - job_started) * 1000)
+    elapsed = time.perf_counter() - started
+    _, peak_python_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_job_ms.sort()
+    return {
+        'jobs': len(events),
+        'vectors': vectors.vector_count,
+        'input_mb': round(input_bytes / 1e6, 1),
+        'seconds': round(elapsed, 2),
+        'vectors_per_second': round(vectors.vector_count / elapsed, 1) if elapsed else None,
+        'mb_per_second': round(input_bytes / 1e6 / elapsed, 2) if elapsed else None,
+        'job_ms_p50': round(per_job_ms[len(per_job_ms) // 2], 1) if per_job_ms else None,
+        'job_ms_max': round(per_job_ms[-1], 1) if per_job_ms else None,
+        'peak_python_mb': round(peak_python_bytes / 1e6, 1),
+        # ru_maxrss is KiB on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'put_vectors_calls': len(vectors.batch_sizes),
+        'batch_sizes': dict(sorted(collections.Counter(vectors.batch_sizes).items())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark save_embeddings against synthetic jobs.")
+    parser.add_argument('--root', required=True, help="Directory written by synthetic_embeddings.py")
+    parser.add_argument('--bucket', default='media-bucket')
+    parser.add_argument('--limit', type=int, help="Only ingest the first N jobs")
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.root, args.bucket, args.limit)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
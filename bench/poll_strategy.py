@@ -0,0 +1,59 @@
+"""
+Simulates polling of Bedrock async embedding jobs: the state machine's fixed
+30 s Wait loop against embeddings_workflow's duration-seeded schedule. Job
+times are the workflow's estimate scaled by log-normal noise; reports how long
+a finished job waits to be noticed (the ingestion gap) and how many polls it
+takes.
+
+    python bench/poll_strategy.py --durations 30 300 3600 --spread 0.5
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'py'))
+
+from embeddings_workflow import expected_job_seconds, poll_delay_seconds  # noqa: E402
+
+FIXED_WAIT_SECONDS = 30
+
+
+def fixed_polls(job_seconds: float) -> (float, int):
+    """generate_embeddings.asl.json: Wait 30 s, then GetAsyncInvoke."""
+    polls = int(np.ceil(job_seconds / FIXED_WAIT_SECONDS))
+    return polls * FIXED_WAIT_SECONDS - job_seconds, polls
+
+
+def seeded_polls(job_seconds: float, expected_seconds: float) -> (float, int):
+    """embeddings_workflow: a poll right after the start, then poll_delay_seconds."""
+    now, polls = 0.0, 1
+    while now < job_seconds:
+        now += poll_delay_seconds(now, expected_seconds)
+        polls += 1
+    return now - job_seconds, polls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare async-invoke polling strategies.")
+    parser.add_argument('--durations', type=float, nargs='*', default=[30, 120, 600, 3600], help="Video seconds")
+    parser.add_argument('--spread', type=float, default=0.5, help="Sigma of the log-normal job time noise")
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'video s':>8} {'expected s':>10} | {'fixed gap p50/p95':>18} {'polls':>6} | {'seeded gap p50/p95':>20} {'polls':>6}")
+    for duration in args.durations:
+        expected = expected_job_seconds(duration)
+        jobs = expected * rng.lognormal(0.0, args.spread, size=args.jobs)
+        fixed = np.array([fixed_polls(j) for j in jobs])
+        seeded = np.array([seeded_polls(j, expected) for j in jobs])
+        print(f"{duration:8.0f} {expected:10.0f} | "
+              f"{np.percentile(fixed[:, 0], 50):8.1f} / {np.percentile(fixed[:, 0], 95):6.1f} {fixed[:, 1].mean():6.1f} | "
+              f"{np.percentile(seeded[:, 0], 50):10.1f} / {np.percentile(seeded[:, 0], 95):6.1f} {seeded[:, 1].mean():6.1f}")
+
+
+if __name__ == '__main__':
+    main()
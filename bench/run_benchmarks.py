@@ -0,0 +1,275 @@
+"""
+Offline end-to-end benchmarks for the Lambda hot paths.
+
+The handlers in src/py hold their boto3 clients in module attributes (lazy, see
+clients.py); this suite imports them unchanged and swaps those for the local stand-ins in
+bench/fakes.py (filesystem S3, in-memory S3 Vectors, deterministic embedder,
+EventBridge sink, durable-execution service), then times:
+
+    ingestion  save_embeddings.lambda_handler per synthetic Bedrock job
+    search     search_cut_workflow.search_video_step (embed + query + match)
+    cut        video_cut.cut_clip on a generated test video (needs ffmpeg)
+    approval   invoke -> durable workflow -> WAITING_FOR_APPROVAL, then
+               approve_video -> callback -> replay -> COMPLETED (needs ffmpeg)
+
+Workloads are seeded, so two runs on the same machine are comparable. Compare a
+run against a previous report to spot regressions between commits:
+
+    python bench/run_benchmarks.py --output before.json
+    git checkout feature && python bench/run_benchmarks.py --baseline before.json --output after.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src', 'py')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import (  # noqa: E402
+    DeterministicEmbedder, EventBridgeSink, FakeLambda, InMemoryS3Vectors, LocalDurableService, LocalS3,
+)
+from synthetic_embeddings import generate  # noqa: E402
+
+BUCKET = 'bench-media'
+WORKFLOW_FUNCTION = 'bench-search-cut-workflow'
+# Latency percentiles compared against the baseline
+COMPARED_STATS = ('p50', 'p95')
+
+
+class StepContextStub:
+    """What durable steps read from their StepContext."""
+    logger = logging.getLogger('bench.step')
+
+
+def summarize(latencies_ms: list, **extra) -> dict:
+    if not latencies_ms:
+        return {'count': 0, **extra}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'count': len(latencies_ms),
+        'mean': round(float(np.mean(latencies_ms)), 3),
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        **extra,
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def make_test_video(ffmpeg: str, path: str, duration: float):
+    subprocess.check_call([
+        ffmpeg, '-v', 'error', '-f', 'lavfi', '-i', f'testsrc=size=640x360:rate=25:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-g', '50', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', '-y', path,
+    ])
+
+
+class Bench:
+    """Imports the handlers once and wires every module-level client to the fakes."""
+
+    def __init__(self, root: str, ffmpeg: str, bedrock_latency_ms: float):
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        os.environ.update({
+            'SOURCE_BUCKET_NAME': BUCKET,
+            'VECTOR_BUCKET_NAME': 'bench-vectors',
+            'VECTOR_INDEX_NAME': 'bench-index',
+            'EVENT_BUS_NAME': 'bench-bus',
+            'SEARCH_CUT_WORKFLOW_FUNCTION_ARN': WORKFLOW_FUNCTION,
+        })
+        if ffmpeg:
+            os.environ['FFMPEG_PATH'] = ffmpeg
+        for name in ('INFLIGHT_TABLE_NAME', 'LOCAL_SNAPSHOT_URI'):
+            os.environ.pop(name, None)
+
+        import approve_video
+        import invoke_search_cut_workflow
+        import save_embeddings
+        import search_cut_workflow
+        import video_cut
+
+        self.s3 = LocalS3(root)
+        self.vectors = InMemoryS3Vectors()
+        self.embedder = DeterministicEmbedder(latency_ms=bedrock_latency_ms)
+        self.events = EventBridgeSink()
+        self.durable = LocalDurableService()
+        self.lambda_client = FakeLambda(self.durable, {WORKFLOW_FUNCTION: search_cut_workflow.lambda_handler})
+
+        save_embeddings.SOURCE_BUCKET_NAME = BUCKET
+        save_embeddings.s3_client = self.s3
+        save_embeddings.s3_vectors_client = self.vectors
+        search_cut_workflow.s3_client = self.s3
+        search_cut_workflow.s3_vectors = self.vectors
+        search_cut_workflow.bedrock_runtime = self.embedder
+        search_cut_workflow.event_emitter.events_client = self.events
+        invoke_search_cut_workflow.lambda_client = self.lambda_client
+        # Coalescing works across the two handlers as it would with the shared table
+        invoke_search_cut_workflow.lock_store = search_cut_workflow.lock_store
+        approve_video.lambda_client = self.lambda_client
+
+        self.save_embeddings = save_embeddings
+        self.search_cut_workflow = search_cut_workflow
+        self.invoke = invoke_search_cut_workflow
+        self.approve = approve_video
+        self.video_cut = video_cut
+
+    def ingestion(self, events: list) -> dict:
+        latencies = [timed(self.save_embeddings.lambda_handler, event, None)[1] for event in events]
+        return summarize(latencies, vectors=self.vectors.vector_count, put_vectors_calls=len(self.vectors.batch_sizes))
+
+    def search(self, queries: list, repeat: int) -> (dict, list):
+        latencies, hits, matches = [], 0, []
+        for _ in range(repeat):
+            for labeled in queries:
+                step = self.search_cut_workflow.search_video_step(labeled['query'])
+                match, ms = timed(step, StepContextStub())
+                latencies.append(ms)
+                expected = labeled['expected'][0]
+                hits += (match['s3_uri'] == expected['s3_uri']
+                         and match['start_time'] < expected['end_time'] and expected['start_time'] < match['end_time'])
+                matches.append(match)
+        total = len(queries) * repeat
+        return summarize(latencies, recall_at_1=round(hits / total, 4) if total else None), matches
+
+    def cut(self, matches: list) -> dict:
+        latencies, phases = [], {}
+        for i, match in enumerate(matches):
+            result, ms = timed(self.video_cut.cut_clip, self.s3, match, f"cuts/bench/{i}_cut.mp4")
+            latencies.append(ms)
+            for phase, phase_ms in result['timings'].items():
+                phases.setdefault(phase, []).append(phase_ms)
+        return summarize(latencies, phases={p: summarize(v)['p50'] for p, v in phases.items()})
+
+    def approval(self, queries: list) -> dict:
+        to_waiting, to_completed, completed = [], [], 0
+        for labeled in queries:
+            sent_before = len(self.events.entries)
+            started = time.perf_counter()
+            request_id = self.invoke.handler({'arguments': {'text': labeled['query']}}, None)
+            to_waiting.append((time.perf_counter() - started) * 1000)
+
+            waiting = [json.loads(e['Detail']) for e in self.events.entries[sent_before:]]
+            waiting = [d for d in waiting if d['status'] == 'WAITING_FOR_APPROVAL' and d['requestId'] == request_id]
+            if not waiting:
+                continue
+            _, ms = timed(self.approve.handler, {'arguments': {
+                'status': 'APPROVED', 'callbackId': waiting[-1]['callbackId'], 'message': 'bench'}}, None)
+            to_completed.append(ms)
+            arn = self.lambda_client.started[-1]
+            completed += self.durable.status(arn) == 'SUCCEEDED'
+        return {
+            'start_to_waiting': summarize(to_waiting),
+            'approval_to_completed': summarize(to_completed, completed=completed),
+            'durable_invocations': self.durable.invocations,
+        }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Returns (workload, stat, baseline, current, change) rows, flagging slowdowns above threshold."""
+    rows = []
+
+    def walk(current: dict, previous: dict, path: str):
+        for key, value in current.items():
+            if isinstance(value, dict) and isinstance(previous.get(key), dict):
+                walk(value, previous[key], f"{path}.{key}" if path else key)
+            elif key in COMPARED_STATS and previous.get(key):
+                change = (value - previous[key]) / previous[key]
+                rows.append((path, key, previous[key], value, change, change > threshold))
+
+    walk(report['workloads'], baseline.get('workloads', {}), '')
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline end-to-end benchmarks.")
+    parser.add_argument('--videos', type=int, default=50)
+    parser.add_argument('--duration', type=float, nargs=2, default=[60, 300], metavar=('MIN', 'MAX'))
+    parser.add_argument('--queries', type=int, default=20, help="Labeled queries for search/cut/approval")
+    parser.add_argument('--search-repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bedrock-latency-ms', type=float, default=0.0, help="Simulated embedding latency")
+    parser.add_argument('--ffmpeg', default=shutil.which('ffmpeg'), help="ffmpeg binary (cut/approval are skipped without it)")
+    parser.add_argument('--workdir', help="Keep the local S3 here instead of a temporary directory")
+    parser.add_argument('--log', default=os.devnull, help="Where handler output goes")
+    parser.add_argument('--output', help="Write the report as JSON")
+    parser.add_argument('--baseline', help="Previous report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    root = args.workdir or tempfile.mkdtemp(prefix='bench-')
+    bench = Bench(root, args.ffmpeg, args.bedrock_latency_ms)
+    jobs, queries, query_embeddings, stats = generate(
+        bench.s3, BUCKET, args.videos, args.duration[0], args.duration[1], 5.0, 1000, 1024, 64, 0.5, args.seed,
+        labeled_queries=args.queries)
+    bench.embedder.anchors.update(query_embeddings)
+
+    if args.ffmpeg:
+        video_path = os.path.join(root, 'test_video.mp4')
+        make_test_video(args.ffmpeg, video_path, args.duration[1])
+        for job in jobs:
+            bench.s3.upload_file(video_path, BUCKET, job['mediaFileUri'].split(f"s3://{BUCKET}/", 1)[1])
+
+    workloads = {}
+    with open(args.log, 'a') as log, contextlib.redirect_stdout(log):
+        workloads['ingestion'] = bench.ingestion(jobs)
+        workloads['search'], matches = bench.search(queries, args.search_repeat)
+        if args.ffmpeg:
+            workloads['cut'] = bench.cut(matches[:len(queries)])
+            workloads['approval'] = bench.approval(queries)
+        bench.search_cut_workflow.event_emitter.flush()
+
+    report = {
+        'revision': git_revision(),
+        'created_at': datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'log', 'workdir')},
+        'data': stats,
+        'workloads': workloads,
+        'skipped': [] if args.ffmpeg else ['cut', 'approval (ffmpeg not found)'],
+    }
+    print(json.dumps(report['workloads'], indent=2))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {baseline.get('revision')} ({baseline.get('created_at')}):")
+        for path, stat, before, after, change, regressed in compare(report, baseline, args.threshold):
+            flag = '  REGRESSION' if regressed else ''
+            print(f"  {path:40s} {stat}: {before:10.3f} -> {after:10.3f} ms ({change:+.1%}){flag}")
+            if regressed:
+                regressions.append(f"{path}.{stat}")
+        report['regressions'] = regressions
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
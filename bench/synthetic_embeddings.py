@@ -0,0 +1,157 @@
+"""
+Synthetic Bedrock SEGMENTED_EMBEDDING output for load tests.
+
+Writes one job per video into a local S3 stand-in (bench/fakes.LocalS3), laid
+out like the async-invoke output that save_embeddings.py reads:
+
+    <root>/<bucket>/<media-prefix>video-00042.mp4              placeholder source, tagged
+    <root>/<bucket>/<output-prefix>job-00042/output-00000.jsonl {"id", "embedding", "segmentMetadata"}
+
+Vectors are clustered: every video draws a few topics from a shared set of
+centroids and drifts between them over time, so neighbouring segments are
+similar and different videos share topics, roughly like real footage.
+
+events.json lists one save_embeddings event per job ({"S3Uri", "mediaFileUri"}).
+With --labeled-queries the generator also writes queries for
+bench/evaluate_search.py (with their embeddings pre-cached).
+
+    python bench/synthetic_embeddings.py --root /tmp/s3 --videos 1000 --duration 60 600 --shard-lines 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import LocalS3  # noqa: E402
+
+TAG_CHOICES = ['outdoor', 'indoor', 'sports', 'news', 'interview', 'night', 'crowd']
+
+
+class EmbeddingModel:
+    """Clustered unit vectors: topic centroid + slow drift + per-segment noise."""
+
+    def __init__(self, dimension: int, clusters: int, noise: float, seed: int):
+        self.dimension = dimension
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.centroids = self._normalize(self.rng.normal(size=(clusters, dimension)).astype(np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+    def video(self, segments: int, topics_per_video: int = 3) -> np.ndarray:
+        topics = self.rng.choice(len(self.centroids), size=min(topics_per_video, len(self.centroids)), replace=False)
+        # Scene changes every few segments; within a scene the topic mix drifts slowly
+        scene = np.cumsum(self.rng.random(segments) < 0.15)
+        weights = self.rng.dirichlet(np.ones(len(topics)), size=scene[-1] + 1)[scene]
+        base = weights @ self.centroids[topics]
+        # Mean-reverting drift: consecutive segments stay close without wandering off
+        steps = self.rng.normal(scale=0.3, size=(segments, self.dimension))
+        drift = np.empty_like(steps)
+        drift[0] = steps[0]
+        for t in range(1, segments):
+            drift[t] = 0.9 * drift[t - 1] + steps[t]
+        noise = self.rng.normal(scale=self.noise, size=(segments, self.dimension))
+        return self._normalize(base + (drift + noise) / np.sqrt(self.dimension)).astype(np.float32)
+
+    def query_near(self, vector: np.ndarray, noise: float) -> np.ndarray:
+        jitter = self.rng.normal(scale=noise / np.sqrt(self.dimension), size=self.dimension)
+        return self._normalize(vector + jitter).astype(np.float32)
+
+
+def jsonl_lines(job_id: str, shard: int, vectors: np.ndarray, first_segment: int, segment_seconds: float):
+    for offset, vector in enumerate(vectors):
+        start = (first_segment + offset) * segment_seconds
+        yield json.dumps({
+            'id': f"{job_id}-{shard:05d}",
+            'embedding': np.round(vector.astype(np.float64), 6).tolist(),
+            'segmentMetadata': {'segmentStartSeconds': start, 'segmentEndSeconds': start + segment_seconds},
+        }) + '\n'
+
+
+def generate(s3, bucket: str, videos: int, min_duration: float, max_duration: float, segment_seconds: float,
+             shard_lines: int, dimension: int, clusters: int, noise: float, seed: int,
+             media_prefix: str = 'media/', output_prefix: str = 'embeddings/', labeled_queries: int = 0):
+    """Writes the jobs and returns (events, labeled queries, query embeddings, stats)."""
+    model = EmbeddingModel(dimension, clusters, noise, seed)
+    rng = np.random.default_rng(seed + 1)
+    query_videos = set(rng.choice(videos, size=min(labeled_queries, videos), replace=False).tolist())
+    events, queries, query_embeddings = [], [], {}
+    stats = {'videos': videos, 'segments': 0, 'files': 0, 'bytes': 0}
+
+    for n in range(videos):
+        media_key = f"{media_prefix}video-{n:05d}.mp4"
+        tags = rng.choice(TAG_CHOICES, size=int(rng.integers(0, 3)), replace=False)
+        s3.put_object(Bucket=bucket, Key=media_key, Body=b'\0' * 1024,
+                      Tagging='&'.join(f"{t}=true" for t in tags) or None)
+        media_uri = f"s3://{bucket}/{media_key}"
+
+        job_id = f"job-{n:05d}"
+        job_prefix = f"{output_prefix}{job_id}/"
+        segments = max(1, int(rng.uniform(min_duration, max_duration) // segment_seconds))
+        vectors = model.video(segments)
+        for shard, first in enumerate(range(0, segments, shard_lines)):
+            body = ''.join(jsonl_lines(job_id, shard, vectors[first:first + shard_lines], first, segment_seconds))
+            s3.put_object(Bucket=bucket, Key=f"{job_prefix}output-{shard:05d}.jsonl", Body=body)
+            stats['files'] += 1
+            stats['bytes'] += len(body)
+        stats['segments'] += segments
+        events.append({'S3Uri': f"s3://{bucket}/{job_prefix}", 'mediaFileUri': media_uri})
+
+        if n in query_videos:
+            segment = int(rng.integers(segments))
+            text = f"synthetic query {len(queries)}"
+            queries.append({
+                'query': text,
+                'expected': [{'s3_uri': media_uri, 'start_time': segment * segment_seconds,
+                              'end_time': (segment + 1) * segment_seconds}],
+            })
+            query_embeddings[f"{dimension}:{text}"] = model.query_near(vectors[segment], noise * 2).tolist()
+
+    return events, queries, query_embeddings, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic segmented-embedding JSONL into a local S3.")
+    parser.add_argument('--root', required=True, help="Directory backing the local S3 stand-in")
+    parser.add_argument('--bucket', default='media-bucket')
+    parser.add_argument('--videos', type=int, default=100)
+    parser.add_argument('--duration', type=float, nargs=2, default=[60, 600], metavar=('MIN', 'MAX'),
+                        help="Video duration range in seconds")
+    parser.add_argument('--segment-seconds', type=float, default=5)
+    parser.add_argument('--shard-lines', type=int, default=1000, help="Segments per JSONL file")
+    parser.add_argument('--dimension', type=int, default=1024)
+    parser.add_argument('--clusters', type=int, default=64, help="Shared topic centroids")
+    parser.add_argument('--noise', type=float, default=0.5, help="Per-segment noise relative to the topic signal")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--labeled-queries', type=int, default=0, help="Also write N labeled queries")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    s3 = LocalS3(args.root)
+    events, queries, query_embeddings, stats = generate(
+        s3, args.bucket, args.videos, args.duration[0], args.duration[1], args.segment_seconds, args.shard_lines,
+        args.dimension, args.clusters, args.noise, args.seed, labeled_queries=args.labeled_queries)
+
+    with open(os.path.join(args.root, 'events.json'), 'w') as f:
+        json.dump(events, f, indent=1)
+    if queries:
+        queries_path = os.path.join(args.root, 'labeled_queries.jsonl')
+        with open(queries_path, 'w') as f:
+            f.writelines(json.dumps(q) + '\n' for q in queries)
+        with open(queries_path + '.embeddings.json', 'w') as f:
+            json.dump(query_embeddings, f)
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {stats['segments']} segments for {stats['videos']} videos in {stats['files']} files "
+          f"({stats['bytes'] / 1e6:.1f} MB) to {args.root}/{args.bucket} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
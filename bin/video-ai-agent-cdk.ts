@@ -17,4 +17,5 @@ new SearchWorkflowStack(app, 'SearchWorkflowStack', {
   vectorBucketName: mainStack.appSyncConstruct.vectorBucketName,
   vectorIndexName: mainStack.appSyncConstruct.vectorIndexName,
   eventBusName: mainStack.appSyncConstruct.eventBusName,
+  inflightTableName: mainStack.appSyncConstruct.inflightTableName,
 });
@@ -14,6 +14,9 @@ const onVideoStatusUpdate = /* GraphQL */ `
       message
       callbackId
       videoUrl
+      streamUrl
+      thumbnailUrl
+      previewUrl
     }
   }
 `;
@@ -30,12 +33,22 @@ const approveMutation = /* GraphQL */ `
   }
 `;
 
+// HLS previews (streamUrl) are published while the clip is still being cut; browsers
+// without native HLS playback wait for the MP4 (videoUrl)
+const canPlayHls = typeof document !== 'undefined' &&
+  document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== ''
+
+const playbackUrl = (video: VideoStatus) => (canPlayHls && video.streamUrl) || video.videoUrl
+
 export function VideoFeed() {
   const client = generateClient()
   const [query, setQuery] = useState('')
   const [searching, setSearching] = useState(false)
   const [results, setResults] = useState<VideoStatus[]>([])
   const [activeVideo, setActiveVideo] = useState<string | null>(null)
+  // Execution serving the current search (identical searches share one, so its events may arrive first)
+  const [requestId, setRequestId] = useState<string | null>(null)
+  const visible = results.filter(video => video.requestId === requestId)
   
   // Subscribe to updates
   useEffect(() => {
@@ -46,11 +59,12 @@ export function VideoFeed() {
         const update = data.onVideoStatusUpdate as VideoStatus;
         if(update) {
             setResults(prev => {
-                 if (update.videoUrl) {
-                    if (prev.find(p => p.videoUrl === update.videoUrl)) return prev;
-                    return [update, ...prev]
+                if (prev.some(p => p.requestId === update.requestId)) {
+                    // Later updates of a request (e.g. STREAMING -> WAITING_FOR_APPROVAL) keep its URLs
+                    const fields = Object.fromEntries(Object.entries(update).filter(([, value]) => value != null))
+                    return prev.map(p => p.requestId === update.requestId ? { ...p, ...fields } : p)
                 }
-                return prev;
+                return playbackUrl(update) ? [update, ...prev] : prev
             })
         }
       },
@@ -66,12 +80,14 @@ export function VideoFeed() {
 
     setSearching(true)
     setResults([]) 
+    setRequestId(null)
     
     try {
-      await client.graphql({
+      const response = await client.graphql({
         query: searchMutation,
         variables: { text: query }
-      });
+      }) as any;
+      setRequestId(response.data?.search ?? null)
     } catch (err) {
       console.error("Search failed:", err)
     } finally {
@@ -130,14 +146,31 @@ export function VideoFeed() {
           <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-[hsl(var(--primary))]"></div>
           <p className="text-[hsl(var(--muted-foreground))] font-medium italic">NovaAgent is searching for relevant context...</p>
         </div>
-      ) : results.length > 0 ? (
+      ) : visible.length > 0 ? (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-          {results.map((video, idx) => (
+          {visible.map((video, idx) => (
             <Card key={idx} className="group overflow-hidden cursor-pointer hover:shadow-md transition-shadow">
-              <div className="relative aspect-video bg-[hsl(var(--secondary))] overflow-hidden" onClick={() => video.videoUrl && setActiveVideo(video.videoUrl)}>
-                {video.videoUrl ? (
+              <div className="relative aspect-video bg-[hsl(var(--secondary))] overflow-hidden" onClick={() => playbackUrl(video) && setActiveVideo(playbackUrl(video)!)}>
+                {video.thumbnailUrl ? (
+                    <>
+                        {/* Sprite sheet of the clip; the animated preview plays on hover */}
+                        <img
+                            src={video.thumbnailUrl}
+                            alt="Clip thumbnails"
+                            className="w-full h-full object-contain"
+                        />
+                        {video.previewUrl && (
+                            <img
+                                src={video.previewUrl}
+                                alt="Clip preview"
+                                loading="lazy"
+                                className="absolute inset-0 w-full h-full object-contain bg-black opacity-0 group-hover:opacity-100 transition-opacity"
+                            />
+                        )}
+                    </>
+                ) : playbackUrl(video) ? (
                     <video 
-                        src={video.videoUrl} 
+                        src={playbackUrl(video)} 
                         className="w-full h-full object-cover grayscale opacity-60 group-hover:grayscale-0 group-hover:opacity-100 transition-all duration-700 ease-out" 
                     />
                 ) : (
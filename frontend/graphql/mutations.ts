@@ -6,3 +6,20 @@ export const getUploadUrl = /* GraphQL */ `
     }
   }
 `;
+
+export const batchSearch = /* GraphQL */ `
+  mutation BatchSearch($texts: [String!]!, $topK: Int, $cut: Boolean, $filters: SearchFilters) {
+    batchSearch(texts: $texts, topK: $topK, cut: $cut, filters: $filters) {
+      query
+      matches {
+        s3Uri
+        startTime
+        endTime
+        score
+        distance
+      }
+      clipUrl
+      error
+    }
+  }
+`;
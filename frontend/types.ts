@@ -4,6 +4,9 @@ export interface VideoStatus {
   message?: string
   callbackId?: string
   videoUrl?: string
+  streamUrl?: string
+  thumbnailUrl?: string
+  previewUrl?: string
 }
 
 export interface VideoAsset {
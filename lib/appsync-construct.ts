@@ -14,6 +14,7 @@ import * as s3n from "aws-cdk-lib/aws-s3-notifications";
 import * as sfn from "aws-cdk-lib/aws-stepfunctions";
 import * as events from "aws-cdk-lib/aws-events";
 import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
 
 import { PythonFunction } from "@aws-cdk/aws-lambda-python-alpha";
 import { BEDROCK_MODELS, DEFAULT_API_KEY_EXPIRATION_DAYS } from "./constants";
@@ -33,6 +34,7 @@ export class AppSyncConstruct extends Construct {
   public readonly vectorBucketName: string;
   public readonly vectorIndexName: string;
   public readonly eventBusName: string;
+  public readonly inflightTableName: string;
 
   constructor(scope: Construct, id: string, props: AppSyncConstructProps = {}) {
     super(scope, id);
@@ -74,6 +76,26 @@ export class AppSyncConstruct extends Construct {
           enabled: true,
           noncurrentVersionExpiration: cdk.Duration.days(30),
         },
+        {
+          // Chunks of long videos, only needed while their embedding jobs run
+          id: "ExpireEmbeddingChunks",
+          enabled: true,
+          prefix: "chunks/",
+          expiration: cdk.Duration.days(2),
+        },
+        {
+          // Step results offloaded from durable checkpoints; executions end within days of their approval
+          id: "ExpireCheckpointPayloads",
+          enabled: true,
+          prefix: "checkpoints/",
+          expiration: cdk.Duration.days(14),
+        },
+        {
+          // Resumable uploads (src/py/media_transfer.py) that were never completed
+          id: "AbortIncompleteUploads",
+          enabled: true,
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
+        },
       ],
     });
 
@@ -92,6 +114,8 @@ export class AppSyncConstruct extends Construct {
       dimension: 1024,
       distanceMetric: "cosine",
       metadataConfiguration: {
+        // Everything not listed here is filterable. Search filters rely on
+        // s3_uri, uploaded_at, source_duration and tags, so keep them out of this list.
         nonFilterableMetadataKeys: ["source", "timestamp", "category"],
       },
     });
@@ -158,6 +182,84 @@ export class AppSyncConstruct extends Construct {
       },
     });
 
+    const detectShotsFunctionLogs = new logs.LogGroup(this, "detectShotsFunctionLogs", {
+      retention: logs.RetentionDays.ONE_WEEK,
+    });
+
+    // Scene detection before embedding, so indexed segments follow shot boundaries.
+    // Also transcodes large uploads to the embedding proxy; x264 uses the extra vCPUs at this size.
+    const detectShotsFunction = new PythonFunction(this, "detectShotsFunction", {
+      entry: "./src/py/",
+      handler: "handler",
+      index: "shot_segmentation.py",
+      runtime: cdk.aws_lambda.Runtime.PYTHON_3_13,
+      memorySize: 10240,
+      timeout: cdk.Duration.minutes(15),
+      ephemeralStorageSize: cdk.Size.gibibytes(10),
+      logGroup: detectShotsFunctionLogs,
+      tracing: cdk.aws_lambda.Tracing.ACTIVE,
+      layers: [
+        lambda.LayerVersion.fromLayerVersionArn(
+          this,
+          "DetectShotsFfmpegLayer",
+          "arn:aws:lambda:us-east-1:132260253285:layer:ffmpeg-executable-file:1"
+        ),
+      ],
+      environment: {
+        SCENE_THRESHOLD: "0.3",
+        SHOT_MIN_SECONDS: "2",
+        SHOT_MAX_SECONDS: "10",
+        EMBEDDING_WINDOW_SECONDS: "2",
+        EMBEDDING_PROXY: "true",
+        PROXY_MAX_HEIGHT: "720",
+        PROXY_MAX_FPS: "30",
+        MEZZANINE_CHUNKS: "true",
+      },
+    });
+    this.mediaBucket.grantReadWrite(detectShotsFunction);
+
+    // Fingerprint -> indexed vector keys of uploaded content, so duplicate uploads aren't embedded again
+    const contentRegistryTable = new dynamodb.Table(this, "ContentRegistryTable", {
+      partitionKey: { name: "fingerprint", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+    this.saveEmbeddingsFunction.addEnvironment("CONTENT_REGISTRY_TABLE_NAME", contentRegistryTable.tableName);
+    contentRegistryTable.grantReadWriteData(this.saveEmbeddingsFunction);
+
+    const checkDuplicateFunctionLogs = new logs.LogGroup(this, "checkDuplicateFunctionLogs", {
+      retention: logs.RetentionDays.ONE_WEEK,
+    });
+
+    // Runs before shot detection: duplicates of indexed content get the existing vectors instead of a new job
+    const checkDuplicateFunction = new PythonFunction(this, "checkDuplicateFunction", {
+      entry: "./src/py/",
+      handler: "handler",
+      index: "dedup_upload.py",
+      runtime: cdk.aws_lambda.Runtime.PYTHON_3_13,
+      memorySize: 1769,
+      timeout: cdk.Duration.minutes(15),
+      logGroup: checkDuplicateFunctionLogs,
+      tracing: cdk.aws_lambda.Tracing.ACTIVE,
+      environment: {
+        VECTOR_BUCKET_NAME: vectorBucket.vectorBucketName,
+        VECTOR_INDEX_NAME: vectorIndex.indexName,
+        SOURCE_BUCKET_NAME: this.mediaBucket.bucketName,
+        CONTENT_REGISTRY_TABLE_NAME: contentRegistryTable.tableName,
+      },
+    });
+    this.mediaBucket.grantRead(checkDuplicateFunction);
+    // Duplicates get an index pointing at the original's mezzanine chunks
+    this.mediaBucket.grantPut(checkDuplicateFunction, "mezzanine/*");
+    contentRegistryTable.grantReadWriteData(checkDuplicateFunction);
+    checkDuplicateFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["s3vectors:GetVectors", "s3vectors:PutVectors"],
+        resources: ["*"],
+      })
+    );
+    encryptionKey.grantEncryptDecrypt(checkDuplicateFunction);
+
     const stateMachineRole = new iam.Role(this, "StateMachineRole", {
       assumedBy: new iam.ServicePrincipal("states.amazonaws.com"),
       description: "IAM Role assumed by the Step Functions state machine",
@@ -172,6 +274,8 @@ export class AppSyncConstruct extends Construct {
       ),
       definitionSubstitutions: {
         FUNCTION_ARN: this.saveEmbeddingsFunction.functionArn,
+        DETECT_SHOTS_FUNCTION_ARN: detectShotsFunction.functionArn,
+        CHECK_DUPLICATE_FUNCTION_ARN: checkDuplicateFunction.functionArn,
       },
       role: stateMachineRole,
       tracingEnabled: true,
@@ -189,7 +293,11 @@ export class AppSyncConstruct extends Construct {
     stateMachineRole.addToPolicy(
       new iam.PolicyStatement({
         actions: ["lambda:InvokeFunction"],
-        resources: [this.saveEmbeddingsFunction.functionArn],
+        resources: [
+          this.saveEmbeddingsFunction.functionArn,
+          detectShotsFunction.functionArn,
+          checkDuplicateFunction.functionArn,
+        ],
         effect: iam.Effect.ALLOW,
       })
     );
@@ -234,9 +342,79 @@ export class AppSyncConstruct extends Construct {
       })
     );
 
+    // Durable Python version of the embeddings pipeline (src/py/embeddings_workflow.py).
+    // Uploads go to it instead of the state machine with `-c embeddingsPipeline=durable`.
+    const embeddingsWorkflowFunctionLogs = new logs.LogGroup(this, "embeddingsWorkflowFunctionLogs", {
+      retention: logs.RetentionDays.ONE_WEEK,
+    });
+    const embeddingsWorkflowFunction = new PythonFunction(this, "embeddingsWorkflowFunction", {
+      entry: "./src/py/",
+      handler: "lambda_handler",
+      index: "embeddings_workflow.py",
+      runtime: cdk.aws_lambda.Runtime.PYTHON_3_13,
+      memorySize: 10240,
+      timeout: cdk.Duration.minutes(15),
+      ephemeralStorageSize: cdk.Size.gibibytes(10),
+      durableConfig: {
+        executionTimeout: cdk.Duration.days(1),
+        retentionPeriod: cdk.Duration.days(7),
+      },
+      logGroup: embeddingsWorkflowFunctionLogs,
+      tracing: cdk.aws_lambda.Tracing.ACTIVE,
+      layers: [
+        lambda.LayerVersion.fromLayerVersionArn(
+          this,
+          "EmbeddingsWorkflowFfmpegLayer",
+          "arn:aws:lambda:us-east-1:132260253285:layer:ffmpeg-executable-file:1"
+        ),
+      ],
+      environment: {
+        VECTOR_BUCKET_NAME: vectorBucket.vectorBucketName,
+        VECTOR_INDEX_NAME: vectorIndex.indexName,
+        SOURCE_BUCKET_NAME: this.mediaBucket.bucketName,
+        SCENE_THRESHOLD: "0.3",
+        SHOT_MIN_SECONDS: "2",
+        SHOT_MAX_SECONDS: "10",
+        EMBEDDING_WINDOW_SECONDS: "2",
+        EMBEDDING_PROXY: "true",
+        PROXY_MAX_HEIGHT: "720",
+        PROXY_MAX_FPS: "30",
+        MEZZANINE_CHUNKS: "true",
+        EMBEDDING_CHUNK_SECONDS: "600",
+        EMBEDDING_CHUNK_CONCURRENCY: "4",
+        CONTENT_REGISTRY_TABLE_NAME: contentRegistryTable.tableName,
+      },
+    });
+    const embeddingsWorkflowAlias = new lambda.Alias(this, "EmbeddingsWorkflowAlias", {
+      aliasName: "prod",
+      version: embeddingsWorkflowFunction.currentVersion,
+    });
+    embeddingsWorkflowFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["lambda:CheckpointDurableExecutions", "lambda:GetDurableExecutionState"],
+        resources: ["*"],
+      })
+    );
+    embeddingsWorkflowFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: [
+          "bedrock:InvokeModel",
+          "bedrock:StartAsyncInvoke",
+          "bedrock:GetAsyncInvoke",
+          "s3vectors:GetVectors",
+          "s3vectors:PutVectors",
+        ],
+        resources: ["*"],
+      })
+    );
+    this.mediaBucket.grantReadWrite(embeddingsWorkflowFunction);
+    contentRegistryTable.grantReadWriteData(embeddingsWorkflowFunction);
+    encryptionKey.grantEncryptDecrypt(embeddingsWorkflowFunction);
+
+    const durableEmbeddings = this.node.tryGetContext("embeddingsPipeline") === "durable";
     this.mediaBucket.addEventNotification(
       s3.EventType.OBJECT_CREATED,
-      new s3n.LambdaDestination(this.invokeWorkflowFunction),
+      new s3n.LambdaDestination(durableEmbeddings ? embeddingsWorkflowAlias : this.invokeWorkflowFunction),
       {
         prefix: "videos/",
       }
@@ -253,7 +431,7 @@ export class AppSyncConstruct extends Construct {
 
     this.saveEmbeddingsFunction.addToRolePolicy(
       new iam.PolicyStatement({
-        actions: ["s3:GetObject", "s3:ListBucket"],
+        actions: ["s3:GetObject", "s3:GetObjectTagging", "s3:ListBucket"],
         resources: [this.mediaBucket.bucketArn, `${this.mediaBucket.bucketArn}/*`],
       })
     );
@@ -300,6 +478,9 @@ export class AppSyncConstruct extends Construct {
             $message: String
             $callbackId: String
             $videoUrl: String
+            $streamUrl: String
+            $thumbnailUrl: String
+            $previewUrl: String
           ) {
             updateVideoStatus(
               requestId: $requestId
@@ -307,12 +488,18 @@ export class AppSyncConstruct extends Construct {
               message: $message
               callbackId: $callbackId
               videoUrl: $videoUrl
+              streamUrl: $streamUrl
+              thumbnailUrl: $thumbnailUrl
+              previewUrl: $previewUrl
             ) {
               requestId
               status
               message
               callbackId
               videoUrl
+              streamUrl
+              thumbnailUrl
+              previewUrl
             }
           }
         `,
@@ -322,6 +509,9 @@ export class AppSyncConstruct extends Construct {
           message: events.EventField.fromPath("$.detail.message"),
           callbackId: events.EventField.fromPath("$.detail.callbackId"),
           videoUrl: events.EventField.fromPath("$.detail.videoUrl"),
+          streamUrl: events.EventField.fromPath("$.detail.streamUrl"),
+          thumbnailUrl: events.EventField.fromPath("$.detail.thumbnailUrl"),
+          previewUrl: events.EventField.fromPath("$.detail.previewUrl"),
         }),
         eventRole: appSyncEventBridgeRole,
       })
@@ -344,6 +534,15 @@ export class AppSyncConstruct extends Construct {
 
     this.eventBusName = videoAgentEventBus.eventBusName;
 
+    // Coalesces identical in-flight searches (keyed by normalized query hash)
+    const searchInflightTable = new dynamodb.Table(this, "SearchInflightTable", {
+      partitionKey: { name: "queryHash", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: "expiresAt",
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+    this.inflightTableName = searchInflightTable.tableName;
+
     const invokeSearchCutWorkflowFunction = new PythonFunction(this, "invokeSearchCutWorkflowFunction", {
       entry: "./src/py/",
       handler: "handler",
@@ -354,6 +553,7 @@ export class AppSyncConstruct extends Construct {
       environment: {
         SEARCH_CUT_WORKFLOW_FUNCTION_ARN: `arn:aws:lambda:us-east-1:${cdk.Stack.of(this).account}:function:SearchCutWorkflowFunction:prod`,
         TARGET_REGION: "us-east-1",
+        INFLIGHT_TABLE_NAME: searchInflightTable.tableName,
       },
     });
 
@@ -364,6 +564,51 @@ export class AppSyncConstruct extends Construct {
         effect: iam.Effect.ALLOW,
       })
     );
+    searchInflightTable.grantReadWriteData(invokeSearchCutWorkflowFunction);
+
+    const batchSearchFunctionLogs = new logs.LogGroup(this, "batchSearchFunctionLogs", {
+      retention: logs.RetentionDays.ONE_WEEK,
+    });
+
+    const batchSearchFunction = new PythonFunction(this, "batchSearchFunction", {
+      entry: "./src/py/",
+      handler: "handler",
+      index: "batch_search.py",
+      runtime: cdk.aws_lambda.Runtime.PYTHON_3_13,
+      memorySize: 2048,
+      timeout: cdk.Duration.minutes(5),
+      logGroup: batchSearchFunctionLogs,
+      tracing: cdk.aws_lambda.Tracing.ACTIVE,
+      layers: [
+        lambda.LayerVersion.fromLayerVersionArn(
+          this,
+          "BatchSearchFfmpegLayer",
+          "arn:aws:lambda:us-east-1:132260253285:layer:ffmpeg-executable-file:1"
+        ),
+      ],
+      environment: {
+        VECTOR_BUCKET_NAME: vectorBucket.vectorBucketName,
+        VECTOR_INDEX_NAME: vectorIndex.indexName,
+        TARGET_REGION: "us-east-1",
+        BATCH_SEARCH_CONCURRENCY: "16",
+        // Cuts run one ffmpeg per vCPU (src/py/cut_scheduler.py); set BATCH_CUT_CONCURRENCY to override
+      },
+    });
+
+    batchSearchFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["bedrock:InvokeModel"],
+        resources: [BEDROCK_MODELS.NOVA_MULTIMODAL_EMBEDDINGS],
+      })
+    );
+    batchSearchFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["s3vectors:QueryVectors", "s3vectors:GetVectors"],
+        resources: ["*"],
+      })
+    );
+    encryptionKey.grantDecrypt(batchSearchFunction);
+    this.mediaBucket.grantReadWrite(batchSearchFunction);
 
     const getUploadUrlFunction = new NodejsFunction(this, "getUploadUrlFunction", {
       entry: path.join(__dirname, "../src/ts/getUploadUrl.ts"),
@@ -407,6 +652,15 @@ export class AppSyncConstruct extends Construct {
         runtime: appsync.FunctionRuntime.JS_1_0_0,
       });
 
+    this.api
+      .addLambdaDataSource("batchSearchDataSource", batchSearchFunction)
+      .createResolver("batchSearchFunctionResolver", {
+        typeName: "Mutation",
+        fieldName: "batchSearch",
+        code: appsync.Code.fromAsset(path.join(__dirname, "../resolvers/invoke/invoke.js")),
+        runtime: appsync.FunctionRuntime.JS_1_0_0,
+      });
+
     this.api
       .addLambdaDataSource("getUploadUrlDataSource", getUploadUrlFunction)
       .createResolver("getUploadUrlResolver", {
@@ -10,6 +10,7 @@ interface SearchWorkflowStackProps extends cdk.StackProps {
   vectorBucketName: string;
   vectorIndexName: string;
   eventBusName: string;
+  inflightTableName: string;
 }
 
 export class SearchWorkflowStack extends cdk.Stack {
@@ -53,6 +54,14 @@ export class SearchWorkflowStack extends cdk.Stack {
         VECTOR_INDEX_NAME: props.vectorIndexName,
         EVENT_BUS_NAME: props.eventBusName,
         SOURCE_BUCKET_NAME: props.mediaBucketName,
+        INFLIGHT_TABLE_NAME: props.inflightTableName,
+        // Publish clips as HLS while they are cut, for progressive playback during approval
+        CLIP_HLS: "true",
+        CLIP_HLS_SEGMENT_SECONDS: "2",
+        // Step logs (DEBUG adds full search responses) and the largest step result checkpointed inline;
+        // larger ones go to the media bucket under checkpoints/ (src/py/step_results.py)
+        STEP_LOG_LEVEL: "INFO",
+        CHECKPOINT_INLINE_BYTES: "16384",
       }
     });
 
@@ -113,7 +122,11 @@ export class SearchWorkflowStack extends cdk.Stack {
       // Media Bucket Access (Cross-region S3 access works naturally via ARN)
       searchCutWorkflowFunction.addToRolePolicy(
         new iam.PolicyStatement({
-            actions: ["s3:GetObject", "s3:ListBucket", "s3:PutObject"],
+            actions: [
+                "s3:GetObject", "s3:ListBucket", "s3:PutObject",
+                // Resumable multipart uploads of large clips
+                "s3:ListBucketMultipartUploads", "s3:ListMultipartUploadParts", "s3:AbortMultipartUpload",
+            ],
             resources: [
                 `arn:aws:s3:::${props.mediaBucketName}`,
                 `arn:aws:s3:::${props.mediaBucketName}/*`
@@ -130,5 +143,14 @@ export class SearchWorkflowStack extends cdk.Stack {
               effect: iam.Effect.ALLOW
           })
       );
+
+      // In-flight search records (update on approval, release on completion)
+      searchCutWorkflowFunction.addToRolePolicy(
+          new iam.PolicyStatement({
+              actions: ["dynamodb:UpdateItem", "dynamodb:DeleteItem"],
+              resources: [`arn:aws:dynamodb:us-east-1:${this.account}:table/${props.inflightTableName}`],
+              effect: iam.Effect.ALLOW
+          })
+      );
   }
 }
@@ -1,9 +1,10 @@
 import json
-import boto3
 import os
 
+from clients import lazy_client
+
 # Initialize Lambda Client
-lambda_client = boto3.client('lambda')
+lambda_client = lazy_client('lambda', call_type='control')
 
 def handler(event, context):
     print(f"Received event: {json.dumps(event)}")
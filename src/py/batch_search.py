@@ -0,0 +1,105 @@
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from clients import S3_TRANSFER_CONCURRENCY, TARGET_REGION, connection_stats, lazy_client
+from cut_scheduler import CUT_WORKERS, cut_all
+from metrics import PhaseTimer, emit_connection_stats
+from search_filters import build_filter
+from vector_search import embed_text, query_index, extract_match
+
+VECTOR_BUCKET_NAME = os.environ.get('VECTOR_BUCKET_NAME')
+VECTOR_INDEX_NAME = os.environ.get('VECTOR_INDEX_NAME', '')
+VECTOR_DIMENSION = int(os.environ.get('VECTOR_DIMENSION', '1024'))
+
+# Bounded parallelism for embed + query fan-out, and for FFmpeg cuts (one per vCPU unless set)
+BATCH_SEARCH_CONCURRENCY = int(os.environ.get('BATCH_SEARCH_CONCURRENCY', '8'))
+BATCH_CUT_CONCURRENCY = int(os.environ.get('BATCH_CUT_CONCURRENCY') or CUT_WORKERS)
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '500'))
+MAX_TOP_K = 30
+
+# One pooled client per service, sized so every worker gets its own connection
+s3_vectors = lazy_client('s3vectors', region_name=TARGET_REGION, call_type='vector_query',
+                         concurrency=BATCH_SEARCH_CONCURRENCY)
+bedrock_runtime = lazy_client('bedrock-runtime', region_name=TARGET_REGION, call_type='embed',
+                              concurrency=BATCH_SEARCH_CONCURRENCY)
+# Each concurrent cut runs a managed transfer with its own worker threads
+s3_client = lazy_client('s3', region_name=TARGET_REGION, call_type='transfer',
+                        concurrency=BATCH_CUT_CONCURRENCY * S3_TRANSFER_CONCURRENCY)
+
+
+def search_one(query: str, top_k: int, filter_expression: dict = None) -> dict:
+    """Embeds a single query and returns its matches (never raises)."""
+    timer = PhaseTimer()
+    try:
+        with timer.phase("bedrock_embed"):
+            embedding = embed_text(bedrock_runtime, query, VECTOR_DIMENSION)
+        with timer.phase("query_vectors"):
+            vectors = query_index(s3_vectors, VECTOR_BUCKET_NAME, VECTOR_INDEX_NAME, embedding, top_k=top_k,
+                                  filter_expression=filter_expression)
+        return {"query": query, "matches": [extract_match(v) for v in vectors], "error": None}
+    except Exception as e:
+        print(f"Search failed for '{query}': {e}")
+        return {"query": query, "matches": [], "error": str(e)}
+
+
+def cut_best_matches(results: list, batch_id: str) -> list:
+    """Cuts the best match of every query result (cut_scheduler.py) and attaches the clip URLs."""
+    to_cut = [i for i, result in enumerate(results) if result["matches"]]
+    cuts = cut_all(s3_client, [{"match": results[i]["matches"][0], "output_key": f"cuts/batch/{batch_id}/{i}_cut.mp4"}
+                               for i in to_cut], workers=BATCH_CUT_CONCURRENCY)
+    results = list(results)
+    for i, cut in zip(to_cut, cuts):
+        if cut.get("error"):
+            print(f"Cut failed for '{results[i]['query']}': {cut['error']}")
+            results[i] = {**results[i], "error": f"Cut failed: {cut['error']}"}
+        else:
+            results[i] = {**results[i], "clipUrl": cut["presigned_url"]}
+    return results
+
+
+def to_graphql(result: dict) -> dict:
+    return {
+        "query": result["query"],
+        "matches": [
+            {
+                "s3Uri": m["s3_uri"],
+                "startTime": m["start_time"],
+                "endTime": m["end_time"],
+                "score": m["score"],
+                "distance": m["distance"],
+            }
+            for m in result["matches"]
+        ],
+        "clipUrl": result.get("clipUrl"),
+        "error": result["error"],
+    }
+
+
+def handler(event, context):
+    print(f"Received event: {json.dumps(event)}")
+
+    # Mutation: batchSearch(texts: [String!]!, topK: Int, cut: Boolean, filters: SearchFilters)
+    arguments = event.get('arguments', {})
+    texts = [t for t in arguments.get('texts') or [] if t and t.strip()]
+    top_k = max(1, min(int(arguments.get('topK') or 1), MAX_TOP_K))
+    should_cut = bool(arguments.get('cut'))
+    filter_expression = build_filter(arguments.get('filters'))
+
+    if not texts:
+        print("No queries provided")
+        return []
+    if len(texts) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(texts)} queries exceeds the limit of {MAX_BATCH_SIZE}")
+
+    with ThreadPoolExecutor(max_workers=BATCH_SEARCH_CONCURRENCY) as pool:
+        results = list(pool.map(lambda q: search_one(q, top_k, filter_expression), texts))
+
+    if should_cut:
+        results = cut_best_matches(results, str(uuid.uuid4()))
+
+    failed = sum(1 for r in results if r["error"])
+    print(f"Batch search finished: {len(results)} queries, {failed} failed")
+    emit_connection_stats(connection_stats(delta=True))
+    return [to_graphql(r) for r in results]
@@ -0,0 +1,155 @@
+"""Lazily created AWS clients from one shared boto3 Session, with connection reuse stats."""
+import os
+import threading
+
+# Timeout overrides by kind of call; botocore's 60 s connect and read timeouts otherwise
+CALL_TIMEOUTS = {
+    'default': {},
+    'embed': {'read_timeout': 3600},  # Bedrock invoke_model, as the workflow's client always had
+    'async_invoke': {},  # Bedrock start_async_invoke / get_async_invoke
+    'vector_query': {},  # S3 Vectors query_vectors
+    'vector_write': {},  # S3 Vectors put_vectors batches
+    'transfer': {},  # S3 objects and multipart parts
+    'control': {},  # EventBridge, Lambda, DynamoDB
+}
+# Region of the search/cut workflow's resources, for the handlers AppSync invokes
+TARGET_REGION = os.environ.get('TARGET_REGION', 'us-east-2')
+# botocore's default pool size; clients shared by more threads get one connection each
+MIN_POOL_CONNECTIONS = 10
+# The function's memory setting; Lambda's network bandwidth and CPU grow with it
+LAMBDA_MEMORY_MB = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '1024'))
+# Most threads a managed transfer (media_transfer.py) uses: 10 at 1 GB, up to 64 at 10 GB
+S3_TRANSFER_CONCURRENCY = min(64, max(10, LAMBDA_MEMORY_MB // 160))
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+# (requests, connections) per client as of the last connection_stats(delta=True)
+_reported = {}
+
+
+def get_session():
+    """The process-wide boto3 Session; boto3 is imported on first call."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import boto3
+                _session = boto3.session.Session()
+    return _session
+
+
+def client_config_options(call_type: str = 'default', concurrency: int = 1, **overrides) -> dict:
+    """botocore Config options for a client used for `call_type` by `concurrency` threads."""
+    return {
+        'max_pool_connections': max(MIN_POOL_CONNECTIONS, concurrency),
+        'tcp_keepalive': True,
+        **CALL_TIMEOUTS[call_type],
+        **overrides,
+    }
+
+
+def get_client(service_name: str, region_name: str = None, call_type: str = 'default', concurrency: int = 1,
+               **config_overrides):
+    """
+    Returns a cached client for (service, region, call type, Config options),
+    creating it from the shared session on first request. Client creation on
+    a shared session is not thread-safe, hence the lock.
+    """
+    options = client_config_options(call_type, concurrency, **config_overrides)
+    key = (service_name, region_name, call_type, repr(sorted(options.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                from botocore.config import Config
+                client = get_session().client(service_name, region_name=region_name, config=Config(**options))
+                _clients[key] = client
+    return client
+
+
+def _connection_pools(client):
+    # botocore keeps one urllib3 PoolManager per client (plus one per proxy), with a pool per host
+    http_session = getattr(getattr(client, '_endpoint', None), 'http_session', None)
+    managers = [getattr(http_session, '_manager', None), *getattr(http_session, '_proxy_managers', {}).values()]
+    for manager in filter(None, managers):
+        for pool_key in manager.pools.keys():
+            pool = manager.pools.get(pool_key)
+            if pool is not None:
+                yield pool
+
+
+def connection_stats(delta: bool = False) -> list:
+    """
+    Requests and newly opened connections per created client. Every request
+    that didn't open a connection reused a pooled keep-alive one. Counts are
+    for the life of the process, or with `delta` since the previous delta call
+    (one invocation, in a Lambda).
+    """
+    stats = []
+    with _lock:
+        clients = list(_clients.items())
+    for key, client in clients:
+        service_name, region_name, call_type, _ = key
+        pools = list(_connection_pools(client))
+        requests = sum(pool.num_requests for pool in pools)
+        connections = sum(pool.num_connections for pool in pools)
+        if delta:
+            last_requests, last_connections = _reported.get(key, (0, 0))
+            _reported[key] = (requests, connections)
+            requests, connections = requests - last_requests, connections - last_connections
+        stats.append({
+            'service': service_name,
+            'region': region_name or client.meta.region_name,
+            'call_type': call_type,
+            'requests': requests,
+            'connections': connections,
+            'reused': max(0, requests - connections),
+            'pool_size': client.meta.config.max_pool_connections,
+        })
+    return stats
+
+
+class LazyClient:
+    """Forwards attribute access to a client created on first use."""
+
+    def __init__(self, service_name: str, region_name: str = None, call_type: str = 'default', concurrency: int = 1,
+                 **config_overrides):
+        if call_type not in CALL_TIMEOUTS:
+            raise ValueError(f"Unknown call type {call_type!r}, expected one of {sorted(CALL_TIMEOUTS)}")
+        self._service_name = service_name
+        self._region_name = region_name
+        self._call_type = call_type
+        self._concurrency = concurrency
+        self._config_overrides = config_overrides
+        self._client = None
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set in __init__
+        if self._client is None:
+            self._client = get_client(self._service_name, self._region_name, self._call_type, self._concurrency,
+                                      **self._config_overrides)
+        return getattr(self._client, name)
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def __repr__(self):
+        state = 'created' if self.created else 'not created'
+        return f"<LazyClient {self._service_name} {self._call_type} ({self._region_name or 'default region'}, {state})>"
+
+
+def lazy_client(service_name: str, region_name: str = None, call_type: str = 'default', concurrency: int = 1,
+                **config_overrides) -> LazyClient:
+    return LazyClient(service_name, region_name, call_type, concurrency, **config_overrides)
+
+
+def reset():
+    """Drops the cached session and clients (e.g. after changing credentials in tests)."""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _reported.clear()
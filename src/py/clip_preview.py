@@ -0,0 +1,74 @@
+"""Thumbnail sprite and animated preview of a matched range, for the approval UI."""
+import os
+import shutil
+import uuid
+
+from ffmpeg_utils import run_ffmpeg
+from metrics import PhaseTimer
+from video_cut import PRESIGNED_URL_EXPIRY_SECONDS, fetch_match, parse_s3_uri
+
+# 4x4 tiles of a 16:9 source make a 16:9 sheet
+SPRITE_COLUMNS = 4
+SPRITE_ROWS = 4
+SPRITE_TILE_WIDTH = 160
+PREVIEW_FRAMES = 24
+PREVIEW_FPS = 8
+PREVIEW_WIDTH = 320
+PREVIEW_TIMEOUT_SECONDS = 120
+
+
+def preview_args(input_path: str, input_options: list, start_time: float, end_time: float, sprite_path: str,
+                 preview_path: str) -> list:
+    """ffmpeg arguments that write the sprite sheet (JPEG) and the animated preview (GIF) of [start_time, end_time]."""
+    duration = end_time - start_time
+    tiles = SPRITE_COLUMNS * SPRITE_ROWS
+    graph = (
+        "[0:v]split=2[s][p];"
+        f"[s]fps={tiles / duration:.6f},scale={SPRITE_TILE_WIDTH}:-2,tile={SPRITE_COLUMNS}x{SPRITE_ROWS}[sprite];"
+        # Frames sampled over the whole range, retimed to play at PREVIEW_FPS
+        f"[p]fps={PREVIEW_FRAMES / duration:.6f},scale={PREVIEW_WIDTH}:-2:flags=lanczos,"
+        f"setpts=N/({PREVIEW_FPS}*TB),split[pa][pb];[pa]palettegen=stats_mode=diff[palette];"
+        "[pb][palette]paletteuse[preview]"
+    )
+    return [
+        "-nostats",
+        "-ss", str(start_time), "-t", str(duration),
+        *input_options,
+        "-i", input_path,
+        "-filter_complex", graph,
+        "-map", "[sprite]", "-frames:v", "1", "-q:v", "4", "-y", sprite_path,
+        "-map", "[preview]", "-r", str(PREVIEW_FPS), "-loop", "0", "-y", preview_path,
+    ]
+
+
+def make_previews(s3_client, match_data: dict, key_prefix: str, timer: PhaseTimer = None) -> dict:
+    """
+    Generates and uploads <key_prefix>_sprite.jpg and <key_prefix>_preview.gif
+    for the match. Returns their presigned URLs (thumbnail_url, preview_url).
+    Raises CalledProcessError/TimeoutExpired if ffmpeg fails.
+    """
+    timer = timer or PhaseTimer()
+    work_dir = f"/tmp/{uuid.uuid4()}"
+    sprite_path = os.path.join(work_dir, "sprite.jpg")
+    preview_path = os.path.join(work_dir, "preview.gif")
+    try:
+        os.makedirs(work_dir)
+        source = fetch_match(s3_client, match_data, work_dir, timer, phase_prefix="preview_")
+        with timer.phase("ffmpeg_preview"):
+            run_ffmpeg(preview_args(source['path'], source['input_options'], source['start_time'],
+                                    source['end_time'], sprite_path, preview_path),
+                       timeout=PREVIEW_TIMEOUT_SECONDS)
+
+        bucket, _ = parse_s3_uri(match_data['s3_uri'])
+        urls = {}
+        with timer.phase("preview_upload"):
+            for name, path, key, content_type in (
+                ("thumbnail_url", sprite_path, f"{key_prefix}_sprite.jpg", "image/jpeg"),
+                ("preview_url", preview_path, f"{key_prefix}_preview.gif", "image/gif"),
+            ):
+                s3_client.upload_file(path, bucket, key, ExtraArgs={'ContentType': content_type})
+                urls[name] = s3_client.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key},
+                                                              ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS)
+        return {**urls, "timings": timer.timings}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,130 @@
+"""HLS packaging of cut clips, published while they are cut."""
+import os
+import re
+import subprocess
+import time
+
+CLIP_HLS_ENABLED = os.environ.get('CLIP_HLS', 'false').lower() == 'true'
+HLS_SEGMENT_SECONDS = int(os.environ.get('CLIP_HLS_SEGMENT_SECONDS', '2'))
+HLS_POLL_SECONDS = 0.2
+HLS_PLAYLIST_NAME = "index.m3u8"
+HLS_CONTENT_TYPES = {'.m3u8': 'application/vnd.apple.mpegurl', '.mp4': 'video/mp4', '.m4s': 'video/iso.segment'}
+
+_MAP_URI = re.compile(r'(#EXT-X-MAP:.*URI=")([^"]+)(")')
+
+
+def stream_prefix(output_key: str) -> str:
+    """S3 prefix of a clip's HLS rendition: cuts/x_cut.mp4 -> cuts/x_cut/hls/."""
+    return f"{os.path.splitext(output_key)[0]}/hls/"
+
+
+def hls_output_args(playlist_path: str, duration: float, segment_seconds: int = HLS_SEGMENT_SECONDS) -> list:
+    """
+    ffmpeg output arguments, to append to a stream-copy cut command, that also
+    write the clip as an HLS event playlist of ~segment_seconds fMP4 segments
+    next to playlist_path. Segments split on keyframes.
+    """
+    segment_dir = os.path.dirname(playlist_path)
+    return [
+        "-t", str(duration),
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "event",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", os.path.join(segment_dir, "seg-%05d.m4s"),
+        # Segments are renamed into place once complete, so listed segments can be uploaded
+        "-hls_flags", "temp_file+independent_segments",
+        "-y", playlist_path,
+    ]
+
+
+class HlsPublisher:
+    """
+    Mirrors the playlist ffmpeg is writing in work_dir to S3: uploads the files
+    it lists that haven't been uploaded yet, then the playlist with their
+    presigned URLs (relative URIs would resolve to unsigned ones).
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str, work_dir: str, expires_in: int):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.work_dir = work_dir
+        self.expires_in = expires_in
+        self._urls = {}
+        self._published = None
+
+    @property
+    def playlist_key(self) -> str:
+        return f"{self.prefix}{HLS_PLAYLIST_NAME}"
+
+    def playlist_url(self) -> str:
+        return self._presign(self.playlist_key)
+
+    def _presign(self, key: str) -> str:
+        return self.s3.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                              ExpiresIn=self.expires_in)
+
+    def _upload(self, name: str) -> str:
+        if name not in self._urls:
+            key = f"{self.prefix}{name}"
+            self.s3.upload_file(os.path.join(self.work_dir, name), self.bucket, key,
+                                ExtraArgs={'ContentType': HLS_CONTENT_TYPES.get(os.path.splitext(name)[1],
+                                                                                'application/octet-stream')})
+            self._urls[name] = self._presign(key)
+        return self._urls[name]
+
+    def publish(self) -> bool:
+        """
+        Publishes the current local playlist if it lists at least one segment
+        and changed since the last call. Returns whether it was published.
+        """
+        try:
+            with open(os.path.join(self.work_dir, HLS_PLAYLIST_NAME)) as f:
+                playlist = f.read()
+        except FileNotFoundError:
+            return False
+        if playlist == self._published or not any(line and not line.startswith('#')
+                                                  for line in playlist.splitlines()):
+            return False
+
+        lines = []
+        for line in playlist.splitlines():
+            if line and not line.startswith('#'):
+                line = self._upload(line)
+            elif line.startswith('#EXT-X-MAP:'):
+                line = _MAP_URI.sub(lambda m: m.group(1) + self._upload(m.group(2)) + m.group(3), line)
+            lines.append(line)
+        self.s3.put_object(Bucket=self.bucket, Key=self.playlist_key, Body="\n".join(lines) + "\n",
+                           ContentType=HLS_CONTENT_TYPES['.m3u8'], CacheControl='no-cache')
+        self._published = playlist
+        return True
+
+
+def run_publishing(command: list, publisher: HlsPublisher, on_ready=None):
+    """
+    Runs an ffmpeg command that writes an HLS output, publishing the playlist
+    while it runs and once more after it exits. on_ready(playlist_url) is
+    called after the first publication. Raises CalledProcessError if ffmpeg
+    fails.
+    """
+    process = subprocess.Popen(command)
+    ready = False
+    try:
+        while True:
+            exited = process.poll() is not None
+            if publisher.publish() and not ready:
+                ready = True
+                if on_ready:
+                    on_ready(publisher.playlist_url())
+            if exited:
+                break
+            time.sleep(HLS_POLL_SECONDS)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
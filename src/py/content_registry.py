@@ -0,0 +1,171 @@
+"""Registry of indexed upload content (by fingerprint), so duplicate uploads are not embedded again."""
+import hashlib
+import os
+import threading
+import time
+
+from video_cut import parse_s3_uri
+
+CONTENT_REGISTRY_TABLE_NAME = os.environ.get('CONTENT_REGISTRY_TABLE_NAME')
+FINGERPRINT_PREFIX_BYTES = 1024 * 1024
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+# A claim that never got indexed (failed workflow) can be taken over after this
+PENDING_TIMEOUT_SECONDS = int(os.environ.get('CONTENT_PENDING_TIMEOUT_SECONDS', '86400'))
+
+PENDING = 'PENDING'
+INDEXED = 'INDEXED'
+
+
+def fingerprint(s3_client, media_uri: str) -> (str, str):
+    """(fingerprint, version id) of an S3 object: '<size>:<sha256 of the first bytes>'."""
+    bucket, key = parse_s3_uri(media_uri)
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    size = head['ContentLength']
+    version_id = head.get('VersionId')
+    digest = hashlib.sha256()
+    if size:
+        request = {'Bucket': bucket, 'Key': key, 'Range': f"bytes=0-{min(size, FINGERPRINT_PREFIX_BYTES) - 1}"}
+        if version_id:
+            request['VersionId'] = version_id
+        digest.update(s3_client.get_object(**request)['Body'].read())
+    return f"{size}:{digest.hexdigest()}", version_id
+
+
+def content_hash(s3_client, media_uri: str, version_id: str = None) -> str:
+    """SHA-256 of a whole S3 object (or one version of it), streamed in HASH_CHUNK_BYTES reads."""
+    bucket, key = parse_s3_uri(media_uri)
+    request = {'Bucket': bucket, 'Key': key}
+    if version_id:
+        request['VersionId'] = version_id
+    digest = hashlib.sha256()
+    for chunk in s3_client.get_object(**request)['Body'].iter_chunks(HASH_CHUNK_BYTES):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InMemoryContentRegistry:
+    """Local stand-in for the registry table (one process only)."""
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def claim(self, fingerprint: str, media_uri: str, version_id: str = None):
+        """Returns None if the fingerprint was claimed for media_uri, otherwise the existing record."""
+        now = int(time.time())
+        with self._lock:
+            record = self._records.get(fingerprint)
+            if record and not (record['status'] == PENDING and (record['mediaFileUri'] == media_uri or
+                                                                record['claimedAt'] < now - PENDING_TIMEOUT_SECONDS)):
+                return dict(record)
+            self._records[fingerprint] = {'mediaFileUri': media_uri, 'versionId': version_id, 'status': PENDING,
+                                          'claimedAt': now}
+            return None
+
+    def set_content_hash(self, fingerprint: str, media_uri: str, content_hash: str):
+        with self._lock:
+            record = self._records.get(fingerprint)
+            if record and record['mediaFileUri'] == media_uri:
+                record['contentHash'] = content_hash
+
+    def mark_indexed(self, fingerprint: str, media_uri: str, vector_keys: list):
+        with self._lock:
+            record = self._records.get(fingerprint)
+            if record and record['mediaFileUri'] == media_uri:
+                record.update(status=INDEXED, vectorKeys=list(vector_keys))
+
+
+class DynamoContentRegistry:
+    """
+    Registry records in DynamoDB, keyed by fingerprint. Claims are conditional
+    puts, so of two concurrent uploads of the same content exactly one embeds.
+    """
+
+    def __init__(self, dynamodb_client, table_name: str):
+        self.dynamodb = dynamodb_client
+        self.table_name = table_name
+
+    def claim(self, fingerprint: str, media_uri: str, version_id: str = None):
+        """Returns None if the fingerprint was claimed for media_uri, otherwise the existing record."""
+        for _ in range(2):
+            now = int(time.time())
+            item = {
+                "fingerprint": {"S": fingerprint},
+                "mediaFileUri": {"S": media_uri},
+                "status": {"S": PENDING},
+                "claimedAt": {"N": str(now)},
+            }
+            if version_id:
+                item["versionId"] = {"S": version_id}
+            try:
+                self.dynamodb.put_item(
+                    TableName=self.table_name,
+                    Item=item,
+                    # Stale PENDING claims (the workflow never got to ingestion) can be taken over,
+                    # and our own PENDING claim taken again when the claiming step is retried
+                    ConditionExpression="attribute_not_exists(fingerprint) OR "
+                                        "(#status = :pending AND (claimedAt < :stale OR mediaFileUri = :uri))",
+                    ExpressionAttributeNames={"#status": "status"},
+                    ExpressionAttributeValues={
+                        ":pending": {"S": PENDING},
+                        ":stale": {"N": str(now - PENDING_TIMEOUT_SECONDS)},
+                        ":uri": {"S": media_uri},
+                    },
+                )
+                return None
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                pass
+
+            item = self.dynamodb.get_item(
+                TableName=self.table_name,
+                Key={"fingerprint": {"S": fingerprint}},
+                ConsistentRead=True,
+            ).get("Item")
+            if item:
+                return {
+                    "mediaFileUri": item["mediaFileUri"]["S"],
+                    "versionId": item.get("versionId", {}).get("S"),
+                    "status": item["status"]["S"],
+                    "claimedAt": int(item["claimedAt"]["N"]),
+                    "contentHash": item.get("contentHash", {}).get("S"),
+                    "vectorKeys": item.get("vectorKeys", {}).get("SS", []),
+                }
+            # Deleted between our put and get; try to claim it again
+
+        raise RuntimeError(f"Could not claim or read content record {fingerprint}")
+
+    def _update(self, fingerprint: str, media_uri: str, expression: str, values: dict, names: dict = None):
+        request = {
+            "TableName": self.table_name,
+            "Key": {"fingerprint": {"S": fingerprint}},
+            "UpdateExpression": expression,
+            "ConditionExpression": "mediaFileUri = :uri",
+            "ExpressionAttributeValues": {":uri": {"S": media_uri}, **values},
+        }
+        if names:
+            request["ExpressionAttributeNames"] = names
+        try:
+            self.dynamodb.update_item(**request)
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            print(f"Content record {fingerprint} no longer belongs to {media_uri}")
+
+    def set_content_hash(self, fingerprint: str, media_uri: str, content_hash: str):
+        self._update(fingerprint, media_uri, "SET contentHash = :hash", {":hash": {"S": content_hash}})
+
+    def mark_indexed(self, fingerprint: str, media_uri: str, vector_keys: list):
+        values = {":indexed": {"S": INDEXED}}
+        expression = "SET #status = :indexed"
+        if vector_keys:
+            # A string set can't be empty
+            values[":keys"] = {"SS": list(vector_keys)}
+            expression += ", vectorKeys = :keys"
+        self._update(fingerprint, media_uri, expression, values, {"#status": "status"})
+
+
+def make_registry(region_name: str = None):
+    """DynamoDB-backed registry when CONTENT_REGISTRY_TABLE_NAME is set, in-memory otherwise."""
+    if CONTENT_REGISTRY_TABLE_NAME:
+        from clients import lazy_client
+        return DynamoContentRegistry(lazy_client('dynamodb', region_name=region_name, call_type='control'),
+                                     CONTENT_REGISTRY_TABLE_NAME)
+    return InMemoryContentRegistry()
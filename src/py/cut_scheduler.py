@@ -0,0 +1,120 @@
+"""Runs the cuts of a batch on all vCPUs, downloading each source once."""
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import PhaseTimer
+from mezzanine import mezzanine_prefix
+from video_cut import FFMPEG_LOG_TAIL_CHARS, cut_clip, parse_s3_uri
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CUT_WORKERS = int(os.environ.get('CUT_WORKERS') or available_cpus())
+
+
+class SourceCache:
+    """
+    Stands in for the S3 client during a batch of cuts: objects are downloaded
+    once into cache_dir and hard-linked to where each cut asks for them. Every
+    other call goes to the client.
+    """
+
+    def __init__(self, s3_client, cache_dir: str):
+        self._s3 = s3_client
+        self._dir = cache_dir
+        self._lock = threading.Lock()
+        self._downloads = {}
+        self.hits = 0
+
+    def __getattr__(self, name):
+        return getattr(self._s3, name)
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with self._lock:
+            download = self._downloads.get((Bucket, Key))
+            owner = download is None
+            if owner:
+                download = self._downloads[(Bucket, Key)] = Future()
+            else:
+                self.hits += 1
+        if owner:
+            path = os.path.join(self._dir, str(uuid.uuid4()))
+            try:
+                self._s3.download_file(Bucket, Key, path, **kwargs)
+            except Exception as e:
+                # Jobs already waiting get the error; later ones try again
+                with self._lock:
+                    self._downloads.pop((Bucket, Key), None)
+                download.set_exception(e)
+                raise
+            download.set_result(path)
+        try:
+            os.link(download.result(), Filename)
+        except OSError:
+            shutil.copyfile(download.result(), Filename)
+
+    def release(self, s3_uri: str):
+        """Drops the cached copies of a source and of its mezzanine chunks."""
+        bucket, key = parse_s3_uri(s3_uri)
+        with self._lock:
+            released = [k for k in self._downloads
+                        if k[0] == bucket and (k[1] == key or k[1].startswith(mezzanine_prefix(key)))]
+            downloads = [self._downloads.pop(k) for k in released]
+        for download in downloads:
+            if download.done() and not download.exception():
+                os.remove(download.result())
+
+
+def cut_all(s3_client, jobs: list, workers: int = CUT_WORKERS) -> list:
+    """
+    Cuts every job ({match, output_key}) and returns, in job order, the
+    cut_clip result or {error, stderr, timings} for each.
+    """
+    cache_dir = f"/tmp/{uuid.uuid4()}_sources"
+    os.makedirs(cache_dir)
+    cache = SourceCache(s3_client, cache_dir)
+    remaining = {}
+    for job in jobs:
+        remaining[job['match'].get('s3_uri')] = remaining.get(job['match'].get('s3_uri'), 0) + 1
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run(job: dict) -> dict:
+        timer = PhaseTimer()
+        timer.timings["cut_queue_wait"] = round((time.perf_counter() - started) * 1000, 3)
+        try:
+            return cut_clip(cache, job['match'], job['output_key'], timer)
+        except subprocess.CalledProcessError as e:
+            return {"error": str(e), "stderr": (e.stderr or "")[-FFMPEG_LOG_TAIL_CHARS:], "timings": timer.timings}
+        except Exception as e:
+            return {"error": str(e), "timings": timer.timings}
+        finally:
+            s3_uri = job['match'].get('s3_uri')
+            with lock:
+                remaining[s3_uri] -= 1
+                done = remaining[s3_uri] == 0
+            if done and s3_uri:
+                cache.release(s3_uri)
+
+    # Same-source jobs next to each other, so their downloads are shared while cached
+    order = sorted(range(len(jobs)),
+                   key=lambda i: (jobs[i]['match'].get('s3_uri') or '', float(jobs[i]['match'].get('start_time') or 0)))
+    try:
+        # Threads that each drive one ffmpeg subprocess; Lambda has no /dev/shm for a process pool
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = dict(zip(order, pool.map(lambda i: run(jobs[i]), order)))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"Cut {len(jobs)} clips with {workers} workers in {(time.perf_counter() - started):.1f}s, "
+          f"{cache.hits} downloads shared")
+    return [results[i] for i in range(len(jobs))]
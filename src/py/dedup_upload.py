@@ -0,0 +1,70 @@
+"""Duplicate-upload check run before an upload is embedded."""
+import hashlib
+import time
+
+from botocore.exceptions import ClientError
+
+from clients import lazy_client
+from content_registry import INDEXED, content_hash, fingerprint, make_registry
+from metrics import emit_latency
+from mezzanine import alias_index
+from save_embeddings import alias_vectors
+from video_cut import parse_s3_uri
+
+s3_client = lazy_client('s3', call_type='transfer')
+registry = make_registry()
+
+
+def alias_id(media_uri: str) -> str:
+    """Key prefix of the vectors aliased to media_uri."""
+    return hashlib.sha256(media_uri.encode()).hexdigest()[:16]
+
+
+def embed(fingerprint_value: str = None) -> dict:
+    # Ingestion records the vector keys under the fingerprint only if this upload claimed it
+    return {"duplicate": False, "fingerprint": fingerprint_value}
+
+
+def check_upload(media_uri: str) -> dict:
+    """
+    {duplicate, fingerprint} for an upload, plus {duplicateOf, vectors} for a
+    duplicate (already indexed, nothing to embed).
+    """
+    fingerprint_value, version_id = fingerprint(s3_client, media_uri)
+    record = registry.claim(fingerprint_value, media_uri, version_id)
+    if record is None:
+        return embed(fingerprint_value)
+    if record['status'] != INDEXED:
+        # Possibly the same content being embedded right now; embedding it twice is only wasteful
+        print(f"{media_uri} matches {record['mediaFileUri']}, which isn't indexed yet; embedding it")
+        return embed()
+
+    upload_hash = content_hash(s3_client, media_uri)
+    original_hash = record.get('contentHash')
+    if not original_hash:
+        try:
+            original_hash = content_hash(s3_client, record['mediaFileUri'], record.get('versionId'))
+        except ClientError as e:
+            print(f"Could not read {record['mediaFileUri']} to compare with {media_uri}, embedding it: {e}")
+            return embed()
+        registry.set_content_hash(fingerprint_value, record['mediaFileUri'], original_hash)
+    if upload_hash != original_hash:
+        print(f"{media_uri} shares a fingerprint with {record['mediaFileUri']} but not its content")
+        return embed()
+
+    vectors = 0
+    if record['mediaFileUri'] != media_uri:
+        vectors = alias_vectors(record.get('vectorKeys') or [], media_uri, alias_id(media_uri))
+        (bucket, original_key), (_, key) = parse_s3_uri(record['mediaFileUri']), parse_s3_uri(media_uri)
+        alias_index(s3_client, bucket, original_key, key)
+    print(f"{media_uri} is a duplicate of {record['mediaFileUri']}; {vectors} vectors aliased")
+    return {"duplicate": True, "fingerprint": fingerprint_value, "duplicateOf": record['mediaFileUri'],
+            "vectors": vectors}
+
+
+def handler(event, context):
+    """Step Functions task: {mediaFileUri} -> {duplicate, fingerprint, ...}."""
+    started = time.perf_counter()
+    result = check_upload(event['mediaFileUri'])
+    emit_latency("dedup_check", (time.perf_counter() - started) * 1000, cache_hit=result['duplicate'])
+    return result
@@ -0,0 +1,265 @@
+"""Durable embeddings pipeline: dedup, shots, chunking, one Bedrock job per chunk, ingestion."""
+import hashlib
+import math
+import os
+import time
+from urllib.parse import unquote_plus
+
+from aws_durable_execution_sdk_python import (
+    DurableContext,
+    StepContext,
+    durable_execution,
+    durable_step,
+)
+from aws_durable_execution_sdk_python.config import CompletionConfig, Duration, MapConfig, StepConfig
+from aws_durable_execution_sdk_python.retries import (
+    RetryStrategyConfig,
+    create_retry_strategy,
+)
+from aws_durable_execution_sdk_python.waits import WaitForConditionConfig, WaitForConditionDecision
+from botocore.exceptions import ClientError
+
+from clients import lazy_client
+from dedup_upload import check_upload
+from media_chunks import CHUNK_SECONDS, split_media
+from metrics import PhaseTimer, emit_latency, merge_timings
+from save_embeddings import ingest_outputs
+from shot_segmentation import remaining_seconds, segment_media
+from vector_search import EMBEDDING_MODEL_ID
+from video_cut import parse_s3_uri
+
+VECTOR_DIMENSION = int(os.environ.get('VECTOR_DIMENSION', '1024'))
+
+# Expected job time = base + per second of video; tune from the embedding_job metric
+EMBEDDING_JOB_BASE_SECONDS = float(os.environ.get('EMBEDDING_JOB_BASE_SECONDS', '20'))
+EMBEDDING_JOB_SECONDS_PER_VIDEO_SECOND = float(os.environ.get('EMBEDDING_JOB_SECONDS_PER_VIDEO_SECOND', '0.25'))
+# Assumed length when shot detection couldn't read the video
+DEFAULT_VIDEO_SECONDS = 300
+# Polls close in on the expected finish, then back off (see poll_delay_seconds)
+APPROACH_FRACTION = 0.5
+OVERDUE_FRACTION = 0.1
+MIN_POLL_SECONDS = 2
+# Never polls less often than the state machine's 30 s Wait loop
+MAX_POLL_SECONDS = 30
+MAX_POLLS = 500
+# Transient GetAsyncInvoke errors tolerated before the wait fails
+MAX_POLL_ERRORS = 5
+# Chunk jobs running at once per video (Bedrock limits concurrent async invokes per account)
+CHUNK_CONCURRENCY = int(os.environ.get('EMBEDDING_CHUNK_CONCURRENCY', '4'))
+# Jobs started for a chunk before its video fails
+CHUNK_JOB_ATTEMPTS = 2
+
+bedrock_runtime = lazy_client('bedrock-runtime', region_name='us-east-1', call_type='async_invoke')
+
+
+def segmented_embedding_input(media_uri: str, segment_seconds: int, dimension: int = VECTOR_DIMENSION) -> dict:
+    """Same request as the state machine's StartAsyncInvoke."""
+    return {
+        "taskType": "SEGMENTED_EMBEDDING",
+        "segmentedEmbeddingParams": {
+            "embeddingDimension": dimension,
+            "embeddingPurpose": "GENERIC_INDEX",
+            "video": {
+                "format": "mp4",
+                "embeddingMode": "AUDIO_VIDEO_COMBINED",
+                "source": {"s3Location": {"uri": media_uri}},
+                "segmentationConfig": {"durationSeconds": segment_seconds},
+            },
+        },
+    }
+
+
+def expected_job_seconds(video_seconds: float = None) -> float:
+    return EMBEDDING_JOB_BASE_SECONDS + EMBEDDING_JOB_SECONDS_PER_VIDEO_SECOND * (video_seconds or DEFAULT_VIDEO_SECONDS)
+
+
+def poll_delay_seconds(elapsed_seconds: float, expected_seconds: float) -> int:
+    """
+    Next poll delay for a job running for elapsed_seconds. Before the estimate
+    the delay halves the remaining time (APPROACH_FRACTION), so polls close in
+    on the expected finish; past it the delay is a fraction of the overrun
+    (OVERDUE_FRACTION), growing geometrically. Kept within
+    [MIN_POLL_SECONDS, MAX_POLL_SECONDS].
+    """
+    remaining = expected_seconds - elapsed_seconds
+    delay = remaining * APPROACH_FRACTION if remaining > 0 else -remaining * OVERDUE_FRACTION
+    return int(max(MIN_POLL_SECONDS, min(MAX_POLL_SECONDS, math.ceil(delay))))
+
+
+def job_wait_strategy(expected_seconds: float):
+    # Decides from the checkpointed poll state rather than the operation's attempt number
+    def wait_strategy(state: dict, attempt: int) -> WaitForConditionDecision:
+        if state['status'] != 'InProgress' or state['polls'] >= MAX_POLLS:
+            return WaitForConditionDecision.stop_polling()
+        return WaitForConditionDecision.continue_waiting(
+            Duration.from_seconds(poll_delay_seconds(state['elapsed'], expected_seconds)))
+    return wait_strategy
+
+
+def check_job(state: dict, check_context) -> dict:
+    """One GetAsyncInvoke poll; the returned state is checkpointed between polls."""
+    try:
+        job = bedrock_runtime.get_async_invoke(invocationArn=state['invocationArn'])
+    except ClientError as e:
+        if state['errors'] >= MAX_POLL_ERRORS:
+            raise
+        check_context.logger.warning(f"GetAsyncInvoke failed, polling again: {e}")
+        return {**state, 'errors': state['errors'] + 1, 'polls': state['polls'] + 1,
+                'elapsed': time.time() - state['startedAt']}
+
+    state = {**state, 'status': job['status'], 'polls': state['polls'] + 1, 'elapsed': time.time() - state['startedAt']}
+    if job['status'] == 'Completed':
+        state['outputUri'] = job['outputDataConfig']['s3OutputDataConfig']['s3Uri']
+        state['completedAt'] = job['endTime'].timestamp() if job.get('endTime') else time.time()
+    elif job['status'] == 'Failed':
+        state['failureMessage'] = job.get('failureMessage')
+    return state
+
+
+@durable_step
+def dedup_step(step_context: StepContext, media_uri: str) -> dict:
+    timer = PhaseTimer()
+    with timer.phase("dedup_check"):
+        result = check_upload(media_uri)
+    return {**result, "timings": timer.timings}
+
+
+@durable_step
+def detect_shots_step(step_context: StepContext, media_uri: str, time_budget: float) -> dict:
+    step_context.logger.info(f"Detecting shots: {media_uri}")
+    timer = PhaseTimer()
+    with timer.phase("shot_detection"):
+        result = segment_media(media_uri, time_budget)
+    return {**result, "timings": timer.timings}
+
+
+@durable_step
+def split_step(step_context: StepContext, media_uri: str, duration: float) -> dict:
+    timer = PhaseTimer()
+    with timer.phase("chunking"):
+        chunks = split_media(media_uri, duration)
+    step_context.logger.info(f"{len(chunks)} chunk(s) of up to {CHUNK_SECONDS}s for {media_uri}")
+    return {"chunks": chunks, "timings": timer.timings}
+
+
+@durable_step
+def start_job_step(step_context: StepContext, media_uri: str, segment_seconds: int, request_token: str) -> dict:
+    """Starts the async embedding job; the request token makes step retries reuse the same job."""
+    bucket, _ = parse_s3_uri(media_uri)
+    response = bedrock_runtime.start_async_invoke(
+        modelId=EMBEDDING_MODEL_ID,
+        modelInput=segmented_embedding_input(media_uri, segment_seconds),
+        outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{bucket}"}},
+        clientRequestToken=request_token,
+    )
+    step_context.logger.info(f"Started embedding job {response['invocationArn']}")
+    return {"invocationArn": response['invocationArn'], "startedAt": time.time()}
+
+
+@durable_step
+def ingest_step(step_context: StepContext, outputs: list, media_uri: str, shots: dict, fingerprint: str,
+                completed_at: float) -> dict:
+    # Time between Bedrock finishing the (last) job and ingestion starting
+    emit_latency("embedding_ingest_gap", max(0.0, time.time() - completed_at) * 1000)
+    timer = PhaseTimer()
+    with timer.phase("ingest"):
+        files = ingest_outputs([(uri, offset) for uri, offset in outputs], media_uri, shots['shotsUri'],
+                               shots.get('duration'), fingerprint, shots.get('proxyUri'))
+    return {"files": files, "timings": timer.timings}
+
+
+def media_uris(event: dict) -> list:
+    """{"mediaFileUri"} or an S3 ObjectCreated notification."""
+    if event.get("mediaFileUri"):
+        return [event["mediaFileUri"]]
+    return [f"s3://{r['s3']['bucket']['name']}/{unquote_plus(r['s3']['object']['key'])}" for r in event.get("Records", [])]
+
+
+def wait_for_job(context: DurableContext, job: dict, expected_seconds: float, name: str) -> dict:
+    return context.wait_for_condition(
+        check_job,
+        WaitForConditionConfig(
+            wait_strategy=job_wait_strategy(expected_seconds),
+            initial_state={"invocationArn": job['invocationArn'], "startedAt": job['startedAt'], "status": "InProgress",
+                           "polls": 0, "errors": 0, "elapsed": 0.0},
+        ),
+        name=name,
+    )
+
+
+def chunk_embedder(execution_arn: str, segment_seconds: int, retry: StepConfig):
+    """Map function embedding one chunk: start its job, wait for it, start another if it failed."""
+    def embed_chunk(context: DurableContext, chunk: dict, index: int, chunks: list) -> dict:
+        # Without a known length the whole video is one chunk of unknown length
+        expected_seconds = expected_job_seconds(chunk['end'] - chunk['start'] if chunk['end'] else None)
+        polls = 0
+        for attempt in range(CHUNK_JOB_ATTEMPTS):
+            # Deterministic per execution, chunk and attempt, so a retried start doesn't launch a second job
+            request_token = hashlib.sha256(f"{execution_arn}:{chunk['uri']}:{attempt}".encode()).hexdigest()
+            job = context.step(start_job_step(chunk['uri'], segment_seconds, request_token),
+                               name=f"start-job-{attempt}", config=retry)
+            context.logger.info(f"Embedding job for chunk {index} of {len(chunks)}: expecting ~{expected_seconds:.0f}s")
+            state = wait_for_job(context, job, expected_seconds, f"wait-job-{attempt}")
+            polls += state['polls']
+            if state['status'] == 'Completed':
+                return {"outputUri": state['outputUri'], "offset": chunk['start'], "polls": polls,
+                        "startedAt": job['startedAt'], "completedAt": state['completedAt']}
+            context.logger.warning(f"Embedding job for chunk {index} {state['status']} after {state['polls']} polls: "
+                                   f"{state.get('failureMessage') or 'timed out'}")
+        raise RuntimeError(f"Embedding chunk {index} ({chunk['uri']}) failed after {CHUNK_JOB_ATTEMPTS} jobs")
+    return embed_chunk
+
+
+def embed_video(context: DurableContext, media_uri: str, prefix: str) -> dict:
+    retry = StepConfig(retry_strategy=create_retry_strategy(RetryStrategyConfig(max_attempts=3, backoff_rate=2)))
+    dedup = context.step(dedup_step(media_uri), name=f"{prefix}dedup", config=retry)
+    if dedup['duplicate']:
+        context.logger.info(f"{media_uri} duplicates {dedup['duplicateOf']}, not embedding it")
+        return {"mediaFileUri": media_uri, "duplicateOf": dedup['duplicateOf'], "vectors": dedup['vectors'],
+                "timings": merge_timings(dedup)}
+
+    # Runs within what is left of this invocation, so a retry after a late start doesn't time out again
+    shots = context.step(detect_shots_step(media_uri, remaining_seconds(context.lambda_context)),
+                         name=f"{prefix}detect-shots", config=retry)
+    # The proxy, when the source got one; segment times are the same in both
+    split = context.step(split_step(shots['embedUri'], shots.get('duration')), name=f"{prefix}split", config=retry)
+
+    # Chunks run independently; a chunk that fails doesn't cancel the others, the video fails once all are done
+    results = context.map(
+        split['chunks'],
+        chunk_embedder(context.state.durable_execution_arn, shots['segmentSeconds'], retry),
+        name=f"{prefix}embed-chunks",
+        # The default completion config stops scheduling chunks at the first failure
+        config=MapConfig(max_concurrency=CHUNK_CONCURRENCY, completion_config=CompletionConfig.all_completed()),
+    )
+    failed = results.failed()
+    if failed:
+        errors = "; ".join(f"chunk {item.index}: {item.error.message if item.error else 'failed'}" for item in failed)
+        raise RuntimeError(f"{len(failed)} of {results.total_count} chunks of {media_uri} failed: {errors}")
+    jobs = results.get_results()
+
+    completed_at = max(job['completedAt'] for job in jobs)
+    result = context.step(ingest_step([(job['outputUri'], job['offset']) for job in jobs], media_uri, shots,
+                                      dedup['fingerprint'], completed_at),
+                          name=f"{prefix}ingest", config=retry)
+    return {
+        "mediaFileUri": media_uri,
+        "chunks": len(jobs),
+        "files": result['files'],
+        "polls": sum(job['polls'] for job in jobs),
+        "jobSeconds": round(completed_at - min(job['startedAt'] for job in jobs), 1),
+        "timings": merge_timings(dedup, shots, split, result),
+    }
+
+
+@durable_execution
+def lambda_handler(event: dict, context: DurableContext) -> dict:
+    uris = media_uris(event)
+    if not uris:
+        raise ValueError(f"No media in event: {event}")
+    videos = [embed_video(context, uri, f"{n}-" if len(uris) > 1 else "") for n, uri in enumerate(uris)]
+    for video in videos:
+        if video.get('duplicateOf'):
+            continue
+        emit_latency("embedding_job", video['jobSeconds'] * 1000, polls=video['polls'], chunks=video['chunks'])
+    return {"status": "INDEXED", "videos": videos}
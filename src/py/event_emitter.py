@@ -0,0 +1,109 @@
+import json
+import queue
+import threading
+import time
+
+# PutEvents accepts at most 10 entries per request
+PUT_EVENTS_MAX_ENTRIES = 10
+MAX_ENTRY_RETRIES = 3
+
+
+class EventEmitter:
+    """
+    Queues EventBridge entries and sends them from a background thread.
+    Entries are batched up to the PutEvents limit; entries that fail are
+    retried one by one. Call flush() before the handler returns or suspends.
+    """
+
+    def __init__(self, events_client, event_bus_name: str, source: str = "video.pipeline",
+                 detail_type: str = "video.processing.status", on_batch_sent=None):
+        self.events_client = events_client
+        self.event_bus_name = event_bus_name
+        self.source = source
+        self.detail_type = detail_type
+        # Optional callback(latency_ms, entry_count, replaying) for instrumentation
+        self.on_batch_sent = on_batch_sent
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def emit(self, detail: dict, replaying: bool = False):
+        """Queues a single event. Never blocks on EventBridge."""
+        self._queue.put(({
+            "Source": self.source,
+            "DetailType": self.detail_type,
+            "Detail": json.dumps(detail),
+            "EventBusName": self.event_bus_name,
+        }, replaying))
+        self._ensure_worker()
+
+    def flush(self, timeout: float = 10.0):
+        """Blocks until every queued event has been sent (or timeout elapses)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            self._ensure_worker()
+            time.sleep(0.005)
+        if self._queue.unfinished_tasks:
+            print(f"Event flush timed out with {self._queue.unfinished_tasks} events pending")
+
+    def _ensure_worker(self):
+        # Lambda freezes the process between invocations, so the worker may
+        # have to be restarted on a warm container.
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="event-emitter", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < PUT_EVENTS_MAX_ENTRIES:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            # Nothing may escape: the worker would die with the batch unacknowledged and flush() would hang
+            try:
+                self._send_batch([entry for entry, _ in batch])
+            except Exception as e:
+                print(f"Dropping {len(batch)} events: {e}")
+            if self.on_batch_sent:
+                latency_ms = (time.perf_counter() - start) * 1000
+                try:
+                    self.on_batch_sent(latency_ms, len(batch), all(replaying for _, replaying in batch))
+                except Exception as e:
+                    print(f"Event batch callback failed: {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def _send_batch(self, entries: list):
+        try:
+            response = self.events_client.put_events(Entries=entries)
+        except Exception as e:
+            print(f"Failed to send {len(entries)} events, retrying individually: {e}")
+            failed = entries
+        else:
+            # Results are returned in the same order as the request entries
+            failed = [
+                entry for entry, result in zip(entries, response.get("Entries", []))
+                if result.get("ErrorCode")
+            ]
+            print(f"Events sent: {len(entries) - len(failed)}/{len(entries)}")
+
+        for entry in failed:
+            self._send_single(entry)
+
+    def _send_single(self, entry: dict):
+        for attempt in range(1, MAX_ENTRY_RETRIES + 1):
+            try:
+                response = self.events_client.put_events(Entries=[entry])
+                result = response.get("Entries", [{}])[0]
+                if not result.get("ErrorCode"):
+                    return
+                error = f"{result.get('ErrorCode')}: {result.get('ErrorMessage')}"
+            except Exception as e:
+                error = str(e)
+            print(f"Event retry {attempt}/{MAX_ENTRY_RETRIES} failed: {error}")
+            time.sleep(0.1 * 2 ** (attempt - 1))
+        print(f"Dropping event after {MAX_ENTRY_RETRIES} retries: {entry['Detail']}")
@@ -0,0 +1,51 @@
+"""FFmpeg invocation shared by the media handlers (the layer binary unless FFMPEG_PATH is set)."""
+import os
+import re
+import subprocess
+
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH', '/opt/bin/ffmpeg')
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE = re.compile(r"Duration: .*?bitrate: (\d+) kb/s")
+_VIDEO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})\b.*")
+_FPS = re.compile(r", ([0-9.]+) fps")
+
+
+def run_ffmpeg(args: list, timeout: float = None) -> str:
+    """
+    Runs ffmpeg with `args` and returns its log (stderr), where filters such
+    as showinfo write their output. Raises CalledProcessError on failure.
+    """
+    result = subprocess.run([FFMPEG_PATH, '-hide_banner', *args], capture_output=True, text=True, errors='replace',
+                            timeout=timeout, check=True)
+    return result.stderr
+
+
+def parse_duration(log: str) -> float:
+    """Input duration in seconds from an ffmpeg log, or None if not reported."""
+    match = _DURATION.search(log)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def probe_media(input_path: str, timeout: float = 60) -> dict:
+    """
+    Duration, overall bitrate (kb/s) and first video stream size and frame
+    rate of a local file, from the header ffmpeg prints for its input. Values
+    ffmpeg didn't report are None.
+    """
+    # Without an output ffmpeg only prints the input header (and exits with an error)
+    log = subprocess.run([FFMPEG_PATH, '-hide_banner', '-i', input_path], capture_output=True, text=True,
+                         errors='replace', timeout=timeout).stderr
+    info = {'duration': parse_duration(log), 'bitrate_kbps': None, 'width': None, 'height': None, 'fps': None}
+    bitrate = _BITRATE.search(log)
+    if bitrate:
+        info['bitrate_kbps'] = int(bitrate.group(1))
+    video = _VIDEO_STREAM.search(log)
+    if video:
+        info['width'], info['height'] = int(video.group(1)), int(video.group(2))
+        fps = _FPS.search(video.group(0))
+        info['fps'] = float(fps.group(1)) if fps else None
+    return info
@@ -1,40 +1,73 @@
 import json
-import boto3
+import uuid
 import os
 
+from clients import TARGET_REGION, lazy_client
+from singleflight import INFLIGHT_TTL_SECONDS, make_lock_store, query_hash
+
 # Initialize Lambda Client
-target_region = os.environ.get('TARGET_REGION', 'us-east-2')
-lambda_client = boto3.client('lambda', region_name=target_region)
+lambda_client = lazy_client('lambda', region_name=TARGET_REGION, call_type='control')
 SEARCH_CUT_WORKFLOW_FUNCTION_ARN = os.environ.get('SEARCH_CUT_WORKFLOW_FUNCTION_ARN')
 
+# Identical in-flight queries attach to the running execution instead of starting a new one
+# (until it waits for approval), so callers share its status events
+lock_store = make_lock_store(region_name=TARGET_REGION)
+
+
 def handler(event, context):
+    """
+    search mutation: returns the requestId of the execution serving the query
+    (a new one, or the in-flight one it was coalesced onto), so the caller can
+    pick its status events out of the subscription; None if none was started.
+    """
     print(f"Received event: {json.dumps(event)}")
-    
+
     # AppSync invokes the lambda with "arguments"
     # Mutation: createOrder(input: String!)
     input_data = event.get('arguments', {}).get('text')
-    
-    
+    filters = event.get('arguments', {}).get('filters')
+
+
     if not input_data:
         print("No input provided")
-        return False
+        return None
+
+    request_id = str(uuid.uuid4())
+    inflight_key = query_hash(input_data, filters)
+
+    try:
+        existing = lock_store.acquire(inflight_key, request_id, INFLIGHT_TTL_SECONDS)
+    except Exception as e:
+        # Coalescing is an optimization; never block a search on it
+        print(f"In-flight lookup failed, starting a new execution: {e}")
+        existing = None
+
+    if existing:
+        print(f"Attaching to in-flight execution {existing['requestId']}")
+        return existing['requestId']
 
     try:
         # Construct the payload for the durable function
-      
-        payload = json.dumps({"query": input_data})
-        
+
+        payload = json.dumps({
+            "query": input_data,
+            "requestId": request_id,
+            "inflightKey": inflight_key,
+            "filters": filters,
+        })
+
         # Invoke the durable order function
         response = lambda_client.invoke(
             FunctionName=SEARCH_CUT_WORKFLOW_FUNCTION_ARN,
             InvocationType='Event', # Async invocation to start the process
             Payload=payload
         )
-        
+
         print(f"Invoked order function: {response}")
-        
-        return True
-    
+
+        return request_id
+
     except Exception as e:
         print(f"Error invoking order function: {e}")
-        return False
\ No newline at end of file
+        lock_store.release(inflight_key, request_id)
+        return None
@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from vector_snapshot import VectorSnapshot, normalize_rows
+
+# Rows scored per matrix-vector product; bounds the temporary score buffer
+SCAN_CHUNK_ROWS = 65536
+# int8 codes are widened to float32 per chunk; small chunks keep that copy in cache
+QUANTIZED_CHUNK_ROWS = 4096
+IVF_CENTROIDS_FILE = 'ivf_centroids.npy'
+IVF_ORDER_FILE = 'ivf_order.npy'
+IVF_OFFSETS_FILE = 'ivf_offsets.npy'
+# Shortlist re-scored in float32, as a multiple of top_k. PQ scores are much coarser than int8:
+# at 8x, recall@10 on 20k x 256 clustered rows (m=16, n_probe=8) was 0.6-0.96 against up to 1.0
+# for IVF alone; at 32x it matches IVF within 0.03 for about 0.2 ms more per query.
+RERANK_FACTOR = 8
+PQ_RERANK_FACTOR = 32
+
+
+# --- Metadata filters (same expression language as S3 Vectors) ---
+
+def _compare(value, op: str, operand) -> bool:
+    # Array metadata matches if any element matches
+    if isinstance(value, list) and op not in ('$exists',):
+        if op in ('$ne', '$nin'):
+            return all(_compare(v, op, operand) for v in value)
+        return any(_compare(v, op, operand) for v in value)
+    if op == '$exists':
+        return (value is not None) == bool(operand)
+    if value is None:
+        return op in ('$ne', '$nin')
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    if op == '$lte':
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata: dict, expression: dict) -> bool:
+    """Evaluates an S3 Vectors metadata filter against one metadata dict."""
+    for field, condition in expression.items():
+        if field == '$and':
+            if not all(matches_filter(metadata, e) for e in condition):
+                return False
+        elif field == '$or':
+            if not any(matches_filter(metadata, e) for e in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not all(_compare(metadata.get(field), op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(metadata.get(field), '$eq', condition):
+            return False
+    return True
+
+
+def filter_fields(expression: dict) -> set:
+    fields = set()
+    for field, condition in expression.items():
+        if field in ('$and', '$or'):
+            for e in condition:
+                fields |= filter_fields(e)
+        else:
+            fields.add(field)
+    return fields
+
+
+# --- IVF (inverted file) structure ---
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0, sample_size: int = 100000) -> np.ndarray:
+    """
+    Spherical k-means on L2-normalized rows (trained on a sample for large inputs).
+    Returns k normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                # Re-seed empty clusters so every list stays useful
+                centroids[c] = vectors[rng.integers(len(vectors))]
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Coarse clustering of the snapshot rows; search probes the closest lists only.
+    Rows appended to the snapshot after the IVF was built are always scanned.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: int = None, iterations: int = 20) -> 'IVFIndex':
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        centroids = kmeans(vectors, n_lists, iterations)
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCAN_CHUNK_ROWS):
+            chunk = np.asarray(vectors[start:start + SCAN_CHUNK_ROWS])
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=len(centroids)))
+        return cls(centroids, order, offsets)
+
+    def save(self, path: str):
+        np.save(os.path.join(path, IVF_CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, IVF_ORDER_FILE), self.order)
+        np.save(os.path.join(path, IVF_OFFSETS_FILE), self.offsets)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a saved IVF structure, or returns None if the snapshot has none."""
+        if not os.path.exists(os.path.join(path, IVF_CENTROIDS_FILE)):
+            return None
+        return cls(
+            np.load(os.path.join(path, IVF_CENTROIDS_FILE)),
+            np.load(os.path.join(path, IVF_ORDER_FILE), mmap_mode='r'),
+            np.load(os.path.join(path, IVF_OFFSETS_FILE)),
+        )
+
+    @property
+    def row_count(self) -> int:
+        return int(self.offsets[-1])
+
+    def candidates(self, query: np.ndarray, n_probe: int, total_rows: int) -> np.ndarray:
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        rows = [np.asarray(self.order[self.offsets[c]:self.offsets[c + 1]]) for c in lists]
+        rows.append(np.arange(self.row_count, total_rows, dtype=np.int64))
+        return np.sort(np.concatenate(rows))
+
+
+# --- Search engine ---
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[best], rows[best]
+    order = np.argsort(-scores, kind='stable')
+    return scores[order], rows[order]
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine search over a VectorSnapshot: exact brute force by default,
+    or IVF probing when an IVF structure is attached. When the snapshot carries
+    int8 codes or an IVF-PQ index (pq_index.IVFPQIndex), candidates are scored on
+    the compressed codes and the best `top_k * rerank_factor` (pq_rerank_factor
+    for PQ) are re-scored in float32.
+    """
+
+    def __init__(self, snapshot: VectorSnapshot, ivf: IVFIndex = None, n_probe: int = 8,
+                 rerank_factor: int = RERANK_FACTOR, pq=None, pq_rerank_factor: int = PQ_RERANK_FACTOR):
+        self.snapshot = snapshot
+        self.ivf = ivf
+        self.n_probe = n_probe
+        self.rerank_factor = rerank_factor
+        self.pq = pq
+        self.pq_rerank_factor = pq_rerank_factor
+
+    @classmethod
+    def open(cls, path: str, n_probe: int = 8, rerank_factor: int = RERANK_FACTOR,
+             pq_rerank_factor: int = PQ_RERANK_FACTOR) -> 'LocalVectorIndex':
+        from pq_index import IVFPQIndex
+        return cls(VectorSnapshot(path), IVFIndex.load(path), n_probe, rerank_factor, IVFPQIndex.load(path),
+                   pq_rerank_factor)
+
+    def _allowed_rows(self, filter_expression: dict):
+        """Boolean row mask for a filter, evaluated per source when possible."""
+        if not filter_expression:
+            return None
+        snapshot = self.snapshot
+        if not filter_fields(filter_expression) & {'segmentStartSeconds', 'segmentEndSeconds'}:
+            allowed = np.array([matches_filter(s, filter_expression) for s in snapshot.sources], dtype=bool)
+            return allowed[snapshot.segments['source']] if len(allowed) else np.zeros(snapshot.count, dtype=bool)
+        return np.array([matches_filter(snapshot.metadata(r), filter_expression) for r in range(snapshot.count)],
+                        dtype=bool)
+
+    def _score_rows(self, query: np.ndarray, rows, tables=None) -> np.ndarray:
+        """Scores rows (an index array or slice) on float32 vectors, or on int8 codes when tables are given."""
+        if tables is not None:
+            return self.snapshot.quantizer.scores(np.asarray(self.snapshot.codes[rows]), tables)
+        return np.asarray(self.snapshot.vectors[rows]) @ query
+
+    def _scan(self, query: np.ndarray, top_k: int, mask, tables=None):
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        chunk_size = QUANTIZED_CHUNK_ROWS if tables is not None else SCAN_CHUNK_ROWS
+        for start in range(0, self.snapshot.count, chunk_size):
+            chunk_scores = self._score_rows(query, slice(start, start + chunk_size), tables)
+            chunk_rows = np.arange(start, start + len(chunk_scores))
+            if mask is not None:
+                keep = mask[start:start + len(chunk_scores)]
+                chunk_scores, chunk_rows = chunk_scores[keep], chunk_rows[keep]
+            best_scores, best_rows = _top_k(np.concatenate([best_scores, chunk_scores]),
+                                            np.concatenate([best_rows, chunk_rows]), top_k)
+        return best_scores, best_rows
+
+    def search(self, query_vector, top_k: int = 1, filter_expression: dict = None, exact: bool = False) -> list:
+        """
+        Returns the top_k rows as query_vectors-style dicts:
+        {'key', 'distance' (cosine distance), 'metadata'}.
+        `exact` forces a brute-force float32 scan (when available) so the recall
+        of IVF probing and quantization can be measured against it.
+        """
+        snapshot = self.snapshot
+        if not snapshot.count:
+            return []
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        mask = self._allowed_rows(filter_expression)
+
+        use_codes = snapshot.codes is not None and not (exact and snapshot.vectors is not None)
+        tables = snapshot.quantizer.query_tables(query) if use_codes else None
+        use_pq = self.pq is not None and not exact
+        rerank = (use_codes or use_pq) and snapshot.vectors is not None
+        shortlist_k = top_k * (self.pq_rerank_factor if use_pq else self.rerank_factor) if rerank else top_k
+
+        if use_pq:
+            scores, rows = self.pq.search(query, shortlist_k, self.n_probe, mask)
+            tail = np.arange(self.pq.row_count, snapshot.count, dtype=np.int64)
+            if mask is not None:
+                tail = tail[mask[tail]]
+            if len(tail) and (snapshot.vectors is not None or use_codes):
+                # Rows appended after the PQ index was built are scored directly
+                scores, rows = _top_k(np.concatenate([scores, self._score_rows(query, tail, tables)]),
+                                      np.concatenate([rows, tail]), shortlist_k)
+        elif self.ivf is not None and not exact:
+            rows = self.ivf.candidates(query, self.n_probe, snapshot.count)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            scores, rows = _top_k(self._score_rows(query, rows, tables), rows, shortlist_k)
+        else:
+            scores, rows = self._scan(query, shortlist_k, mask, tables)
+
+        if rerank:
+            # Re-score the shortlist in float32; only these rows are paged in
+            order = np.argsort(rows)
+            rows = rows[order]
+            scores, rows = _top_k(self._score_rows(query, rows), rows, top_k)
+
+        return [
+            {
+                'key': self.snapshot.key(int(row)),
+                'distance': float(1.0 - score),
+                'metadata': self.snapshot.metadata(int(row)),
+            }
+            for score, row in zip(scores, rows)
+        ]
+
+
+class LocalVectorsClient:
+    """
+    Drop-in stand-in for the boto3 's3vectors' client's query_vectors call,
+    backed by a LocalVectorIndex. Useful for offline runs and tests.
+    """
+
+    def __init__(self, index: LocalVectorIndex, exact: bool = False):
+        self.index = index
+        self.exact = exact
+
+    def query_vectors(self, queryVector: dict, topK: int = 1, filter: dict = None, returnMetadata: bool = False,
+                      returnDistance: bool = False, **_):
+        vectors = self.index.search(queryVector['float32'], topK, filter, exact=self.exact)
+        for v in vectors:
+            if not returnMetadata:
+                v.pop('metadata')
+            if not returnDistance:
+                v.pop('distance')
+        return {'vectors': vectors}
+
+
+# --- Snapshot loading for Lambda ---
+
+_cached = {'uri': None, 'index': None, 'checked_at': 0.0}
+
+
+def _split_s3_uri(s3_uri: str):
+    bucket, _, prefix = s3_uri.replace("s3://", "").partition("/")
+    return bucket, prefix.rstrip('/') + '/'
+
+
+def _remote_created_at(s3_client, s3_uri: str) -> float:
+    bucket, prefix = _split_s3_uri(s3_uri)
+    body = s3_client.get_object(Bucket=bucket, Key=prefix + 'manifest.json')['Body'].read()
+    return json.loads(body).get('created_at', 0)
+
+
+def _sync_from_s3(s3_client, s3_uri: str, local_dir: str):
+    bucket, prefix = _split_s3_uri(s3_uri)
+    os.makedirs(local_dir, exist_ok=True)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    keys = [obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix) for obj in page.get('Contents', [])]
+    # Manifest last so a partially downloaded snapshot never looks complete
+    keys.sort(key=lambda k: k.endswith('manifest.json'))
+    for key in keys:
+        s3_client.download_file(bucket, key, os.path.join(local_dir, key[len(prefix):]))
+
+
+def load_local_index(snapshot_uri: str, s3_client=None, refresh_seconds: float = 300, n_probe: int = 8):
+    """
+    Returns (index, cache_hit). Snapshots under s3:// are synced to /tmp once per
+    container; every `refresh_seconds` only the manifest is re-read and the files
+    are downloaded again when a newer export exists. Local paths are opened directly.
+    """
+    now = time.time()
+    cached = _cached['index']
+    if _cached['uri'] == snapshot_uri and cached is not None:
+        if now - _cached['checked_at'] < refresh_seconds:
+            return cached, True
+        if not snapshot_uri.startswith("s3://") or _remote_created_at(s3_client, snapshot_uri) <= cached.snapshot.created_at:
+            _cached['checked_at'] = now
+            return cached, True
+
+    path = snapshot_uri
+    if snapshot_uri.startswith("s3://"):
+        path = os.path.join('/tmp', 'snapshot', str(int(now * 1000)))
+        _sync_from_s3(s3_client, snapshot_uri, path)
+
+    index = LocalVectorIndex.open(path, n_probe=n_probe)
+    if cached is not None and cached.snapshot.path.startswith('/tmp/snapshot/'):
+        # Memory maps stay valid after unlink; this only frees /tmp space
+        shutil.rmtree(cached.snapshot.path, ignore_errors=True)
+    _cached.update(uri=snapshot_uri, index=index, checked_at=now)
+    return index, False
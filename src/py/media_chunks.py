@@ -0,0 +1,84 @@
+"""Splits long uploads into stream-copied chunks that are embedded as separate jobs."""
+import csv
+import io
+import os
+import shutil
+import subprocess
+import uuid
+
+from clients import S3_TRANSFER_CONCURRENCY, lazy_client
+from ffmpeg_utils import run_ffmpeg
+from media_transfer import download, upload
+from video_cut import parse_s3_uri
+
+CHUNK_SECONDS = int(os.environ.get('EMBEDDING_CHUNK_SECONDS', '600'))
+SPLIT_TIMEOUT_SECONDS = 780
+
+s3_client = lazy_client('s3', call_type='transfer', concurrency=S3_TRANSFER_CONCURRENCY)
+
+
+def split_args(input_path: str, output_pattern: str, list_path: str, chunk_seconds: int = CHUNK_SECONDS) -> list:
+    """ffmpeg arguments that stream-copy the first video and the audio streams into ~chunk_seconds MP4s."""
+    return [
+        "-nostats",
+        "-i", input_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(chunk_seconds),
+        "-segment_format", "mp4",
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        output_pattern,
+    ]
+
+
+def parse_segment_list(text: str) -> list:
+    """(file name, start, end) rows of an ffmpeg csv segment list."""
+    return [(row[0], float(row[1]), float(row[2])) for row in csv.reader(io.StringIO(text)) if len(row) >= 3]
+
+
+def chunks_prefix(media_key: str) -> str:
+    return f"chunks/{media_key}/"
+
+
+def whole_source(media_uri: str, duration: float = None) -> list:
+    return [{"uri": media_uri, "start": 0.0, "end": duration}]
+
+
+def split_media(media_uri: str, duration: float = None, chunk_seconds: int = CHUNK_SECONDS) -> list:
+    """
+    Chunks [{uri, start, end}] of an uploaded video, in source time. Videos
+    of unknown length or no longer than chunk_seconds (and videos ffmpeg
+    can't split) are a single chunk: the source itself.
+    """
+    if not duration or duration <= chunk_seconds:
+        return whole_source(media_uri, duration)
+
+    bucket, key = parse_s3_uri(media_uri)
+    work_dir = f"/tmp/{uuid.uuid4()}"
+    os.makedirs(work_dir)
+    input_path = os.path.join(work_dir, "input")
+    list_path = os.path.join(work_dir, "chunks.csv")
+    try:
+        download(s3_client, bucket, key, input_path)
+        run_ffmpeg(split_args(input_path, os.path.join(work_dir, "chunk-%04d.mp4"), list_path, chunk_seconds),
+                   timeout=SPLIT_TIMEOUT_SECONDS)
+        with open(list_path) as f:
+            segments = parse_segment_list(f.read())
+        if len(segments) < 2:
+            return whole_source(media_uri, duration)
+
+        chunks = []
+        for name, start, end in segments:
+            chunk_key = f"{chunks_prefix(key)}{name}"
+            upload(s3_client, os.path.join(work_dir, name), bucket, chunk_key, extra_args={'ContentType': 'video/mp4'})
+            chunks.append({"uri": f"s3://{bucket}/{chunk_key}", "start": start, "end": end})
+        print(f"Split {media_uri} ({duration:.1f}s) into {len(chunks)} chunks")
+        return chunks
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+        print(f"Splitting {media_uri} failed, embedding it as one job: {e}")
+        return whole_source(media_uri, duration)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
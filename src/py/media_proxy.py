@@ -0,0 +1,62 @@
+"""Lower-resolution proxies of large uploads, embedded instead of the original."""
+import os
+import time
+
+from ffmpeg_utils import probe_media, run_ffmpeg
+
+PROXY_ENABLED = os.environ.get('EMBEDDING_PROXY', 'false').lower() == 'true'
+PROXY_MAX_HEIGHT = int(os.environ.get('PROXY_MAX_HEIGHT', '720'))
+PROXY_MAX_FPS = int(os.environ.get('PROXY_MAX_FPS', '30'))
+# Sources within the size and frame rate caps are still transcoded above this bitrate
+PROXY_MAX_BITRATE_KBPS = int(os.environ.get('PROXY_MAX_BITRATE_KBPS', '5000'))
+PROXY_PRESET = 'veryfast'
+PROXY_CRF = 26
+PROXY_AUDIO_BITRATE = '128k'
+PROXY_TIMEOUT_SECONDS = 780
+
+
+def proxy_key(media_key: str) -> str:
+    return f"proxies/{media_key}.mp4"
+
+
+def needs_proxy(info: dict) -> bool:
+    """Whether a probed source (ffmpeg_utils.probe_media) exceeds the proxy caps."""
+    return bool(
+        (info.get('height') or 0) > PROXY_MAX_HEIGHT
+        or (info.get('fps') or 0) > PROXY_MAX_FPS + 0.5
+        or (info.get('bitrate_kbps') or 0) > PROXY_MAX_BITRATE_KBPS
+    )
+
+
+def proxy_args(input_path: str, output_path: str) -> list:
+    """ffmpeg arguments for a proxy capped at PROXY_MAX_HEIGHT and PROXY_MAX_FPS, keeping the audio."""
+    return [
+        "-nostats",
+        "-i", input_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-vf", f"scale=-2:'min({PROXY_MAX_HEIGHT},ih)'",
+        "-fpsmax", str(PROXY_MAX_FPS),
+        "-c:v", "libx264", "-preset", PROXY_PRESET, "-crf", str(PROXY_CRF), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", PROXY_AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        "-y", output_path,
+    ]
+
+
+def make_proxy(input_path: str, output_path: str, timeout: float = PROXY_TIMEOUT_SECONDS) -> bool:
+    """
+    Transcodes input_path to output_path if proxies are on and the source
+    exceeds the caps, within timeout seconds (probe included). Returns whether
+    a proxy was written; raises CalledProcessError/TimeoutExpired if ffmpeg
+    fails or runs out of time.
+    """
+    if not PROXY_ENABLED:
+        return False
+    started = time.monotonic()
+    info = probe_media(input_path, timeout=min(60, timeout))
+    if not needs_proxy(info):
+        return False
+    run_ffmpeg(proxy_args(input_path, output_path), timeout=timeout - (time.monotonic() - started))
+    print(f"Proxy of {info['width']}x{info['height']} @ {info['fps']} fps, {info['bitrate_kbps']} kb/s: "
+          f"{os.path.getsize(input_path)} -> {os.path.getsize(output_path)} bytes")
+    return True
@@ -0,0 +1,132 @@
+"""S3 media transfers sized to the object and the function memory, with resumable uploads."""
+import base64
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clients import LAMBDA_MEMORY_MB, S3_TRANSFER_CONCURRENCY
+from metrics import emit_throughput
+
+MIB = 1024 * 1024
+MIN_PART_BYTES = 8 * MIB
+MAX_PART_BYTES = 512 * MIB
+# S3's limit on parts per upload
+MAX_PARTS = 10000
+PARTS_PER_THREAD = 4
+TRANSFER_MEMORY_FRACTION = 0.25
+RESUMABLE_UPLOAD_MIN_BYTES = int(os.environ.get('RESUMABLE_UPLOAD_MIN_BYTES', str(512 * MIB)))
+
+
+def transfer_plan(size: int, memory_mb: int = LAMBDA_MEMORY_MB,
+                  max_threads: int = S3_TRANSFER_CONCURRENCY) -> tuple:
+    """(part size, threads) for transferring `size` bytes."""
+    memory_budget = int(memory_mb * MIB * TRANSFER_MEMORY_FRACTION)
+    part = -(-size // (max_threads * PARTS_PER_THREAD))
+    # At least two parts fit in the memory budget, within S3's part count limit
+    part = max(MIN_PART_BYTES, min(part, MAX_PART_BYTES, memory_budget // 2), -(-size // MAX_PARTS))
+    part = -(-part // MIB) * MIB
+    threads = max(1, min(max_threads, memory_budget // part, -(-size // part)))
+    return part, threads
+
+
+def transfer_config(size: int):
+    """boto3 TransferConfig for a managed transfer of `size` bytes."""
+    from boto3.s3.transfer import TransferConfig
+    part, threads = transfer_plan(size)
+    return TransferConfig(multipart_threshold=MIN_PART_BYTES, multipart_chunksize=part, max_concurrency=threads)
+
+
+def _report(direction: str, size: int, started: float, part: int, threads: int, **properties) -> dict:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    emit_throughput(direction, size, elapsed_ms, part_bytes=part, threads=threads, **properties)
+    return {"bytes": size, "ms": round(elapsed_ms, 3), "mb_per_s": round(size / MIB / max(elapsed_ms / 1000, 1e-6), 1)}
+
+
+def download(s3_client, bucket: str, key: str, path: str, size: int = None) -> dict:
+    """Downloads s3://bucket/key to path. Returns {bytes, ms, mb_per_s}."""
+    if size is None:
+        size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+    part, threads = transfer_plan(size)
+    started = time.perf_counter()
+    s3_client.download_file(bucket, key, path, Config=transfer_config(size))
+    return _report("download", size, started, part, threads)
+
+
+def upload(s3_client, path: str, bucket: str, key: str, extra_args: dict = None) -> dict:
+    """
+    Uploads path to s3://bucket/key, resumably from RESUMABLE_UPLOAD_MIN_BYTES
+    on. Returns {bytes, ms, mb_per_s}.
+    """
+    size = os.path.getsize(path)
+    part, threads = transfer_plan(size)
+    started = time.perf_counter()
+    if size >= RESUMABLE_UPLOAD_MIN_BYTES:
+        resumed = resumable_upload(s3_client, path, bucket, key, part, threads, extra_args)
+        return _report("upload", size, started, part, threads, resumed_parts=resumed)
+    s3_client.upload_file(path, bucket, key, ExtraArgs=extra_args or None, Config=transfer_config(size))
+    return _report("upload", size, started, part, threads)
+
+
+def _read_part(path: str, number: int, part_size: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek((number - 1) * part_size)
+        return f.read(part_size)
+
+
+def _checksum(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def _unfinished_upload(s3_client, bucket: str, key: str):
+    """Id of the most recent unfinished multipart upload of key, if any."""
+    uploads = [u for u in s3_client.list_multipart_uploads(Bucket=bucket, Prefix=key).get('Uploads', [])
+               if u['Key'] == key]
+    return max(uploads, key=lambda u: u['Initiated'])['UploadId'] if uploads else None
+
+
+def _uploaded_parts(s3_client, bucket: str, key: str, upload_id: str) -> dict:
+    parts = {}
+    for page in s3_client.get_paginator('list_parts').paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+        for part in page.get('Parts', []):
+            parts[part['PartNumber']] = part
+    return parts
+
+
+def resumable_upload(s3_client, path: str, bucket: str, key: str, part_size: int, threads: int,
+                     extra_args: dict = None) -> int:
+    """
+    Multipart upload of path with SHA-256 part checksums, resuming the key's
+    unfinished upload if its parts have the same size. Returns how many parts
+    were already uploaded.
+    """
+    size = os.path.getsize(path)
+    part_count = max(1, -(-size // part_size))
+    upload_id = _unfinished_upload(s3_client, bucket, key)
+    existing = _uploaded_parts(s3_client, bucket, key, upload_id) if upload_id else {}
+    if existing and any(p['Size'] != part_size for n, p in existing.items() if n < part_count):
+        # Uploaded with another part size (e.g. different memory setting): start over
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        upload_id, existing = None, {}
+    if not upload_id:
+        upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ChecksumAlgorithm='SHA256',
+                                                      **(extra_args or {}))['UploadId']
+
+    def send(number: int) -> dict:
+        data = _read_part(path, number, part_size)
+        checksum = _checksum(data)
+        uploaded = existing.get(number)
+        if uploaded and uploaded.get('ChecksumSHA256') == checksum:
+            return {'PartNumber': number, 'ETag': uploaded['ETag'], 'ChecksumSHA256': checksum, 'resumed': True}
+        response = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data,
+                                         ChecksumAlgorithm='SHA256', ChecksumSHA256=checksum)
+        return {'PartNumber': number, 'ETag': response['ETag'], 'ChecksumSHA256': checksum, 'resumed': False}
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        parts = list(pool.map(send, range(1, part_count + 1)))
+    resumed = sum(part.pop('resumed') for part in parts)
+    s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                        MultipartUpload={'Parts': parts})
+    if resumed:
+        print(f"Resumed upload of s3://{bucket}/{key}: {resumed}/{part_count} parts were already uploaded")
+    return resumed
@@ -0,0 +1,139 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VideoAgent/SearchCut')
+FUNCTION_VERSION = os.environ.get('AWS_LAMBDA_FUNCTION_VERSION', '$LATEST')
+
+
+def emit_latency(phase: str, latency_ms: float, replaying: bool = False, cache_hit: bool = False, **properties):
+    """
+    Prints one CloudWatch Embedded Metric Format line for a phase latency.
+    The FunctionVersion dimension set makes regressions visible per deploy.
+    """
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Phase", "Mode", "CacheHit"], ["Phase", "FunctionVersion"]],
+                    "Metrics": [{"Name": "Latency", "Unit": "Milliseconds"}],
+                }
+            ],
+        },
+        "Phase": phase,
+        "Mode": "replay" if replaying else "live",
+        "CacheHit": str(bool(cache_hit)).lower(),
+        "FunctionVersion": FUNCTION_VERSION,
+        "Latency": round(latency_ms, 3),
+        **properties,
+    }
+    print(json.dumps(record))
+
+
+def emit_throughput(direction: str, size_bytes: int, latency_ms: float, **properties):
+    """One EMF line for an S3 transfer (direction 'download' or 'upload'): its size, latency and throughput."""
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Direction"], ["Direction", "FunctionVersion"]],
+                    "Metrics": [
+                        {"Name": "TransferThroughput", "Unit": "Megabytes/Second"},
+                        {"Name": "TransferBytes", "Unit": "Bytes"},
+                        {"Name": "TransferLatency", "Unit": "Milliseconds"},
+                    ],
+                }
+            ],
+        },
+        "Direction": direction,
+        "FunctionVersion": FUNCTION_VERSION,
+        "TransferThroughput": round(size_bytes / 1024 / 1024 / max(latency_ms / 1000, 1e-6), 3),
+        "TransferBytes": size_bytes,
+        "TransferLatency": round(latency_ms, 3),
+        **properties,
+    }))
+
+
+def emit_checkpoint_size(step: str, size_bytes: int, offloaded: bool = False, **properties):
+    """One EMF line for the checkpointed size of a step result (a pointer's size when offloaded to S3)."""
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Step", "Offloaded"], ["Step", "FunctionVersion"]],
+                    "Metrics": [{"Name": "CheckpointBytes", "Unit": "Bytes"}],
+                }
+            ],
+        },
+        "Step": step,
+        "Offloaded": str(bool(offloaded)).lower(),
+        "FunctionVersion": FUNCTION_VERSION,
+        "CheckpointBytes": size_bytes,
+        **properties,
+    }))
+
+
+def emit_connection_stats(stats: list):
+    """One EMF line per client with its request count and new vs reused connections."""
+    for client in stats:
+        if not client['requests']:
+            continue
+        print(json.dumps({
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["Service", "CallType"]],
+                        "Metrics": [
+                            {"Name": "Requests", "Unit": "Count"},
+                            {"Name": "NewConnections", "Unit": "Count"},
+                            {"Name": "ReusedConnections", "Unit": "Count"},
+                        ],
+                    }
+                ],
+            },
+            "Service": client['service'],
+            "CallType": client['call_type'],
+            "Requests": client['requests'],
+            "NewConnections": client['connections'],
+            "ReusedConnections": client['reused'],
+            "PoolSize": client['pool_size'],
+        }))
+
+
+class PhaseTimer:
+    """
+    Times named phases of a step. Each phase is emitted as an EMF line and
+    kept in `timings` (milliseconds) so it can be returned in the step result.
+    """
+
+    def __init__(self, replaying: bool = False):
+        self.replaying = replaying
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name: str, cache_hit: bool = False):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0) + elapsed_ms, 3)
+            emit_latency(name, elapsed_ms, replaying=self.replaying, cache_hit=cache_hit)
+
+
+def merge_timings(*step_results) -> dict:
+    """Sums the `timings` of checkpointed step results (replay-safe)."""
+    merged = {}
+    for result in step_results:
+        for phase, ms in ((result or {}).get('timings') or {}).items():
+            merged[phase] = round(merged.get(phase, 0) + ms, 3)
+    return merged
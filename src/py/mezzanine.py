@@ -0,0 +1,135 @@
+"""Shot-aligned mezzanine chunks of each upload, so clips are cut without the whole source."""
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from ffmpeg_utils import run_ffmpeg
+
+MEZZANINE_ENABLED = os.environ.get('MEZZANINE_CHUNKS', 'false').lower() == 'true'
+# Shot boundaries closer than this to the previous chunk start don't start a new chunk
+MEZZANINE_MIN_CHUNK_SECONDS = 2
+MEZZANINE_TIMEOUT_SECONDS = 300
+# Parallel chunk uploads/downloads
+MEZZANINE_TRANSFER_THREADS = 10
+
+
+def mezzanine_prefix(media_key: str) -> str:
+    return f"mezzanine/{media_key}/"
+
+
+def index_key(media_key: str) -> str:
+    return f"{mezzanine_prefix(media_key)}index.json"
+
+
+def split_times(shots: list, min_seconds: float = MEZZANINE_MIN_CHUNK_SECONDS) -> list:
+    """Chunk start times after 0: the shot starts, at least min_seconds apart."""
+    times = []
+    for shot in shots:
+        if shot['start'] - (times[-1] if times else 0.0) >= min_seconds:
+            times.append(shot['start'])
+    return times
+
+
+def segment_args(input_path: str, output_pattern: str, list_path: str, times: list) -> list:
+    """ffmpeg arguments that stream-copy the first video and the audio streams into fMP4 chunks split at `times`."""
+    args = [
+        "-nostats",
+        "-i", input_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_format", "mp4",
+        "-segment_format_options", "movflags=+frag_keyframe+empty_moov+default_base_moof",
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+    ]
+    if times:
+        args += ["-segment_times", ",".join(f"{t:.3f}" for t in times)]
+    else:
+        # A single shot: one chunk covering the whole source
+        args += ["-segment_time", "86400"]
+    return args + [output_pattern]
+
+
+def parse_segment_list(text: str) -> list:
+    """(file name, start, end) rows of an ffmpeg csv segment list."""
+    return [(row[0], float(row[1]), float(row[2])) for row in csv.reader(io.StringIO(text)) if len(row) >= 3]
+
+
+def build_mezzanine(s3_client, input_path: str, bucket: str, media_key: str, shots: list, work_dir: str,
+                    timeout: float = MEZZANINE_TIMEOUT_SECONDS) -> str:
+    """
+    Remuxes a local copy of the upload into chunks split at its shots (within
+    timeout seconds), uploads them and their index, and returns the index URI.
+    Raises CalledProcessError/TimeoutExpired if ffmpeg fails.
+    """
+    list_path = os.path.join(work_dir, "chunks.csv")
+    run_ffmpeg(segment_args(input_path, os.path.join(work_dir, "%05d.mp4"), list_path, split_times(shots)),
+               timeout=timeout)
+    with open(list_path) as f:
+        segments = parse_segment_list(f.read())
+
+    prefix = mezzanine_prefix(media_key)
+
+    def upload(segment):
+        name, start, end = segment
+        s3_client.upload_file(os.path.join(work_dir, name), bucket, f"{prefix}{name}",
+                              ExtraArgs={'ContentType': 'video/mp4'})
+        return {"key": f"{prefix}{name}", "start": round(start, 3), "end": round(end, 3)}
+
+    with ThreadPoolExecutor(max_workers=MEZZANINE_TRANSFER_THREADS) as pool:
+        chunks = list(pool.map(upload, segments))
+    s3_client.put_object(Bucket=bucket, Key=index_key(media_key), ContentType='application/json',
+                         Body=json.dumps({"mediaFileUri": f"s3://{bucket}/{media_key}", "chunks": chunks}))
+    print(f"Wrote {len(chunks)} mezzanine chunks for s3://{bucket}/{media_key}")
+    return f"s3://{bucket}/{index_key(media_key)}"
+
+
+def load_index(s3_client, bucket: str, media_key: str):
+    """The source's chunk index, or None if it has none (uploaded before chunking, or chunking failed)."""
+    try:
+        return json.loads(s3_client.get_object(Bucket=bucket, Key=index_key(media_key))['Body'].read())
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+
+
+def alias_index(s3_client, bucket: str, media_key: str, alias_key: str) -> bool:
+    """
+    Gives alias_key (an upload with identical content, see dedup_upload.py)
+    an index pointing at media_key's chunks. Returns whether there were any.
+    """
+    index = load_index(s3_client, bucket, media_key)
+    if not index:
+        return False
+    s3_client.put_object(Bucket=bucket, Key=index_key(alias_key), ContentType='application/json',
+                         Body=json.dumps({**index, "mediaFileUri": f"s3://{bucket}/{alias_key}"}))
+    return True
+
+
+def covering_chunks(chunks: list, start_time: float, end_time: float) -> list:
+    """The consecutive chunks that cover [start_time, end_time]."""
+    covering = [c for c in chunks if c['end'] > start_time and c['start'] < end_time]
+    return covering or [c for c in chunks if c['start'] <= start_time][-1:]
+
+
+def download_chunks(s3_client, bucket: str, chunks: list, work_dir: str) -> list:
+    """Downloads chunks in parallel; returns their local paths in order."""
+    def download(chunk):
+        path = os.path.join(work_dir, os.path.basename(chunk['key']))
+        s3_client.download_file(bucket, chunk['key'], path)
+        return path
+
+    with ThreadPoolExecutor(max_workers=MEZZANINE_TRANSFER_THREADS) as pool:
+        return list(pool.map(download, chunks))
+
+
+def concat_list(paths: list) -> str:
+    """concat demuxer input listing `paths`."""
+    return "".join(f"file '{path}'\n" for path in paths)
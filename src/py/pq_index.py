@@ -0,0 +1,261 @@
+"""
+Product quantization (PQ) over a vector snapshot, for catalogues too large to
+keep as float32 or int8.
+
+Each vector is split into `m` sub-vectors and every sub-vector is replaced by the
+id of its nearest centroid in a per-subspace codebook of 256 entries, so a
+1024-dim float32 vector (4 KB) becomes `m` bytes (64 bytes with the default
+m = dimension / 16). Search uses asymmetric distance computation (ADC): the
+query stays float32, one m x 256 table of sub-vector inner products is computed
+per query, and a row's score is the sum of m table lookups.
+
+IVFPQIndex combines this with the IVF lists from local_search: rows are encoded
+as residuals to their list centroid, and a row's score is
+    query . centroid + sum_j table[j, code_j]
+ADC scores are coarse, so search re-scores a longer float32 shortlist than for
+int8 (local_search.PQ_RERANK_FACTOR); without float32 vectors recall drops.
+
+Files (written next to the snapshot, IVF lists shared with IVFIndex):
+    ivf_centroids.npy, ivf_order.npy, ivf_offsets.npy
+    pq_codebooks.npy    m x 256 x (dimension / m) float32
+    pq_codes.npy        count x m uint8, in IVF list order
+
+Training and encoding run offline on CPU:
+    python pq_index.py --snapshot /data/snapshot build --jsonl out/*.jsonl --source-uri s3://media/video.mp4
+"""
+import os
+
+import numpy as np
+
+from local_search import SCAN_CHUNK_ROWS, IVFIndex, _top_k
+from vector_snapshot import VectorSnapshot
+
+PQ_CODEBOOKS_FILE = 'pq_codebooks.npy'
+PQ_CODES_FILE = 'pq_codes.npy'
+PQ_CENTROIDS = 256
+# Sub-vector width for the default number of subspaces
+PQ_SUBVECTOR_DIMENSION = 16
+
+
+def kmeans_l2(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Euclidean k-means (sub-vectors are not normalized, unlike local_search.kmeans)."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = nearest_l2(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.add.reduceat(vectors[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        # Re-seed empty clusters so every code stays useful
+        centroids[empty] = vectors[rng.integers(len(vectors), size=int(empty.sum()))]
+    return centroids
+
+
+def nearest_l2(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||x - c||^2 == argmax (x . c - ||c||^2 / 2)
+    return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+
+class ProductQuantizer:
+    """m codebooks of up to 256 centroids, one per contiguous subspace."""
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.m, self.ks, self.dsub = self.codebooks.shape
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int = None, ks: int = PQ_CENTROIDS, iterations: int = 20,
+              seed: int = 0) -> 'ProductQuantizer':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dimension = vectors.shape[1]
+        m = m or max(1, dimension // PQ_SUBVECTOR_DIMENSION)
+        if dimension % m:
+            raise ValueError(f"Dimension {dimension} is not divisible into {m} subspaces")
+        if ks > PQ_CENTROIDS:
+            raise ValueError(f"At most {PQ_CENTROIDS} centroids per subspace fit in a uint8 code")
+        dsub = dimension // m
+        ks = min(ks, len(vectors))
+        codebooks = np.stack([
+            kmeans_l2(vectors[:, j * dsub:(j + 1) * dsub], ks, iterations, seed + j) for j in range(m)
+        ])
+        return cls(codebooks)
+
+    @property
+    def dimension(self) -> int:
+        return self.m * self.dsub
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_l2(vectors[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def inner_product_tables(self, query: np.ndarray) -> np.ndarray:
+        """m x ks table of query sub-vector . centroid, computed once per query."""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, 1, self.dsub)
+        return np.sum(self.codebooks * query, axis=2)
+
+    def adc_scores(self, codes: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        """Approximate query . x for every coded row: sum of m table lookups."""
+        flat = tables.ravel()
+        scores = np.empty(len(codes), dtype=np.float32)
+        lookup_offsets = np.arange(self.m, dtype=np.intp) * self.ks
+        for start in range(0, len(codes), SCAN_CHUNK_ROWS):
+            chunk = np.asarray(codes[start:start + SCAN_CHUNK_ROWS], dtype=np.intp)
+            scores[start:start + len(chunk)] = flat[chunk + lookup_offsets].sum(axis=1)
+        return scores
+
+
+class IVFPQIndex:
+    """
+    IVF lists over the snapshot with PQ-coded residuals. Only the centroids,
+    codebooks and codes are needed for search, so the float32 vectors can stay
+    on disk (for re-scoring) or be dropped entirely.
+    """
+
+    def __init__(self, ivf: IVFIndex, pq: ProductQuantizer, codes: np.ndarray):
+        self.ivf = ivf
+        self.pq = pq
+        self.codes = codes
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: int = None, m: int = None, iterations: int = 20,
+              sample_size: int = 100000, seed: int = 0) -> 'IVFPQIndex':
+        ivf = IVFIndex.build(vectors, n_lists, iterations)
+        list_sizes = np.diff(ivf.offsets)
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        assignment[ivf.order] = np.repeat(np.arange(len(ivf.centroids)), list_sizes)
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(vectors), min(len(vectors), sample_size), replace=False))
+        residuals = np.asarray(vectors[sample]) - ivf.centroids[assignment[sample]]
+        pq = ProductQuantizer.train(residuals, m, iterations=iterations, seed=seed)
+
+        # Codes are stored in list order so a probe reads one contiguous block
+        codes = np.empty((len(vectors), pq.m), dtype=np.uint8)
+        for start in range(0, len(vectors), SCAN_CHUNK_ROWS):
+            rows = np.asarray(ivf.order[start:start + SCAN_CHUNK_ROWS])
+            residuals = np.asarray(vectors[rows]) - ivf.centroids[assignment[rows]]
+            codes[start:start + len(rows)] = pq.encode(residuals)
+        return cls(ivf, pq, codes)
+
+    def save(self, path: str):
+        self.ivf.save(path)
+        np.save(os.path.join(path, PQ_CODEBOOKS_FILE), self.pq.codebooks)
+        np.save(os.path.join(path, PQ_CODES_FILE), self.codes)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a saved IVF-PQ index, or returns None if the snapshot has none."""
+        if not os.path.exists(os.path.join(path, PQ_CODES_FILE)):
+            return None
+        return cls(
+            IVFIndex.load(path),
+            ProductQuantizer(np.load(os.path.join(path, PQ_CODEBOOKS_FILE))),
+            np.load(os.path.join(path, PQ_CODES_FILE), mmap_mode='r'),
+        )
+
+    @property
+    def row_count(self) -> int:
+        return self.ivf.row_count
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.pq.codebooks.nbytes + self.ivf.centroids.nbytes + self.ivf.order.nbytes
+
+    def search(self, query: np.ndarray, top_k: int, n_probe: int, mask=None):
+        """Returns (scores, rows) of the best rows in the n_probe closest lists."""
+        coarse = self.ivf.centroids @ query
+        n_probe = min(n_probe, len(coarse))
+        lists = np.argpartition(-coarse, n_probe - 1)[:n_probe]
+        tables = self.pq.inner_product_tables(query)
+
+        all_scores, all_rows = [], []
+        for c in lists:
+            start, end = self.ivf.offsets[c], self.ivf.offsets[c + 1]
+            if start == end:
+                continue
+            rows = np.asarray(self.ivf.order[start:end])
+            codes = self.codes[start:end]
+            if mask is not None:
+                keep = mask[rows]
+                rows, codes = rows[keep], np.asarray(codes)[keep]
+            all_scores.append(coarse[c] + self.pq.adc_scores(codes, tables))
+            all_rows.append(rows)
+        if not all_rows:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        return _top_k(np.concatenate(all_scores), np.concatenate(all_rows), top_k)
+
+
+def build_pq_index(path: str, n_lists: int = None, m: int = None) -> IVFPQIndex:
+    """Trains and saves an IVF-PQ index for a snapshot with float32 vectors."""
+    snapshot = VectorSnapshot(path)
+    if snapshot.vectors is None:
+        raise ValueError("Snapshot has no float32 vectors to train on")
+    index = IVFPQIndex.build(snapshot.vectors, n_lists, m)
+    index.save(path)
+    return index
+
+
+def main(argv=None):
+    import argparse
+
+    from local_search import LocalVectorIndex
+    from quantization import recall_at_k
+    from vector_snapshot import SnapshotWriter, append_records, drop_float32_vectors, records_from_jsonl
+
+    parser = argparse.ArgumentParser(description="Train a product-quantized IVF index over a vector snapshot.")
+    parser.add_argument('--snapshot', required=True, help="Local snapshot directory")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Train codebooks, encode all rows and save the index")
+    build.add_argument('--jsonl', nargs='*', default=[], help="Bedrock JSONL outputs to append to the snapshot first")
+    build.add_argument('--source-uri', help="s3:// URI of the source video of the JSONL files")
+    build.add_argument('--lists', type=int, help="Number of IVF lists (default sqrt(count))")
+    build.add_argument('--subspaces', type=int, help="PQ subspaces m, bytes per vector (default dimension / 16)")
+    build.add_argument('--drop-float32', action='store_true', help="Remove float32 vectors after encoding")
+    build.add_argument('--eval-queries', type=int, default=100, help="Sampled rows used to report recall@10")
+    args = parser.parse_args(argv)
+
+    if args.jsonl:
+        writer = SnapshotWriter(args.snapshot)
+        for file in args.jsonl:
+            with open(file, 'rb') as lines:
+                append_records(writer, records_from_jsonl(lines, args.source_uri))
+        writer.commit()
+
+    snapshot = VectorSnapshot(args.snapshot)
+    index = build_pq_index(args.snapshot, args.lists, args.subspaces)
+    print(f"IVF-PQ over {snapshot.count} vectors: {len(index.ivf.centroids)} lists, {index.pq.m} bytes/vector, "
+          f"{index.nbytes / 1e6:.1f} MB vs {snapshot.count * snapshot.dimension * 4 / 1e6:.1f} MB float32")
+
+    if args.eval_queries and snapshot.count:
+        exact_index = LocalVectorIndex(snapshot)
+        pq_index = LocalVectorIndex(snapshot, pq=index)
+        rng = np.random.default_rng(0)
+        queries = rng.choice(snapshot.count, min(args.eval_queries, snapshot.count), replace=False)
+        recalls = []
+        for row in queries:
+            query = np.asarray(snapshot.vectors[row])
+            exact = [r['key'] for r in exact_index.search(query, 10, exact=True)]
+            approx = [r['key'] for r in pq_index.search(query, 10)]
+            recalls.append(recall_at_k(exact, approx))
+        print(f"recall@10 with float32 re-scoring: {np.mean(recalls):.3f}")
+
+    if args.drop_float32:
+        drop_float32_vectors(args.snapshot)
+        print("Dropped float32 vectors; search runs on PQ codes only")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization with a per-dimension offset and scale learned
+    from the data: x ~= (code + 128) * scale + offset.
+    """
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, sample_size: int = 100000, seed: int = 0,
+              clip_percentile: float = 0.1) -> 'ScalarQuantizer':
+        """
+        Learns the range of each dimension. Clipping a small percentile at both
+        ends spends the 256 levels on the bulk of the distribution instead of outliers.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > sample_size:
+            rng = np.random.default_rng(seed)
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        low = np.percentile(vectors, clip_percentile, axis=0)
+        high = np.percentile(vectors, 100 - clip_percentile, axis=0)
+        scale = np.maximum(high - low, 1e-12) / 255.0
+        return cls(low, scale)
+
+    @classmethod
+    def from_params(cls, params: np.ndarray) -> 'ScalarQuantizer':
+        return cls(params[0], params[1])
+
+    def params(self) -> np.ndarray:
+        """2 x dimension float32 array (offset, scale) for storage."""
+        return np.stack([self.offset, self.scale]).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def query_tables(self, query: np.ndarray):
+        """
+        Asymmetric distance: the query stays float32, so
+        x . q = code . (q * scale) + ((128 * scale + offset) . q).
+        Returns (weights, bias) for that product.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        return query * self.scale, float(np.dot(128.0 * self.scale + self.offset, query))
+
+    def scores(self, codes: np.ndarray, query_tables) -> np.ndarray:
+        weights, bias = query_tables
+        return codes.astype(np.float32) @ weights + bias
+
+
+def reconstruction_error(quantizer: ScalarQuantizer, vectors: np.ndarray) -> float:
+    """Mean squared reconstruction error per vector (for comparing settings)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return float(np.mean(np.sum((quantizer.decode(quantizer.encode(vectors)) - vectors) ** 2, axis=1)))
+
+
+def recall_at_k(exact_keys: list, approx_keys: list) -> float:
+    """Fraction of the exact top-k that the approximate search also returned."""
+    if not exact_keys:
+        return 1.0
+    return len(set(exact_keys) & set(approx_keys)) / len(exact_keys)
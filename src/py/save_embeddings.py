@@ -1,10 +1,15 @@
-import boto3
 import json
 import os
 import logging
 from botocore.exceptions import ClientError
 from urllib.parse import urlparse
 
+from clients import connection_stats, lazy_client
+from content_registry import make_registry
+from metrics import emit_connection_stats
+from search_filters import PROXY_URI_KEY, SOURCE_DURATION_KEY, TAGS_KEY, UPLOADED_AT_KEY
+from shot_segmentation import load_shots, pool_windows
+
 # --- CONFIGURATION FROM ENV VARS ---
 SOURCE_BUCKET_NAME = os.environ.get('SOURCE_BUCKET_NAME') 
 VECTOR_BUCKET_NAME = os.environ.get('VECTOR_BUCKET_NAME')
@@ -15,13 +20,84 @@ VECTOR_DIMENSION = int(os.environ.get('VECTOR_DIMENSION', '1024'))
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Vectors per put_vectors call
+PUT_VECTORS_BATCH_SIZE = 20
+# Keys per get_vectors call (service limit)
+GET_VECTORS_BATCH_SIZE = 100
+# Bytes first read from the end of a JSONL output to find its last segment (one line is ~20 KB)
+DURATION_PROBE_BYTES = 64 * 1024
+
 # Clients
-s3_client = boto3.client('s3')
-s3_vectors_client = boto3.client('s3vectors')
+s3_client = lazy_client('s3', call_type='transfer')
+s3_vectors_client = lazy_client('s3vectors', call_type='vector_write')
+content_registry = make_registry()
+
+def describe_source(s3_source_uri):
+    """
+    Source-level metadata used by search filters: upload time (epoch seconds)
+    and the S3 object tags of the original media file.
+    """
+    if not s3_source_uri:
+        return {}
+
+    parsed = urlparse(s3_source_uri)
+    bucket, key = parsed.netloc, parsed.path.lstrip('/')
+    fields = {}
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+        fields[UPLOADED_AT_KEY] = int(head['LastModified'].timestamp())
+
+        tag_set = s3_client.get_object_tagging(Bucket=bucket, Key=key).get('TagSet', [])
+        # "key" for flag-style tags, "key=value" otherwise
+        tags = [t['Key'] if t['Value'] in ('', 'true') else f"{t['Key']}={t['Value']}" for t in tag_set]
+        if tags:
+            fields[TAGS_KEY] = tags
+    except ClientError as e:
+        logger.warning(f"Could not read source metadata for {s3_source_uri}: {e}")
+    return fields
+
+
+def last_segment_end(key):
+    """
+    End of the last segment in a JSONL output, read from the tail of the file
+    (segments are written in time order), or None if it has none.
+    """
+    size = s3_client.head_object(Bucket=SOURCE_BUCKET_NAME, Key=key)['ContentLength']
+    probe_bytes = DURATION_PROBE_BYTES
+    while size:
+        start = max(0, size - probe_bytes)
+        tail = s3_client.get_object(Bucket=SOURCE_BUCKET_NAME, Key=key, Range=f"bytes={start}-{size - 1}")['Body'].read()
+        lines = tail.splitlines()
+        if start:
+            # The first line is cut off
+            lines = lines[1:]
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            segment_end = {**record.get('metadata', {}), **record.get('segmentMetadata', {})}.get('segmentEndSeconds')
+            if segment_end is not None:
+                return float(segment_end)
+        if not start:
+            break
+        probe_bytes *= 4
+    return None
+
+
+def probe_source_duration(files):
+    """Source duration of (key, offset seconds) outputs: the latest segment end of any file."""
+    ends = [end + offset_seconds for key, offset_seconds in files
+            for end in [last_segment_end(key)] if end is not None]
+    return max(ends) if ends else None
+
 
-def process_jsonl_file(key, s3_source_uri):
+def process_jsonl_file(key, s3_source_uri, source_fields=None, offset_seconds=0.0, source_duration=None):
     """
     Streams a JSONL file from S3, parses vectors, and pushes to S3 Vector Index.
+    source_duration is written as filterable metadata on every vector. For a
+    chunk of a longer source, segment times are shifted by the chunk's
+    offset_seconds. Returns the keys of the vectors written.
     """
     logger.info(f"Processing file: {key}")
     logger.info(f"s3_source_uri: {s3_source_uri}")
@@ -31,7 +107,7 @@ def process_jsonl_file(key, s3_source_uri):
         stream = response['Body'].iter_lines()
         
         batch = []
-        batch_size = 20 
+        vector_keys = []
         
         for i, line in enumerate(stream):
             if not line: continue
@@ -55,15 +131,24 @@ def process_jsonl_file(key, s3_source_uri):
                 
                 # Merge them (segmentMetadata takes precedence or just combines)
                 combined_metadata = {**raw_metadata, **segment_metadata}
+                if offset_seconds:
+                    for field in ('segmentStartSeconds', 'segmentEndSeconds'):
+                        if combined_metadata.get(field) is not None:
+                            combined_metadata[field] = round(float(combined_metadata[field]) + offset_seconds, 3)
                 
                 vector_entry['metadata'] = combined_metadata
 
                 if s3_source_uri:
                     vector_entry['metadata']['s3_uri'] = s3_source_uri
+                if source_fields:
+                    vector_entry['metadata'].update(source_fields)
+                if source_duration:
+                    vector_entry['metadata'][SOURCE_DURATION_KEY] = source_duration
 
                 batch.append(vector_entry)
+                vector_keys.append(unique_key)
 
-                if len(batch) >= batch_size:
+                if len(batch) >= PUT_VECTORS_BATCH_SIZE:
                     flush_batch(batch)
                     batch = []
                     
@@ -74,11 +159,59 @@ def process_jsonl_file(key, s3_source_uri):
         # Flush remaining
         if batch:
             flush_batch(batch)
+        return vector_keys
             
     except Exception as e:
         logger.error(f"Failed to process file {key}: {e}")
         raise e
 
+def process_shots(files, s3_source_uri, shots, source_fields=None):
+    """
+    Pools the window embeddings of all of a source's JSONL files, given as
+    (key, offset seconds) pairs, into one vector per shot (see
+    shot_segmentation.py), so indexed segments start and end on shot
+    boundaries. Windows of one shot can span two files (or two chunks),
+    hence all files are read first. Returns the keys of the vectors written.
+    """
+    windows = []
+    for key, offset_seconds in files:
+        logger.info(f"Reading windows from: {key}")
+        for line in s3_client.get_object(Bucket=SOURCE_BUCKET_NAME, Key=key)['Body'].iter_lines():
+            if not line: continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping invalid JSON line in {key}")
+                continue
+            segment = record.get('segmentMetadata', {})
+            start, end = segment.get('segmentStartSeconds'), segment.get('segmentEndSeconds')
+            if start is None or end is None or not record.get('embedding'):
+                continue
+            windows.append((float(start) + offset_seconds, float(end) + offset_seconds, record['embedding']))
+
+    # One key per shot and job (the first chunk's), e.g. <job>-shot-12
+    job_id = os.path.basename(os.path.dirname(files[0][0])) if files else 'job'
+    source_duration = shots[-1]['end'] if shots else None
+    entries = []
+    for index, vector in pool_windows(windows, shots):
+        metadata = {
+            'segmentStartSeconds': shots[index]['start'],
+            'segmentEndSeconds': shots[index]['end'],
+            'shotIndex': index,
+        }
+        if s3_source_uri:
+            metadata['s3_uri'] = s3_source_uri
+        if source_fields:
+            metadata.update(source_fields)
+        if source_duration:
+            metadata[SOURCE_DURATION_KEY] = source_duration
+        entries.append({'key': f"{job_id}-shot-{index}", 'data': {"float32": vector}, 'metadata': metadata})
+
+    logger.info(f"Pooled {len(windows)} windows into {len(entries)} shot vectors")
+    for i in range(0, len(entries), PUT_VECTORS_BATCH_SIZE):
+        flush_batch(entries[i:i + PUT_VECTORS_BATCH_SIZE])
+    return [entry['key'] for entry in entries]
+
 def flush_batch(batch):
     """
     Sends a batch of vectors to the S3 Vector Index
@@ -94,54 +227,131 @@ def flush_batch(batch):
         logger.error(f"Error flushing batch: {e}")
         raise e
 
-def lambda_handler(event, context):
-    logger.info(f"Received Event: {json.dumps(event)}")
-   
-    s3_uri = event.get('S3Uri', '')
-    mediaFileUri = event.get('mediaFileUri', '')
+def ingest(s3_uri, mediaFileUri, shots_uri=None, fingerprint=None, proxy_uri=None):
+    """
+    Indexes every JSONL file of a finished embedding job under s3_uri and
+    returns the number of files. Raises on failure (the Lambda handler logs
+    instead; the durable embeddings workflow retries the step).
+    """
+    return ingest_outputs([(s3_uri, 0.0)], mediaFileUri, shots_uri, fingerprint=fingerprint, proxy_uri=proxy_uri)
 
-    logger.info(f"s3_uri: {s3_uri}")
-    logger.info(f"mediaFileUri: {mediaFileUri}")
-    
-    prefix = ''
-    if s3_uri:
-       
-        parsed = urlparse(s3_uri)
- 
-        prefix = parsed.path.lstrip('/')
-    
+
+def alias_vectors(vector_keys, mediaFileUri, alias_id):
+    """
+    Copies already indexed vectors (an identical upload's) to new keys
+    (<alias_id>-<key>) pointing at mediaFileUri, with its own source metadata.
+    Returns the number of vectors written.
+    """
+    source_fields = describe_source(mediaFileUri)
+    written = 0
+    for i in range(0, len(vector_keys), GET_VECTORS_BATCH_SIZE):
+        response = s3_vectors_client.get_vectors(
+            vectorBucketName=VECTOR_BUCKET_NAME,
+            indexName=VECTOR_INDEX_NAME,
+            keys=vector_keys[i:i + GET_VECTORS_BATCH_SIZE],
+            returnData=True,
+            returnMetadata=True,
+        )
+        entries = []
+        for vector in response.get('vectors', []):
+            # Upload time and tags are the new object's; segment times and duration are shared
+            metadata = {k: v for k, v in vector.get('metadata', {}).items() if k not in (UPLOADED_AT_KEY, TAGS_KEY)}
+            metadata.update(s3_uri=mediaFileUri, **source_fields)
+            entries.append({'key': f"{alias_id}-{vector['key']}", 'data': vector['data'], 'metadata': metadata})
+        for j in range(0, len(entries), PUT_VECTORS_BATCH_SIZE):
+            flush_batch(entries[j:j + PUT_VECTORS_BATCH_SIZE])
+        written += len(entries)
+    logger.info(f"Aliased {written} of {len(vector_keys)} vectors to {mediaFileUri}")
+    emit_connection_stats(connection_stats(delta=True))
+    return written
+
+
+def list_output_files(s3_uri):
+    """Keys of the .jsonl files under an embedding job's output location."""
+    prefix = urlparse(s3_uri).path.lstrip('/') if s3_uri else ''
     # Validation
     if not prefix:
         logger.warning("No prefix found in event. Scanning root of bucket (this might be slow).")
-    
+    logger.info(f"Scanning Prefix: {prefix}")
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    # We pass the prefix here to only process files from this specific job
+    page_iterator = paginator.paginate(Bucket=SOURCE_BUCKET_NAME, Prefix=prefix)
+
+    keys = []
+    for page in page_iterator:
+        if 'Contents' not in page:
+            continue
+            
+        for obj in page['Contents']:
+            # Only process .jsonl output files
+            if obj['Key'].endswith('.jsonl'):
+                keys.append(obj['Key'])
+    return keys
+
+
+def ingest_outputs(outputs, mediaFileUri, shots_uri=None, source_duration=None, fingerprint=None, proxy_uri=None):
+    """
+    Indexes the output of one or more embedding jobs for the same source,
+    given as (output s3 uri, offset seconds) pairs: a long video is embedded
+    in chunks (media_chunks.py), and each chunk's segment times are shifted
+    by the chunk's start. With the upload's content fingerprint (see
+    dedup_upload.py), the written vector keys are recorded so duplicate
+    uploads can reuse them. When a proxy was embedded instead of the
+    original (media_proxy.py), vectors name it in proxy_uri; s3_uri stays
+    the original, which clips are cut from. Returns the number of files.
+    """
     logger.info("--- Starting Vector Ingestion Job ---")
     logger.info(f"Source Bucket: {SOURCE_BUCKET_NAME}")
     logger.info(f"Target Index: {VECTOR_INDEX_NAME}")
-    logger.info(f"Scanning Prefix: {prefix}")
 
-    try:
-        paginator = s3_client.get_paginator('list_objects_v2')
-        # We pass the prefix here to only process files from this specific job
-        page_iterator = paginator.paginate(Bucket=SOURCE_BUCKET_NAME, Prefix=prefix)
+    files = [(key, offset_seconds) for s3_uri, offset_seconds in outputs for key in list_output_files(s3_uri)]
+    source_fields = describe_source(mediaFileUri)
+    if proxy_uri:
+        source_fields[PROXY_URI_KEY] = proxy_uri
+    shots = None
+    if shots_uri:
+        try:
+            shots = load_shots(s3_client, shots_uri)
+        except ClientError as e:
+            logger.warning(f"Could not read shots {shots_uri}, indexing windows as segments: {e}")
+    if shots:
+        # Pooled across files (and chunks)
+        vector_keys = process_shots(files, mediaFileUri, shots, source_fields)
+    else:
+        vector_keys = []
+        # Chunked sources pass their duration; a single job's is its last segment end,
+        # probed up front so each file can be streamed in batches
+        source_duration = source_duration or probe_source_duration(files)
+        for key, offset_seconds in files:
+            # Pass the source S3 URI if available in the event
+            vector_keys += process_jsonl_file(key, mediaFileUri, source_fields, offset_seconds, source_duration)
+    if fingerprint:
+        content_registry.mark_indexed(fingerprint, mediaFileUri, vector_keys)
+    
+    result_msg = f"Processed {len(files)} files successfully from {len(outputs)} job output(s)"
+    logger.info(result_msg)
+    emit_connection_stats(connection_stats(delta=True))
+    return len(files)
 
-        file_count = 0
-        for page in page_iterator:
-            if 'Contents' not in page:
-                continue
-                
-            for obj in page['Contents']:
-                key = obj['Key']
-                # Only process .jsonl output files
-                if key.endswith('.jsonl'):
-                    # Pass the source S3 URI if available in the event
-                   
-                    process_jsonl_file(key, mediaFileUri)
-                    file_count += 1
-        
-        result_msg = f"Processed {file_count} files successfully from prefix: {prefix}"
-        logger.info(result_msg)
-        
 
+def lambda_handler(event, context):
+    logger.info(f"Received Event: {json.dumps(event)}")
+   
+    s3_uri = event.get('S3Uri', '')
+    mediaFileUri = event.get('mediaFileUri', '')
+    # Set by the shot detection step; absent for fixed-window jobs
+    shots_uri = event.get('shotsUri')
+    # Set by the duplicate check; absent when the upload wasn't registered
+    fingerprint = event.get('fingerprint')
+    # Set when a proxy was embedded instead of the original
+    proxy_uri = event.get('proxyUri')
+
+    logger.info(f"s3_uri: {s3_uri}")
+    logger.info(f"mediaFileUri: {mediaFileUri}")
+
+    try:
+        ingest(s3_uri, mediaFileUri, shots_uri, fingerprint, proxy_uri)
     except Exception as e:
         logger.error(f"Fatal error in execution: {e}")
        
\ No newline at end of file
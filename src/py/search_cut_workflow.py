@@ -1,9 +1,7 @@
-import boto3
 import json
 import os
-from botocore.config import Config
+import shutil
 import uuid
-import subprocess
 from aws_durable_execution_sdk_python import (
     DurableContext,
     StepContext,
@@ -14,177 +12,182 @@ from aws_durable_execution_sdk_python.config import (
     Duration,
     StepConfig,
     CallbackConfig,
+    ParallelConfig,
 )
+from aws_durable_execution_sdk_python.serdes import EXTENDED_TYPES_SERDES
 from aws_durable_execution_sdk_python.retries import (
     RetryStrategyConfig,
     create_retry_strategy,
 )
+from clients import S3_TRANSFER_CONCURRENCY, connection_stats, lazy_client
+from clip_preview import make_previews
+from cut_scheduler import SourceCache
+from event_emitter import EventEmitter
+from metrics import PhaseTimer, emit_connection_stats, emit_latency, merge_timings
+from search_filters import build_filter
+from singleflight import make_lock_store
+from step_results import OffloadSerDes, configure_step_logging, project, summarize_vectors
+from vector_search import embed_text, query_index, extract_match
+from video_cut import cut_clip
 VECTOR_BUCKET_NAME = os.environ.get('VECTOR_BUCKET_NAME')
 VECTOR_INDEX_NAME = os.environ.get('VECTOR_INDEX_NAME', '')
-s3_vectors = boto3.client('s3vectors',region_name='us-east-1')
-config = Config(read_timeout=3600)
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1', config=config)
-s3_client = boto3.client('s3', region_name='us-east-1')
+# Created on first use, so cold starts and the approval replay don't pay for unused clients
+s3_vectors = lazy_client('s3vectors', region_name='us-east-1', call_type='vector_query')
+bedrock_runtime = lazy_client('bedrock-runtime', region_name='us-east-1', call_type='embed')
+s3_client = lazy_client('s3', region_name='us-east-1', call_type='transfer', concurrency=S3_TRANSFER_CONCURRENCY)
 
-events_client = boto3.client("events", region_name='us-east-1')
+events_client = lazy_client("events", region_name='us-east-1', call_type='control')
 
 
 EVENT_BUS_NAME = os.environ.get("EVENT_BUS_NAME")
 VECTOR_DIMENSION = 1024 
+SOURCE_BUCKET_NAME = os.environ.get("SOURCE_BUCKET_NAME")
 
+# Optional in-process search over an exported index snapshot (s3:// prefix or local path)
+LOCAL_SNAPSHOT_URI = os.environ.get("LOCAL_SNAPSHOT_URI")
+LOCAL_SNAPSHOT_MAX_AGE_SECONDS = float(os.environ.get("LOCAL_SNAPSHOT_MAX_AGE_SECONDS", "3600"))
 
-def send_event(request_id: str, status: str, callback_id: str = None, video_url: str = None, message: str = None):
+APPROVAL_TIMEOUT_HOURS = 24
+
+
+def _record_event_latency(latency_ms: float, entry_count: int, replaying: bool):
+    emit_latency("eventbridge_put_events", latency_ms, replaying=replaying, entries=entry_count)
+
+
+event_emitter = EventEmitter(events_client, EVENT_BUS_NAME, on_batch_sent=_record_event_latency)
+# In-flight record shared with invoke_search_cut_workflow for request coalescing
+lock_store = make_lock_store(region_name='us-east-1')
+
+configure_step_logging()
+# Step results larger than CHECKPOINT_INLINE_BYTES are checkpointed as pointers to the media bucket
+search_serdes = OffloadSerDes(lambda: s3_client, SOURCE_BUCKET_NAME, "search")
+cut_serdes = OffloadSerDes(lambda: s3_client, SOURCE_BUCKET_NAME, "cut")
+preview_serdes = OffloadSerDes(lambda: s3_client, SOURCE_BUCKET_NAME, "preview")
+# The parallel block checkpoints each branch's result again, and then the BatchResult holding both
+branch_serdes = OffloadSerDes(lambda: s3_client, SOURCE_BUCKET_NAME, "cut-and-preview-branch",
+                              encoding=EXTENDED_TYPES_SERDES)
+batch_serdes = OffloadSerDes(lambda: s3_client, SOURCE_BUCKET_NAME, "cut-and-preview",
+                             encoding=EXTENDED_TYPES_SERDES)
+
+
+def send_event(request_id: str, status: str, callback_id: str = None, video_url: str = None, message: str = None,
+               replaying: bool = False, stream_url: str = None, thumbnail_url: str = None, preview_url: str = None):
+    """
+    Queues a status update for EventBridge; delivery happens on a background thread.
+    Includes 'videoUrl' and 'callbackId' specifically for the Approval stage
+    (with the clip's sprite sheet and animated preview, when generated), and
+    'streamUrl' (HLS playlist of the clip) from the STREAMING stage on.
+    """
+    detail = {
+        "requestId": request_id,
+        "status": status,
+        "message": message,
+        "callbackId": callback_id,
+        "videoUrl": video_url,
+        "streamUrl": stream_url,
+        "thumbnailUrl": thumbnail_url,
+        "previewUrl": preview_url
+    }
+    event_emitter.emit(detail, replaying=replaying)
+    print(f"Event queued: {status}")
+    return detail
+
+def local_search_index():
     """
-    Sends status updates to EventBridge. 
-    Includes 'videoUrl' and 'callbackId' specifically for the Approval stage.
+    Returns (index, cache_hit) for the local snapshot engine, or (None, False)
+    when no snapshot is configured, it fails to load, or it is stale.
     """
+    if not LOCAL_SNAPSHOT_URI:
+        return None, False
     try:
-        detail = {
-            "requestId": request_id,
-            "status": status,
-            "message": message,
-            "callbackId": callback_id,
-            "videoUrl": video_url
-        }
-        
-        events_client.put_events(
-            Entries=[
-                {
-                    "Source": "video.pipeline",
-                    "DetailType": "video.processing.status",
-                    "Detail": json.dumps(detail),
-                    "EventBusName": EVENT_BUS_NAME,
-                }
-            ]
-        )
-        print(f"Event sent: {status}")
+        # numpy is only imported when the local path is enabled
+        from local_search import load_local_index
+        index, cache_hit = load_local_index(LOCAL_SNAPSHOT_URI, s3_client)
     except Exception as e:
-        print(f"Failed to send event: {e}")
+        print(f"Local snapshot unavailable, using S3 Vectors: {e}")
+        return None, False
+    if index.snapshot.age_seconds() > LOCAL_SNAPSHOT_MAX_AGE_SECONDS:
+        print(f"Local snapshot is {index.snapshot.age_seconds():.0f}s old, using S3 Vectors")
+        return None, cache_hit
+    return index, cache_hit
 
 # --- STEP 1: SEMANTIC SEARCH ---
 @durable_step
-def search_video_step(step_context: StepContext, query: str) -> dict:
+def search_video_step(step_context: StepContext, query: str, filters: dict = None) -> dict:
     """
-    Embeds query and searches S3 Vector Index. 
-    Returns the metadata of the BEST match.
+    Embeds query and searches S3 Vector Index, optionally narrowed by metadata filters. 
+    Returns the metadata of the BEST match, projected to what the checkpoint keeps.
     """
     step_context.logger.info(f"Searching for: {query}")
+    timer = PhaseTimer()
     
     # 1. Embed Query
-    request_body = {
-        "taskType": "SINGLE_EMBEDDING",
-        "singleEmbeddingParams": {
-            "embeddingPurpose": "VIDEO_RETRIEVAL",
-            "embeddingDimension": VECTOR_DIMENSION,
-            "text": {"truncationMode": "NONE", "value": query},
-        },
-    }
-    
-    response = bedrock_runtime.invoke_model(
-        modelId='amazon.nova-2-multimodal-embeddings-v1:0', 
-        body=json.dumps(request_body),
-        accept="application/json",
-        contentType="application/json",
-    )
-    query_embedding = json.loads(response.get('body').read())['embeddings'][0]['embedding']
-
-    # 2. Search Vector Index
-    search_response = s3_vectors.query_vectors(
-        vectorBucketName=VECTOR_BUCKET_NAME,
-        indexName=VECTOR_INDEX_NAME,
-        queryVector={'float32': query_embedding},
-        topK=1,
-        returnMetadata=True,
-        returnDistance=True
-    )
-
-    step_context.logger.info(f"Search response: {search_response}")
-
-    if not search_response.get('vectors'):
+    with timer.phase("bedrock_embed"):
+        query_embedding = embed_text(bedrock_runtime, query, VECTOR_DIMENSION)
+
+    # 2. Search Vector Index (local snapshot when fresh, S3 Vectors otherwise)
+    filter_expression = build_filter(filters)
+    local_index, cache_hit = None, False
+    if LOCAL_SNAPSHOT_URI:
+        with timer.phase("local_snapshot_load"):
+            local_index, cache_hit = local_search_index()
+
+    if local_index is not None:
+        with timer.phase("local_search", cache_hit=cache_hit):
+            vectors = local_index.search(query_embedding, top_k=1, filter_expression=filter_expression)
+    else:
+        with timer.phase("query_vectors"):
+            vectors = query_index(s3_vectors, VECTOR_BUCKET_NAME, VECTOR_INDEX_NAME, query_embedding, top_k=1,
+                                  filter_expression=filter_expression)
+
+    step_context.logger.info(f"Search response: {summarize_vectors(vectors)}")
+    step_context.logger.debug("Search response: %s", vectors)
+
+    if not vectors:
         raise Exception("No matching video found.")
 
     # 3. Extract Info
-    best_match = search_response['vectors'][0]
-    step_context.logger.info(f"best match: {best_match}")
-    metadata = best_match['metadata']
-    step_context.logger.info(f"metadata: {metadata}")
-    
-    # Support multiple metadata formats for timestamps
-    start_time = metadata.get('segmentStartSeconds') or metadata.get('startSeconds') or metadata.get('start_seconds')
-    end_time = metadata.get('segmentEndSeconds') or metadata.get('endSeconds') or metadata.get('end_seconds')
-
-    if start_time is None or end_time is None:
-         raise ValueError(f"Missing start/end time in metadata. Keys found: {metadata.keys()}")
-
-    result = {
-        "s3_uri": metadata.get('s3_uri'), 
-        "start_time": start_time,
-        "end_time": end_time,
-        "score": best_match.get('score')
-    }
+    best_match = vectors[0]
+    step_context.logger.debug("best match: %s", best_match)
+
+    result = project({**extract_match(best_match), "timings": timer.timings}, "search")
     step_context.logger.info(f"Found match: {result}")
     return result
 
 # --- STEP 2: FFmpeg CUT ---
 @durable_step
-def cut_video_step(step_context: StepContext, match_data: dict, request_id: str) -> dict:
+def cut_video_step(step_context: StepContext, match_data: dict, request_id: str, sources: SourceCache = None) -> dict:
     """
     Downloads, cuts, and re-uploads the video.
-    Returns a Presigned URL for viewing.
+    Returns a Presigned URL for viewing. With CLIP_HLS on, the clip's HLS
+    playlist is announced (STREAMING) as soon as its first segment is uploaded.
+    Source downloads go through `sources` when given (shared with the previews).
     """
     step_context.logger.info(f"Cutting video: {match_data['s3_uri']}")
-    
-    s3_uri = match_data['s3_uri']
-    if not s3_uri:
-        raise ValueError(f"Missing 's3_uri' in vector metadata. Found keys: {match_data.keys()}")
-
-    # Parse Bucket and Key from s3://bucket/key
-    parts = s3_uri.replace("s3://", "").split("/", 1)
-    bucket = parts[0]
-    key = parts[1]
-    
-    input_path = f"/tmp/{uuid.uuid4()}_input.mp4"
-    output_path = f"/tmp/{uuid.uuid4()}_output.mp4"
-    output_key = f"cuts/{request_id}_cut.mp4"
 
-    try:
-        # 1. Download
-        s3_client.download_file(bucket, key, input_path)
-        
-        # 2. Cut with FFmpeg
-        command = [
-            "/opt/bin/ffmpeg",
-            "-ss", str(match_data['start_time']),
-            "-i", input_path,
-            "-to", str(match_data['end_time']),
-            "-c", "copy", # Fast cut
-            "-y",
-            output_path
-        ]
-        subprocess.check_call(command)
-        
-        # 3. Upload Cut
-        s3_client.upload_file(output_path, bucket, output_key)
-        
-        # 4. Generate Presigned URL (Valid for 1 hour)
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket, 'Key': output_key},
-            ExpiresIn=3600
-        )
-        
-        return {
-            "cut_key": output_key,
-            "presigned_url": presigned_url
-        }
+    def stream_ready(stream_url: str):
+        send_event(request_id, "STREAMING", stream_url=stream_url, message="Clip preview streaming...")
 
+    try:
+        return project(cut_clip(sources or s3_client, match_data, f"cuts/{request_id}_cut.mp4",
+                                on_stream_ready=stream_ready), "cut")
     except Exception as e:
         step_context.logger.error(f"FFmpeg failed: {e}")
         raise e
-    finally:
-        # Cleanup
-        if os.path.exists(input_path): os.remove(input_path)
-        if os.path.exists(output_path): os.remove(output_path)
+
+
+# --- STEP 2b: PREVIEWS (parallel to the cut) ---
+@durable_step
+def preview_step(step_context: StepContext, match_data: dict, request_id: str, sources: SourceCache = None) -> dict:
+    """
+    Thumbnail sprite and animated preview of the match, for the approval UI.
+    Best effort: if they can't be generated the clip is sent without them.
+    """
+    try:
+        return project(make_previews(sources or s3_client, match_data, f"cuts/{request_id}"), "preview")
+    except Exception as e:
+        step_context.logger.warning(f"Preview generation failed: {e}")
+        return {"timings": {}}
 
 
 # --- MAIN ORCHESTRATOR ---
@@ -195,29 +198,53 @@ def lambda_handler(event: dict, context: DurableContext) -> dict:
     # Assuming event format: { "query": "Find the dog", "requestId": "123" }
     request_id = event.get("requestId", str(uuid.uuid4()))
     user_query = event.get("query") 
+    filters = event.get("filters")
+    inflight_key = event.get("inflightKey")
+
+    def release_inflight():
+        if inflight_key:
+            lock_store.release(inflight_key, request_id)
 
     try:
         # --- PHASE 1: SEARCH ---
-        send_event(request_id, "SEARCHING", message=f"Searching for '{user_query}'")
+        send_event(request_id, "SEARCHING", message=f"Searching for '{user_query}'", replaying=context.is_replaying())
         
-        search_result = context.step(search_video_step(user_query))
+        search_result = context.step(search_video_step(user_query, filters), config=StepConfig(serdes=search_serdes))
         
         # --- PHASE 2: PROCESSING (With Retries) ---
-        send_event(request_id, "PROCESSING", message="Cutting video clip...")
+        send_event(request_id, "PROCESSING", message="Cutting video clip...", replaying=context.is_replaying())
         
         # Retry strategy: If FFmpeg fails (timeout/glitch), try 3 times
         retry_config = RetryStrategyConfig(max_attempts=3, backoff_rate=1.5)
         
-        cut_result = context.step(
-            cut_video_step(search_result, request_id),
-            config=StepConfig(retry_strategy=create_retry_strategy(retry_config))
-        )
+        cut_config = StepConfig(retry_strategy=create_retry_strategy(retry_config), serdes=cut_serdes)
+
+        # Sprite sheet and animated preview are generated alongside the cut. Both read the source (or its
+        # chunks) through one cache, so it is downloaded and kept in /tmp once rather than once per branch.
+        sources_dir = f"/tmp/{uuid.uuid4()}_sources"
+        os.makedirs(sources_dir)
+        sources = SourceCache(s3_client, sources_dir)
+        try:
+            branches = context.parallel(
+                [
+                    lambda cut_context: cut_context.step(cut_video_step(search_result, request_id, sources),
+                                                         config=cut_config),
+                    lambda preview_context: preview_context.step(preview_step(search_result, request_id, sources),
+                                                                 config=StepConfig(serdes=preview_serdes)),
+                ],
+                name="cut-and-preview",
+                config=ParallelConfig(serdes=batch_serdes, item_serdes=branch_serdes),
+            )
+        finally:
+            shutil.rmtree(sources_dir, ignore_errors=True)
+        branches.throw_if_error()
+        cut_result, preview_result = branches.get_results()
         
         # --- PHASE 3: HUMAN APPROVAL ---
-        # Create a callback token (valid for 24 hours)
+        # Create a callback token (valid for APPROVAL_TIMEOUT_HOURS)
         callback = context.create_callback(
             name="user-approval",
-            config=CallbackConfig(timeout=Duration.from_hours(24))
+            config=CallbackConfig(timeout=Duration.from_hours(APPROVAL_TIMEOUT_HOURS))
         )
         
         # CRITICAL: Send the Presigned URL + Callback ID to the frontend/user
@@ -226,8 +253,15 @@ def lambda_handler(event: dict, context: DurableContext) -> dict:
             status="WAITING_FOR_APPROVAL", 
             callback_id=callback.callback_id,
             video_url=cut_result['presigned_url'],
-            message="Clip ready. Please approve."
+            stream_url=cut_result.get('stream_url'),
+            thumbnail_url=preview_result.get('thumbnail_url'),
+            preview_url=preview_result.get('preview_url'),
+            message="Clip ready. Please approve.",
+            replaying=context.is_replaying()
         )
+        # Stop coalescing here: the clip's presigned URLs expire long before the approval wait does, and
+        # the callback belongs to the callers already attached. Identical searches start a new execution.
+        release_inflight()
         
         context.logger.info(f"Waiting for approval on callback: {callback.callback_id}")
         
@@ -249,15 +283,23 @@ def lambda_handler(event: dict, context: DurableContext) -> dict:
 
         if action == 'approve':
             send_event(request_id, "COMPLETED", message="Video approved and finalized.")
+            release_inflight()
             return {
                 "status": "COMPLETED",
-                "final_video": cut_result['presigned_url']
+                "final_video": cut_result['presigned_url'],
+                "timings": merge_timings(search_result, cut_result, preview_result)
             }
         else:
             send_event(request_id, "REJECTED", message="User rejected the clip.")
-            return {"status": "REJECTED"}
+            release_inflight()
+            return {"status": "REJECTED", "timings": merge_timings(search_result, cut_result, preview_result)}
 
     except Exception as e:
         context.logger.error(f"Pipeline Failed: {e}")
         send_event(request_id, "FAILED", message=str(e))
-        raise e
\ No newline at end of file
+        release_inflight()
+        raise e
+    finally:
+        # Runs on return, failure and suspension (SuspendExecution is a BaseException)
+        event_emitter.flush()
+        emit_connection_stats(connection_stats(delta=True))
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+# Metadata keys written by save_embeddings.py. They must stay filterable
+# (i.e. not listed in the index's nonFilterableMetadataKeys).
+SOURCE_URI_KEY = 's3_uri'
+UPLOADED_AT_KEY = 'uploaded_at'
+SOURCE_DURATION_KEY = 'source_duration'
+TAGS_KEY = 'tags'
+# Embedding proxy of the source (media_proxy.py); informational, not used in filters
+PROXY_URI_KEY = 'proxy_uri'
+
+
+def to_epoch_seconds(value) -> int:
+    """Accepts epoch seconds or an ISO-8601 timestamp (AWSDateTime)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp())
+
+
+def build_filter(filters: dict):
+    """
+    Translates the GraphQL SearchFilters input into an S3 Vectors metadata filter.
+    Returns None when no filter is set so the whole index is searched.
+    """
+    if not filters:
+        return None
+
+    conditions = []
+    if filters.get('sourceUri'):
+        conditions.append({SOURCE_URI_KEY: {"$eq": filters['sourceUri']}})
+    if filters.get('uploadedAfter') is not None:
+        conditions.append({UPLOADED_AT_KEY: {"$gte": to_epoch_seconds(filters['uploadedAfter'])}})
+    if filters.get('uploadedBefore') is not None:
+        conditions.append({UPLOADED_AT_KEY: {"$lte": to_epoch_seconds(filters['uploadedBefore'])}})
+    if filters.get('minDurationSeconds') is not None:
+        conditions.append({SOURCE_DURATION_KEY: {"$gte": float(filters['minDurationSeconds'])}})
+    if filters.get('maxDurationSeconds') is not None:
+        conditions.append({SOURCE_DURATION_KEY: {"$lte": float(filters['maxDurationSeconds'])}})
+    if filters.get('tags'):
+        # Matches vectors whose tag list contains any of the requested tags
+        conditions.append({TAGS_KEY: {"$in": list(filters['tags'])}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
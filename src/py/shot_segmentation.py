@@ -0,0 +1,214 @@
+"""Shot detection for the embedding workflow; save_embeddings pools windows per shot."""
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+from bisect import bisect_right
+
+from clients import S3_TRANSFER_CONCURRENCY, lazy_client
+from ffmpeg_utils import parse_duration, run_ffmpeg
+from media_proxy import PROXY_TIMEOUT_SECONDS, make_proxy, proxy_key
+from media_transfer import download, upload
+from mezzanine import MEZZANINE_ENABLED, MEZZANINE_TIMEOUT_SECONDS, build_mezzanine
+from video_cut import parse_s3_uri
+
+# ffmpeg scene score (0-1) above which a frame starts a new shot
+SCENE_THRESHOLD = float(os.environ.get('SCENE_THRESHOLD', '0.3'))
+SHOT_MIN_SECONDS = float(os.environ.get('SHOT_MIN_SECONDS', '2'))
+SHOT_MAX_SECONDS = float(os.environ.get('SHOT_MAX_SECONDS', '10'))
+# Embedding window length when shots are available (pooled per shot), and without them
+EMBEDDING_WINDOW_SECONDS = int(os.environ.get('EMBEDDING_WINDOW_SECONDS', '2'))
+FALLBACK_SEGMENT_SECONDS = 5
+# Scene scores are computed on frames scaled down to this width; cuts don't need detail
+ANALYSIS_WIDTH = 320
+DETECT_TIMEOUT_SECONDS = 780
+# segment_media runs within the invocation's remaining time (the Lambda timeout when unknown), minus
+# SEGMENT_RESERVE_SECONDS for the uploads after the last ffmpeg run and the step's checkpoint
+LAMBDA_TIMEOUT_SECONDS = 900
+SEGMENT_RESERVE_SECONDS = 60
+# Left for detection when the proxy transcode gets its timeout
+DETECT_MIN_SECONDS = 60
+
+s3_client = lazy_client('s3', call_type='transfer', concurrency=S3_TRANSFER_CONCURRENCY)
+
+_PTS_TIME = re.compile(r"pts_time:\s*([0-9.]+)")
+
+
+def scene_detect_args(input_path: str, threshold: float = SCENE_THRESHOLD) -> list:
+    """ffmpeg arguments that log (showinfo) every frame whose scene score exceeds threshold."""
+    return [
+        "-nostats",
+        "-i", input_path,
+        "-map", "0:v:0", "-an", "-sn", "-dn",
+        "-vf", f"scale={ANALYSIS_WIDTH}:-2,select='gt(scene,{threshold})',showinfo",
+        "-f", "null", "-",
+    ]
+
+
+def parse_scene_changes(log: str) -> list:
+    """Timestamps (seconds) of the frames showinfo reported, i.e. the detected cuts."""
+    return [float(t) for line in log.splitlines() if 'Parsed_showinfo' in line for t in _PTS_TIME.findall(line)]
+
+
+def clamp_shots(cuts: list, duration: float, min_seconds: float = SHOT_MIN_SECONDS,
+                max_seconds: float = SHOT_MAX_SECONDS) -> list:
+    """
+    Shots [{'start', 'end'}] covering [0, duration]. Shots shorter than
+    min_seconds (flash cuts, fades) are merged into the previous one, and
+    shots longer than max_seconds are split into equal parts.
+    """
+    boundaries = [0.0] + sorted(c for c in set(cuts) if 0 < c < duration) + [duration]
+    merged = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        if merged and (end - start < min_seconds or merged[-1][1] - merged[-1][0] < min_seconds):
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    shots = []
+    for start, end in merged:
+        parts = max(1, math.ceil((end - start) / max_seconds))
+        step = (end - start) / parts
+        for n in range(parts):
+            shots.append({'start': round(start + n * step, 3),
+                          'end': round(end if n == parts - 1 else start + (n + 1) * step, 3)})
+    return shots
+
+
+def detect_shots(input_path: str, threshold: float = SCENE_THRESHOLD,
+                 timeout: float = DETECT_TIMEOUT_SECONDS) -> (list, float):
+    """Runs scene detection on a local file and returns (shots, duration)."""
+    log = run_ffmpeg(scene_detect_args(input_path, threshold), timeout=timeout)
+    duration = parse_duration(log)
+    if not duration:
+        raise ValueError("ffmpeg did not report the input duration")
+    return clamp_shots(parse_scene_changes(log), duration), duration
+
+
+def shots_key(media_key: str) -> str:
+    return f"shots/{media_key}.json"
+
+
+def load_shots(s3_client, shots_uri: str) -> list:
+    bucket, key = parse_s3_uri(shots_uri)
+    return json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())['shots']
+
+
+def pool_windows(windows: list, shots: list):
+    """
+    Yields (shot index, vector) with the mean of the (start, end, embedding)
+    windows overlapping each shot, weighted by overlap and normalized.
+    Shots no window overlaps are skipped.
+    """
+    # Segmented embedding windows are contiguous, so sorting by start also sorts by end
+    windows = sorted(windows, key=lambda w: w[0])
+    starts = [w[0] for w in windows]
+    first = 0
+    for index, shot in enumerate(shots):
+        while first < len(windows) and windows[first][1] <= shot['start']:
+            first += 1
+        pooled = None
+        for start, end, embedding in windows[first:bisect_right(starts, shot['end'])]:
+            overlap = min(end, shot['end']) - max(start, shot['start'])
+            if overlap <= 0:
+                continue
+            if pooled is None:
+                pooled = [0.0] * len(embedding)
+            for i, value in enumerate(embedding):
+                pooled[i] += overlap * value
+        if pooled is None:
+            continue
+        norm = math.sqrt(sum(v * v for v in pooled)) or 1.0
+        yield index, [v / norm for v in pooled]
+
+
+def remaining_seconds(lambda_context) -> float:
+    """Time left in the invocation, or LAMBDA_TIMEOUT_SECONDS without a Lambda context."""
+    if lambda_context is None:
+        return LAMBDA_TIMEOUT_SECONDS
+    return lambda_context.get_remaining_time_in_millis() / 1000
+
+
+def segment_media(media_uri: str, time_budget: float = LAMBDA_TIMEOUT_SECONDS) -> dict:
+    """
+    Detects the shots of an uploaded video and stores them next to it, after
+    making an embedding proxy if the source needs one (media_proxy.py), then
+    remuxes the original into shot-aligned chunks for cutting (mezzanine.py).
+    Returns {embedUri, proxyUri, shotsUri, mezzanineUri, segmentSeconds,
+    duration}; embedUri is the proxy or the original. Without usable shots,
+    shotsUri is None and segmentSeconds the fixed window length.
+
+    Download, proxy, detection and remux share one deadline, time_budget
+    seconds from now (less SEGMENT_RESERVE_SECONDS); each ffmpeg run gets the
+    time left, so running out degrades to fixed windows (or no proxy or
+    mezzanine) rather than the invocation timing out.
+    """
+    deadline = time.monotonic() + time_budget - SEGMENT_RESERVE_SECONDS
+
+    def time_left(phase: str, keep: float = 0) -> float:
+        left = deadline - time.monotonic() - keep
+        if left <= 0:
+            raise subprocess.TimeoutExpired(phase, 0)
+        return left
+
+    bucket, key = parse_s3_uri(media_uri)
+    input_path = f"/tmp/{uuid.uuid4()}_input"
+    proxy_path = f"{input_path}_proxy.mp4"
+    mezzanine_dir = f"{input_path}_mezzanine"
+    proxy_uri = mezzanine_uri = None
+    try:
+        download(s3_client, bucket, key, input_path)
+        try:
+            proxy_timeout = min(PROXY_TIMEOUT_SECONDS, time_left("proxy", keep=DETECT_MIN_SECONDS))
+            if make_proxy(input_path, proxy_path, timeout=proxy_timeout):
+                upload(s3_client, proxy_path, bucket, proxy_key(key), extra_args={'ContentType': 'video/mp4'})
+                proxy_uri = f"s3://{bucket}/{proxy_key(key)}"
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            print(f"Proxy transcode failed for {media_uri}, embedding the original: {e}")
+        # The proxy has the same timestamps and is much cheaper to decode
+        shots, duration = detect_shots(proxy_path if proxy_uri else input_path,
+                                       timeout=min(DETECT_TIMEOUT_SECONDS, time_left("shot detection")))
+        if MEZZANINE_ENABLED:
+            try:
+                os.makedirs(mezzanine_dir)
+                mezzanine_uri = build_mezzanine(s3_client, input_path, bucket, key, shots, mezzanine_dir,
+                                                timeout=min(MEZZANINE_TIMEOUT_SECONDS, time_left("mezzanine")))
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                # Clips of this source are cut from the original instead
+                print(f"Mezzanine chunking failed for {media_uri}: {e}")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+        print(f"Shot detection failed for {media_uri}, using {FALLBACK_SEGMENT_SECONDS}s windows: {e}")
+        return {"embedUri": proxy_uri or media_uri, "proxyUri": proxy_uri, "shotsUri": None,
+                "segmentSeconds": FALLBACK_SEGMENT_SECONDS, "duration": None}
+    finally:
+        for path in (input_path, proxy_path):
+            if os.path.exists(path): os.remove(path)
+        shutil.rmtree(mezzanine_dir, ignore_errors=True)
+
+    output_key = shots_key(key)
+    s3_client.put_object(Bucket=bucket, Key=output_key, ContentType='application/json', Body=json.dumps({
+        "mediaFileUri": media_uri,
+        "proxyUri": proxy_uri,
+        "duration": duration,
+        "sceneThreshold": SCENE_THRESHOLD,
+        "shots": shots,
+    }))
+    print(f"Detected {len(shots)} shots in {duration:.1f}s of {media_uri}")
+    return {
+        "embedUri": proxy_uri or media_uri,
+        "proxyUri": proxy_uri,
+        "shotsUri": f"s3://{bucket}/{output_key}",
+        "mezzanineUri": mezzanine_uri,
+        "segmentSeconds": EMBEDDING_WINDOW_SECONDS,
+        "duration": duration,
+        "shotCount": len(shots),
+    }
+
+
+def handler(event, context):
+    """Step Functions task: {mediaFileUri} -> {embedUri, proxyUri, shotsUri, segmentSeconds, duration}."""
+    return segment_media(event['mediaFileUri'], remaining_seconds(context))
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+INFLIGHT_TABLE_NAME = os.environ.get('INFLIGHT_TABLE_NAME')
+# Covers search and cut; the workflow releases the record when it starts waiting for approval
+INFLIGHT_TTL_SECONDS = int(os.environ.get('INFLIGHT_TTL_SECONDS', '900'))
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query."""
+    return " ".join(query.lower().split())
+
+
+def query_hash(query: str, filters: dict = None) -> str:
+    """Stable key for a search; different filters never share an execution."""
+    key = normalize_query(query)
+    if filters:
+        key += "|" + json.dumps(filters, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class InMemoryLockStore:
+    """
+    Local stand-in for the in-flight table. Only coalesces requests that reach
+    the same warm container, which is enough for local runs and tests.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, request_id: str, ttl_seconds: int = INFLIGHT_TTL_SECONDS):
+        """Returns None if the lock was taken, otherwise the existing in-flight record."""
+        now = int(time.time())
+        with self._lock:
+            record = self._records.get(key)
+            if record and record["expiresAt"] > now:
+                return dict(record)
+            self._records[key] = {"requestId": request_id, "expiresAt": now + ttl_seconds}
+            return None
+
+    def release(self, key: str, request_id: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record and record["requestId"] == request_id:
+                del self._records[key]
+
+
+class DynamoLockStore:
+    """
+    In-flight records in DynamoDB, written with a conditional put so exactly one
+    caller owns a query hash until the record is released or expires (TTL attribute).
+    """
+
+    def __init__(self, dynamodb_client, table_name: str):
+        self.dynamodb = dynamodb_client
+        self.table_name = table_name
+
+    def acquire(self, key: str, request_id: str, ttl_seconds: int = INFLIGHT_TTL_SECONDS):
+        """Returns None if the lock was taken, otherwise the existing in-flight record."""
+        for _ in range(2):
+            now = int(time.time())
+            try:
+                self.dynamodb.put_item(
+                    TableName=self.table_name,
+                    Item={
+                        "queryHash": {"S": key},
+                        "requestId": {"S": request_id},
+                        "expiresAt": {"N": str(now + ttl_seconds)},
+                    },
+                    # TTL deletion is lazy, so expired records are treated as free
+                    ConditionExpression="attribute_not_exists(queryHash) OR expiresAt < :now",
+                    ExpressionAttributeValues={":now": {"N": str(now)}},
+                )
+                return None
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                pass
+
+            item = self.dynamodb.get_item(
+                TableName=self.table_name,
+                Key={"queryHash": {"S": key}},
+                ConsistentRead=True,
+            ).get("Item")
+            if item:
+                return {"requestId": item["requestId"]["S"], "expiresAt": int(item["expiresAt"]["N"])}
+            # Released between our put and get; try to take it again
+
+        raise RuntimeError(f"Could not acquire or read in-flight record {key}")
+
+    def release(self, key: str, request_id: str):
+        try:
+            self.dynamodb.delete_item(
+                TableName=self.table_name,
+                Key={"queryHash": {"S": key}},
+                ConditionExpression="requestId = :rid",
+                ExpressionAttributeValues={":rid": {"S": request_id}},
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            pass
+
+
+def make_lock_store(region_name: str = None):
+    """DynamoDB-backed store when INFLIGHT_TABLE_NAME is set, in-memory otherwise."""
+    if INFLIGHT_TABLE_NAME:
+        from clients import lazy_client
+        return DynamoLockStore(lazy_client('dynamodb', region_name=region_name, call_type='control'), INFLIGHT_TABLE_NAME)
+    return InMemoryLockStore()
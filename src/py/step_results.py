@@ -0,0 +1,98 @@
+"""What the search/cut workflow's durable steps checkpoint and log."""
+import hashlib
+import json
+import logging
+import os
+
+from aws_durable_execution_sdk_python.serdes import JsonSerDes, SerDes, SerDesContext
+
+from metrics import emit_checkpoint_size
+
+STEP_LOG_LEVEL = os.environ.get('STEP_LOG_LEVEL', 'INFO').upper()
+CHECKPOINT_INLINE_BYTES = int(os.environ.get('CHECKPOINT_INLINE_BYTES', str(16 * 1024)))
+CHECKPOINT_PREFIX = "checkpoints/"
+POINTER_KEY = "$s3"
+POINTER_PREFIX = '{"$s3": '
+# Offloaded payloads kept per container for replays
+CACHED_PAYLOADS = 32
+
+# Fields each step's checkpoint keeps; anything else a step returns is dropped
+STEP_RESULT_FIELDS = {
+    "search": ("s3_uri", "start_time", "end_time", "score", "timings"),
+    "cut": ("cut_key", "presigned_url", "stream_url", "timings"),
+    "preview": ("thumbnail_url", "preview_url", "timings"),
+}
+
+
+def project(result: dict, step: str) -> dict:
+    """The fields of result that step's checkpoint keeps (missing ones are left out)."""
+    return {field: result[field] for field in STEP_RESULT_FIELDS[step] if field in result}
+
+
+def summarize_vectors(vectors: list) -> str:
+    """One-line summary of a query response, for INFO logs."""
+    if not vectors:
+        return "no vectors"
+    best = vectors[0]
+    return (f"{len(vectors)} vector(s), best {best.get('key')} (distance {best.get('distance')}, "
+            f"source {(best.get('metadata') or {}).get('s3_uri')})")
+
+
+def configure_step_logging():
+    """Sets the level of the root logger, which durable step loggers write to."""
+    logging.getLogger().setLevel(STEP_LOG_LEVEL)
+
+
+class OffloadSerDes(SerDes):
+    """
+    Checkpoints of at most inline_bytes, encoded by `encoding`; larger
+    encodings are put to s3://bucket/CHECKPOINT_PREFIX... and checkpointed as
+    {"$s3": uri}. Step results are JSON; parallel branch and batch results
+    keep the SDK's EXTENDED_TYPES_SERDES (a BatchResult is not plain JSON).
+    """
+
+    def __init__(self, s3_client, bucket: str, step: str, inline_bytes: int = CHECKPOINT_INLINE_BYTES,
+                 encoding: SerDes = JsonSerDes()):
+        # A client, or a callable returning one (to follow a module's client attribute)
+        self._s3 = s3_client
+        self.bucket = bucket
+        self.step = step
+        self.inline_bytes = inline_bytes
+        self.encoding = encoding
+        self._cache = {}
+
+    @property
+    def s3(self):
+        return self._s3() if callable(self._s3) else self._s3
+
+    def _key(self, serdes_context: SerDesContext) -> str:
+        execution = hashlib.sha256(serdes_context.durable_execution_arn.encode()).hexdigest()[:32]
+        return f"{CHECKPOINT_PREFIX}{execution}/{serdes_context.operation_id}.json"
+
+    def serialize(self, value, serdes_context: SerDesContext) -> str:
+        data = self.encoding.serialize(value, serdes_context)
+        size = len(data.encode())
+        if size <= self.inline_bytes or not self.bucket:
+            emit_checkpoint_size(self.step, size, offloaded=False)
+            return data
+        key = self._key(serdes_context)
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType='application/json')
+        uri = f"s3://{self.bucket}/{key}"
+        self._remember(uri, data)
+        pointer = json.dumps({POINTER_KEY: uri})
+        emit_checkpoint_size(self.step, len(pointer), offloaded=True, payload_bytes=size)
+        return pointer
+
+    def _remember(self, uri: str, data: str):
+        if len(self._cache) >= CACHED_PAYLOADS:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[uri] = data
+
+    def deserialize(self, data: str, serdes_context: SerDesContext):
+        if data.startswith(POINTER_PREFIX):
+            uri = json.loads(data)[POINTER_KEY]
+            if uri not in self._cache:
+                bucket, key = uri[len("s3://"):].split('/', 1)
+                self._remember(uri, self.s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode())
+            data = self._cache[uri]
+        return self.encoding.deserialize(data, serdes_context)
@@ -0,0 +1,75 @@
+import json
+
+EMBEDDING_MODEL_ID = 'amazon.nova-2-multimodal-embeddings-v1:0'
+
+
+def embed_text(bedrock_runtime, text: str, dimension: int = 1024) -> list:
+    """
+    Embeds a text query with Nova multimodal embeddings (VIDEO_RETRIEVAL purpose).
+    """
+    request_body = {
+        "taskType": "SINGLE_EMBEDDING",
+        "singleEmbeddingParams": {
+            "embeddingPurpose": "VIDEO_RETRIEVAL",
+            "embeddingDimension": dimension,
+            "text": {"truncationMode": "NONE", "value": text},
+        },
+    }
+
+    response = bedrock_runtime.invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        body=json.dumps(request_body),
+        accept="application/json",
+        contentType="application/json",
+    )
+    return json.loads(response.get('body').read())['embeddings'][0]['embedding']
+
+
+def query_index(s3_vectors, vector_bucket_name: str, index_name: str, embedding: list, top_k: int = 1,
+                filter_expression: dict = None) -> list:
+    """
+    Runs a nearest-neighbour query against the S3 Vector Index and returns the raw vectors.
+    `filter_expression` (see search_filters.build_filter) narrows the search inside the index.
+    """
+    params = {
+        "vectorBucketName": vector_bucket_name,
+        "indexName": index_name,
+        "queryVector": {'float32': embedding},
+        "topK": top_k,
+        "returnMetadata": True,
+        "returnDistance": True,
+    }
+    if filter_expression:
+        params["filter"] = filter_expression
+    search_response = s3_vectors.query_vectors(**params)
+    return search_response.get('vectors', [])
+
+
+def _first_present(metadata: dict, *keys):
+    # `or` chaining would skip a legitimate 0.0 start time
+    for key in keys:
+        if metadata.get(key) is not None:
+            return metadata[key]
+    return None
+
+
+def extract_match(vector: dict) -> dict:
+    """
+    Converts a query_vectors result into the match dict used by the cut step.
+    """
+    metadata = vector.get('metadata', {})
+
+    # Support multiple metadata formats for timestamps
+    start_time = _first_present(metadata, 'segmentStartSeconds', 'startSeconds', 'start_seconds')
+    end_time = _first_present(metadata, 'segmentEndSeconds', 'endSeconds', 'end_seconds')
+
+    if start_time is None or end_time is None:
+        raise ValueError(f"Missing start/end time in metadata. Keys found: {metadata.keys()}")
+
+    return {
+        "s3_uri": metadata.get('s3_uri'),
+        "start_time": start_time,
+        "end_time": end_time,
+        "score": vector.get('score'),
+        "distance": vector.get('distance'),
+    }
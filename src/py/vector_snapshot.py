@@ -0,0 +1,396 @@
+"""
+On-disk snapshot of the vector index, laid out so it can be memory-mapped:
+
+    manifest.json   dimension, count, created_at, normalized, float32, quantization
+    vectors.f32     count x dimension float32, row-major (L2-normalized); optional
+    codes.i8        count x dimension int8 scalar-quantized codes; optional
+    sq_params.f32   2 x dimension float32 quantizer offset and scale
+    keys.idx        count + 1 int64 offsets into keys.bin
+    keys.bin        utf-8 vector keys, concatenated
+    segments.bin    count records of (source uint32, start float32, end float32)
+    sources.json    distinct metadata records (s3_uri, uploaded_at, source_duration, tags,
+                    shotIndex...): everything but the segment times
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from quantization import ScalarQuantizer
+
+SNAPSHOT_VERSION = 1
+SEGMENT_DTYPE = np.dtype([('source', '<u4'), ('start', '<f4'), ('end', '<f4')])
+
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.f32'
+KEYS_INDEX_FILE = 'keys.idx'
+KEYS_FILE = 'keys.bin'
+SEGMENTS_FILE = 'segments.bin'
+SOURCES_FILE = 'sources.json'
+CODES_FILE = 'codes.i8'
+SQ_PARAMS_FILE = 'sq_params.f32'
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so cosine similarity becomes a dot product."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _memmap(path: str, dtype, shape):
+    # np.memmap refuses zero-length files
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class VectorSnapshot:
+    """Read-only, memory-mapped view of a snapshot directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, SOURCES_FILE)) as f:
+            self.sources = json.load(f)
+
+        self.dimension = self.manifest['dimension']
+        self.count = self.manifest['count']
+        self.vectors = None
+        if self.manifest.get('float32', True):
+            self.vectors = _memmap(os.path.join(path, VECTORS_FILE), np.float32, (self.count, self.dimension))
+        self.codes = None
+        self.quantizer = None
+        if self.manifest.get('quantization') == 'int8':
+            params = np.fromfile(os.path.join(path, SQ_PARAMS_FILE), dtype=np.float32).reshape(2, self.dimension)
+            self.quantizer = ScalarQuantizer.from_params(params)
+            self.codes = _memmap(os.path.join(path, CODES_FILE), np.int8, (self.count, self.dimension))
+        self.key_offsets = _memmap(os.path.join(path, KEYS_INDEX_FILE), np.int64, (self.count + 1,))
+        self.key_bytes = _memmap(os.path.join(path, KEYS_FILE), np.uint8, (int(self.key_offsets[-1]),))
+        self.segments = _memmap(os.path.join(path, SEGMENTS_FILE), SEGMENT_DTYPE, (self.count,))
+
+    @property
+    def created_at(self) -> float:
+        return self.manifest.get('created_at', 0)
+
+    def age_seconds(self) -> float:
+        return time.time() - self.created_at
+
+    def key(self, row: int) -> str:
+        start, end = self.key_offsets[row], self.key_offsets[row + 1]
+        return bytes(self.key_bytes[start:end]).decode('utf-8')
+
+    def metadata(self, row: int) -> dict:
+        """Metadata in the same shape query_vectors returns for the S3 index."""
+        segment = self.segments[row]
+        return {
+            **self.sources[int(segment['source'])],
+            'segmentStartSeconds': float(segment['start']),
+            'segmentEndSeconds': float(segment['end']),
+        }
+
+
+def _replace_json(path: str, data):
+    # Write-then-rename so readers never see a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class SnapshotWriter:
+    """
+    Creates a snapshot or appends to an existing one. Data files are only ever
+    appended to and the manifest is replaced last, so readers that already
+    mapped `count` rows keep a consistent view while a video is being appended.
+    """
+
+    def __init__(self, path: str, dimension: int = None, quantize: bool = False, store_float32: bool = True):
+        """
+        `quantize` and `store_float32` only apply when a new snapshot is created;
+        an existing snapshot keeps its own layout. Without float32 vectors search
+        runs on the int8 codes alone (no re-scoring).
+        """
+        self.path = path
+        self.quantizer = None
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+            with open(os.path.join(path, SOURCES_FILE)) as f:
+                self.sources = json.load(f)
+            if dimension and self.manifest['dimension'] and dimension != self.manifest['dimension']:
+                raise ValueError(f"Snapshot has dimension {self.manifest['dimension']}, got {dimension}")
+            key_offsets = np.fromfile(os.path.join(path, KEYS_INDEX_FILE), dtype=np.int64)
+            self.key_bytes_length = int(key_offsets[self.manifest['count']])
+            if self.manifest.get('quantization') == 'int8' and os.path.exists(os.path.join(path, SQ_PARAMS_FILE)):
+                params = np.fromfile(os.path.join(path, SQ_PARAMS_FILE), dtype=np.float32)
+                self.quantizer = ScalarQuantizer.from_params(params.reshape(2, -1))
+        else:
+            self.manifest = {'version': SNAPSHOT_VERSION, 'dimension': dimension or 0, 'count': 0,
+                             'created_at': 0, 'normalized': True, 'float32': store_float32,
+                             'quantization': 'int8' if quantize else None}
+            self.sources = []
+            self.key_bytes_length = 0
+            np.zeros(1, dtype=np.int64).tofile(os.path.join(path, KEYS_INDEX_FILE))
+            for name in (VECTORS_FILE, KEYS_FILE, SEGMENTS_FILE, CODES_FILE):
+                open(os.path.join(path, name), 'wb').close()
+        self.source_ids = {self._source_key(source): i for i, source in enumerate(self.sources)}
+        self._truncate_uncommitted()
+
+    @staticmethod
+    def _source_key(source: dict) -> str:
+        # All fields, not just s3_uri: vectors of one video can differ in per-vector fields (shotIndex, tags)
+        return json.dumps(source, sort_keys=True)
+
+    def _truncate_uncommitted(self):
+        # Drop bytes left behind by an append that crashed before its manifest was written
+        count, dimension = self.manifest['count'], self.manifest['dimension']
+        sizes = {
+            VECTORS_FILE: count * dimension * 4 if self.manifest.get('float32', True) else 0,
+            KEYS_INDEX_FILE: (count + 1) * 8,
+            KEYS_FILE: self.key_bytes_length,
+            SEGMENTS_FILE: count * SEGMENT_DTYPE.itemsize,
+            CODES_FILE: count * dimension if self.manifest.get('quantization') == 'int8' else 0,
+        }
+        for name, size in sizes.items():
+            file_path = os.path.join(self.path, name)
+            if os.path.exists(file_path) and os.path.getsize(file_path) > size:
+                os.truncate(file_path, size)
+
+    def append(self, keys: list, vectors, metadatas: list):
+        """Appends rows; call commit() to make them visible to readers."""
+        if not keys:
+            return
+        if not self.manifest.get('float32', True) and self.manifest.get('quantization') != 'int8':
+            raise ValueError("Snapshot stores no float32 or int8 vectors; re-export it to append rows")
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(keys), -1))
+        if not self.manifest['dimension']:
+            self.manifest['dimension'] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.manifest['dimension']:
+            raise ValueError(f"Snapshot has dimension {self.manifest['dimension']}, got {vectors.shape[1]}")
+
+        segments = np.zeros(len(keys), dtype=SEGMENT_DTYPE)
+        for row, metadata in enumerate(metadatas):
+            source = {k: v for k, v in metadata.items() if k not in ('segmentStartSeconds', 'segmentEndSeconds')}
+            source_key = self._source_key(source)
+            if source_key not in self.source_ids:
+                self.source_ids[source_key] = len(self.sources)
+                self.sources.append(source)
+            segments[row] = (self.source_ids[source_key], metadata.get('segmentStartSeconds', 0.0),
+                             metadata.get('segmentEndSeconds', 0.0))
+
+        encoded = [k.encode('utf-8') for k in keys]
+        offsets = self.key_bytes_length + np.cumsum([len(k) for k in encoded], dtype=np.int64)
+
+        if self.manifest.get('float32', True):
+            with open(os.path.join(self.path, VECTORS_FILE), 'ab') as f:
+                vectors.tofile(f)
+        if self.manifest.get('quantization') == 'int8':
+            if self.quantizer is None:
+                # Incremental snapshots learn the ranges from their first batch;
+                # quantize_snapshot() retrains on the full data instead.
+                self.quantizer = ScalarQuantizer.train(vectors)
+                self.quantizer.params().tofile(os.path.join(self.path, SQ_PARAMS_FILE))
+            with open(os.path.join(self.path, CODES_FILE), 'ab') as f:
+                self.quantizer.encode(vectors).tofile(f)
+        with open(os.path.join(self.path, KEYS_INDEX_FILE), 'ab') as f:
+            offsets.tofile(f)
+        with open(os.path.join(self.path, KEYS_FILE), 'ab') as f:
+            f.write(b''.join(encoded))
+        with open(os.path.join(self.path, SEGMENTS_FILE), 'ab') as f:
+            segments.tofile(f)
+
+        self.key_bytes_length = int(offsets[-1])
+        self.manifest['count'] += len(keys)
+
+    def commit(self) -> VectorSnapshot:
+        _replace_json(os.path.join(self.path, SOURCES_FILE), self.sources)
+        # Manifest last: it defines how many rows readers may map
+        self.manifest['created_at'] = time.time()
+        _replace_json(os.path.join(self.path, MANIFEST_FILE), self.manifest)
+        return VectorSnapshot(self.path)
+
+
+def reset_snapshot(path: str):
+    """Discards a snapshot (manifest and derived .npy structures) so it can be rewritten."""
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        if name in (MANIFEST_FILE, SQ_PARAMS_FILE) or name.endswith('.npy'):
+            os.remove(os.path.join(path, name))
+
+
+def write_snapshot(path: str, keys: list, vectors, metadatas: list) -> VectorSnapshot:
+    """
+    Writes a complete snapshot from in-memory vectors and S3-Vectors-style metadata
+    dicts (s3_uri, segmentStartSeconds, segmentEndSeconds and source-level fields).
+    """
+    reset_snapshot(path)
+    writer = SnapshotWriter(path)
+    writer.append(keys, vectors, metadatas)
+    return writer.commit()
+
+
+def quantize_snapshot(path: str, drop_float32: bool = False, chunk_rows: int = 65536) -> VectorSnapshot:
+    """
+    Adds int8 codes to a float32 snapshot, training the quantizer on all rows.
+    With drop_float32 the float vectors are removed (about 4x less memory and disk,
+    but no float32 re-scoring).
+    """
+    snapshot = VectorSnapshot(path)
+    if snapshot.vectors is None:
+        raise ValueError("Snapshot has no float32 vectors to quantize")
+    quantizer = ScalarQuantizer.train(snapshot.vectors)
+    quantizer.params().tofile(os.path.join(path, SQ_PARAMS_FILE))
+    with open(os.path.join(path, CODES_FILE), 'wb') as f:
+        for start in range(0, snapshot.count, chunk_rows):
+            quantizer.encode(np.asarray(snapshot.vectors[start:start + chunk_rows])).tofile(f)
+
+    _replace_json(os.path.join(path, MANIFEST_FILE), dict(snapshot.manifest, quantization='int8'))
+    if drop_float32:
+        drop_float32_vectors(path)
+    return VectorSnapshot(path)
+
+
+def drop_float32_vectors(path: str):
+    """Removes the float32 vectors once a compressed representation exists."""
+    manifest = VectorSnapshot(path).manifest
+    _replace_json(os.path.join(path, MANIFEST_FILE), dict(manifest, float32=False))
+    os.truncate(os.path.join(path, VECTORS_FILE), 0)
+
+
+# --- Exporters ---
+
+def records_from_jsonl(lines, s3_source_uri: str = None, source_fields: dict = None, key_prefix: str = None):
+    """
+    Parses Bedrock segmented-embedding JSONL lines (as consumed by save_embeddings.py)
+    into (key, embedding, metadata) tuples using the same key and metadata scheme.
+    """
+    for i, line in enumerate(lines):
+        if not line or not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        metadata = {**record.get('metadata', {}), **record.get('segmentMetadata', {})}
+        if s3_source_uri:
+            metadata['s3_uri'] = s3_source_uri
+        if source_fields:
+            metadata.update(source_fields)
+        key = f"{key_prefix or record.get('id')}-{i}"
+        yield key, record.get('embedding'), metadata
+
+
+def append_records(writer: SnapshotWriter, records, batch_size: int = 4096) -> int:
+    """Appends (key, embedding, metadata) tuples in batches; returns the row count."""
+    total = 0
+    keys, vectors, metadatas = [], [], []
+    for key, embedding, metadata in records:
+        keys.append(key)
+        vectors.append(embedding)
+        metadatas.append(metadata)
+        if len(keys) >= batch_size:
+            writer.append(keys, vectors, metadatas)
+            total += len(keys)
+            keys, vectors, metadatas = [], [], []
+    writer.append(keys, vectors, metadatas)
+    return total + len(keys)
+
+
+def records_from_s3_vectors(s3_vectors, vector_bucket_name: str, index_name: str,
+                            segment_index: int = 0, segment_count: int = 1):
+    """
+    Streams every vector of the S3 Vector Index with data and metadata.
+    segment_index/segment_count split the listing so several exporters can run in parallel.
+    """
+    params = {
+        'vectorBucketName': vector_bucket_name,
+        'indexName': index_name,
+        'returnData': True,
+        'returnMetadata': True,
+        'maxResults': 1000,
+    }
+    if segment_count > 1:
+        params.update(segmentIndex=segment_index, segmentCount=segment_count)
+    while True:
+        response = s3_vectors.list_vectors(**params)
+        for vector in response.get('vectors', []):
+            yield vector['key'], vector['data']['float32'], vector.get('metadata', {})
+        if not response.get('nextToken'):
+            break
+        params['nextToken'] = response['nextToken']
+
+
+def upload_snapshot(s3_client, path: str, s3_uri: str):
+    """Uploads a snapshot directory; the manifest goes last so readers never sync a partial export."""
+    bucket, _, prefix = s3_uri.replace("s3://", "").partition("/")
+    prefix = prefix.rstrip('/') + '/'
+    names = sorted(n for n in os.listdir(path) if not n.endswith('.tmp'))
+    names.sort(key=lambda n: n == MANIFEST_FILE)
+    for name in names:
+        s3_client.upload_file(os.path.join(path, name), bucket, prefix + name)
+
+
+def main(argv=None):
+    import argparse
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Export the vector index into a memory-mappable snapshot.")
+    parser.add_argument('--snapshot', required=True, help="Local snapshot directory (created or appended to)")
+    parser.add_argument('--upload', help="s3://bucket/prefix to upload the snapshot to afterwards")
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    s3v = sub.add_parser('s3vectors', help="Full export from an S3 Vector Index (replaces the snapshot)")
+    s3v.add_argument('--vector-bucket', default=os.environ.get('VECTOR_BUCKET_NAME'))
+    s3v.add_argument('--index', default=os.environ.get('VECTOR_INDEX_NAME'))
+
+    jsonl = sub.add_parser('jsonl', help="Append one ingested video from Bedrock JSONL output")
+    jsonl.add_argument('files', nargs='+', help="Local .jsonl files or s3:// URIs")
+    jsonl.add_argument('--source-uri', help="s3:// URI of the source video (written as s3_uri)")
+
+    quantize = sub.add_parser('quantize', help="Add int8 scalar-quantized codes to the snapshot")
+    quantize.add_argument('--drop-float32', action='store_true', help="Remove float32 vectors afterwards")
+
+    args = parser.parse_args(argv)
+    s3_client = boto3.client('s3', region_name=args.region)
+
+    if args.command == 'quantize':
+        snapshot = quantize_snapshot(args.snapshot, drop_float32=args.drop_float32)
+        print(f"Quantized {snapshot.count} vectors to int8 (float32 kept: {snapshot.vectors is not None})")
+        if args.upload:
+            upload_snapshot(s3_client, args.snapshot, args.upload)
+        return
+
+    if args.command == 's3vectors':
+        reset_snapshot(args.snapshot)
+        writer = SnapshotWriter(args.snapshot)
+        s3_vectors = boto3.client('s3vectors', region_name=args.region)
+        count = append_records(writer, records_from_s3_vectors(s3_vectors, args.vector_bucket, args.index))
+    else:
+        writer = SnapshotWriter(args.snapshot)
+        count = 0
+        for file in args.files:
+            if file.startswith("s3://"):
+                bucket, _, key = file.replace("s3://", "").partition("/")
+                lines = s3_client.get_object(Bucket=bucket, Key=key)['Body'].iter_lines()
+            else:
+                lines = open(file, 'rb')
+            count += append_records(writer, records_from_jsonl(lines, args.source_uri))
+
+    snapshot = writer.commit()
+    print(f"Snapshot {args.snapshot}: +{count} vectors, {snapshot.count} total, dimension {snapshot.dimension}")
+
+    if args.upload:
+        upload_snapshot(s3_client, args.snapshot, args.upload)
+        print(f"Uploaded snapshot to {args.upload}")
+
+
+if __name__ == '__main__':
+    main()
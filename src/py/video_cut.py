@@ -0,0 +1,160 @@
+import os
+import shutil
+import subprocess
+import time
+import uuid
+
+from clip_stream import (CLIP_HLS_ENABLED, HLS_PLAYLIST_NAME, HlsPublisher, hls_output_args, run_publishing,
+                         stream_prefix)
+from ffmpeg_utils import FFMPEG_PATH
+from media_transfer import download, upload
+from metrics import PhaseTimer, emit_latency
+from mezzanine import concat_list, covering_chunks, download_chunks, load_index
+
+PRESIGNED_URL_EXPIRY_SECONDS = 3600
+FFMPEG_LOG_TAIL_CHARS = 2000
+
+
+def parse_s3_uri(s3_uri: str):
+    """Splits s3://bucket/key into (bucket, key)."""
+    parts = s3_uri.replace("s3://", "").split("/", 1)
+    return parts[0], parts[1]
+
+
+# Input options that read a concat demuxer list (of mezzanine chunks)
+CONCAT_INPUT_OPTIONS = ["-f", "concat", "-safe", "0"]
+
+
+def cut_command(input_path: str, output_path: str, start_time, end_time, input_options: list = ()) -> list:
+    """
+    Stream-copy cut of [start_time, end_time].
+    With -ss before -i the output timeline starts at 0, so the clip length is passed with -t.
+    """
+    duration = float(end_time) - float(start_time)
+    return [
+        FFMPEG_PATH,
+        "-ss", str(start_time),
+        *input_options,
+        "-i", input_path,
+        "-t", str(duration),
+        "-c", "copy", # Fast cut
+        "-y",
+        output_path
+    ]
+
+
+def run_cut(command: list):
+    """
+    Runs a cut command. ffmpeg's output is only logged (its tail) if it fails,
+    so cuts running in parallel don't interleave their logs; the
+    CalledProcessError carries the whole stderr.
+    """
+    try:
+        subprocess.run(command, capture_output=True, text=True, errors='replace', check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"ffmpeg exited with {e.returncode}:\n{(e.stderr or '')[-FFMPEG_LOG_TAIL_CHARS:]}")
+        raise
+
+
+def fetch_match(s3_client, match_data: dict, work_dir: str, timer: PhaseTimer, phase_prefix: str = "") -> dict:
+    """
+    Downloads what's needed to read the matched range into work_dir: the
+    mezzanine chunks that cover it (mezzanine.py) if the source has them, the
+    whole source otherwise. Returns the ffmpeg input (path, input_options)
+    and the range's start_time/end_time within it. Phases are timed as
+    <phase_prefix>mezzanine_index and <phase_prefix>s3_download.
+    """
+    s3_uri = match_data.get('s3_uri')
+    if not s3_uri:
+        raise ValueError(f"Missing 's3_uri' in vector metadata. Found keys: {match_data.keys()}")
+    bucket, key = parse_s3_uri(s3_uri)
+    start_time, end_time = float(match_data['start_time']), float(match_data['end_time'])
+
+    with timer.phase(f"{phase_prefix}mezzanine_index"):
+        index = load_index(s3_client, bucket, key)
+
+    if index and index.get('chunks'):
+        covering = covering_chunks(index['chunks'], start_time, end_time)
+        with timer.phase(f"{phase_prefix}s3_download"):
+            paths = download_chunks(s3_client, bucket, covering, work_dir)
+        list_path = os.path.join(work_dir, "concat.txt")
+        with open(list_path, "w") as f:
+            f.write(concat_list(paths))
+        offset = covering[0]['start']
+        return {"path": list_path, "input_options": CONCAT_INPUT_OPTIONS,
+                "start_time": max(0.0, start_time - offset), "end_time": end_time - offset}
+
+    input_path = os.path.join(work_dir, "input.mp4")
+    with timer.phase(f"{phase_prefix}s3_download"):
+        download(s3_client, bucket, key, input_path)
+    return {"path": input_path, "input_options": [], "start_time": start_time, "end_time": end_time}
+
+
+def cut_clip(s3_client, match_data: dict, output_key: str, timer: PhaseTimer = None, on_stream_ready=None) -> dict:
+    """
+    Cuts the matched range with FFmpeg and uploads the clip next to the source.
+    Sources with mezzanine chunks are cut from the chunks covering the match;
+    others are downloaded whole. Returns the clip key and a presigned URL
+    (valid for 1 hour). With CLIP_HLS on, the clip is also published as HLS
+    while it is cut (clip_stream.py): on_stream_ready(playlist_url) is called
+    once the first segment is up, and the result includes stream_url.
+    """
+    timer = timer or PhaseTimer()
+    work_dir = f"/tmp/{uuid.uuid4()}"
+    output_path = os.path.join(work_dir, "output.mp4")
+    hls_dir = os.path.join(work_dir, "hls")
+    publisher = None
+
+    try:
+        os.makedirs(work_dir)
+        # 1. Download (the chunks covering the match, or the whole source)
+        source = fetch_match(s3_client, match_data, work_dir, timer)
+        bucket, _ = parse_s3_uri(match_data['s3_uri'])
+        command = cut_command(source['path'], output_path, source['start_time'], source['end_time'],
+                              source['input_options'])
+
+        # 2. Cut with FFmpeg (and publish the HLS rendition while it runs)
+        if CLIP_HLS_ENABLED:
+            os.makedirs(hls_dir)
+            duration = source['end_time'] - source['start_time']
+            command += hls_output_args(os.path.join(hls_dir, HLS_PLAYLIST_NAME), duration)
+            publisher = HlsPublisher(s3_client, bucket, stream_prefix(output_key), hls_dir,
+                                     PRESIGNED_URL_EXPIRY_SECONDS)
+            cut_started = time.perf_counter()
+
+            def stream_ready(url):
+                first_segment_ms = (time.perf_counter() - cut_started) * 1000
+                timer.timings["hls_first_segment"] = round(first_segment_ms, 3)
+                emit_latency("hls_first_segment", first_segment_ms)
+                if on_stream_ready:
+                    on_stream_ready(url)
+
+            with timer.phase("ffmpeg_cut"):
+                run_publishing(command, publisher, on_ready=stream_ready)
+        else:
+            with timer.phase("ffmpeg_cut"):
+                run_cut(command)
+
+        # 3. Upload Cut
+        with timer.phase("s3_upload"):
+            upload(s3_client, output_path, bucket, output_key)
+
+        # 4. Generate Presigned URL
+        with timer.phase("presign"):
+            presigned_url = s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': bucket, 'Key': output_key},
+                ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
+            )
+
+        result = {
+            "cut_key": output_key,
+            "presigned_url": presigned_url,
+            "timings": timer.timings
+        }
+        if publisher:
+            result["stream_url"] = publisher.playlist_url()
+        return result
+    finally:
+        # Cleanup
+        shutil.rmtree(work_dir, ignore_errors=True)
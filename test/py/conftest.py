@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+# Lambda sources use flat imports, as they do when packaged; the bench holds the local AWS stand-ins
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'py'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
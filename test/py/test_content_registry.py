@@ -0,0 +1,63 @@
+"""
+Claims in the content registry, and the duplicate-upload check retried by the
+embeddings workflow. Run with `python -m pytest test/py` (needs the packages
+in src/py/requirements.txt).
+"""
+import io
+
+import pytest
+
+import dedup_upload
+from content_registry import INDEXED, PENDING, InMemoryContentRegistry
+
+
+class ObjectStore:
+    """The two S3 calls fingerprint() makes, over in-memory objects."""
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+
+    def head_object(self, Bucket, Key, **_):
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def get_object(self, Bucket, Key, Range=None, **_):
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': io.BytesIO(data)}
+
+
+def test_retried_claim_keeps_ownership():
+    registry = InMemoryContentRegistry()
+    assert registry.claim('fp', 's3://media/a.mp4') is None
+    assert registry.claim('fp', 's3://media/a.mp4') is None
+    registry.mark_indexed('fp', 's3://media/a.mp4', ['k1'])
+    record = registry.claim('fp', 's3://media/a.mp4')
+    assert record['status'] == INDEXED
+
+
+def test_pending_claim_of_another_upload_is_returned():
+    registry = InMemoryContentRegistry()
+    assert registry.claim('fp', 's3://media/a.mp4') is None
+    record = registry.claim('fp', 's3://media/b.mp4')
+    assert record['status'] == PENDING and record['mediaFileUri'] == 's3://media/a.mp4'
+
+
+@pytest.fixture
+def upload(monkeypatch):
+    monkeypatch.setattr(dedup_upload, 's3_client', ObjectStore({('media', 'a.mp4'): b'video' * 1000}))
+    monkeypatch.setattr(dedup_upload, 'registry', InMemoryContentRegistry())
+    return 's3://media/a.mp4'
+
+
+def test_retried_check_upload_is_still_the_claimant(upload):
+    first = dedup_upload.check_upload(upload)
+    retried = dedup_upload.check_upload(upload)
+    assert first == retried == {'duplicate': False, 'fingerprint': first['fingerprint']}
+    assert first['fingerprint']
+
+    # Ingestion with the fingerprint completes the record
+    dedup_upload.registry.mark_indexed(first['fingerprint'], upload, ['k1'])
+    record = dedup_upload.registry.claim(first['fingerprint'], 's3://media/copy.mp4')
+    assert record['status'] == INDEXED and record['vectorKeys'] == ['k1']
@@ -0,0 +1,99 @@
+"""
+Batching, retries and flushing of the background EventBridge emitter.
+"""
+import json
+
+import pytest
+
+import event_emitter
+from event_emitter import PUT_EVENTS_MAX_ENTRIES, EventEmitter
+
+
+class Events:
+    """put_events stand-in; fail_keys are rejected as often as listed in failures."""
+
+    def __init__(self, failures: dict = None):
+        self.calls = []
+        self.failures = dict(failures or {})
+
+    def put_events(self, Entries):
+        self.calls.append([json.loads(entry['Detail'])['n'] for entry in Entries])
+        results = []
+        for entry in Entries:
+            n = json.loads(entry['Detail'])['n']
+            if self.failures.get(n):
+                self.failures[n] -= 1
+                results.append({'ErrorCode': 'InternalFailure', 'ErrorMessage': 'try again'})
+            else:
+                results.append({'EventId': str(n)})
+        return {'Entries': results}
+
+    @property
+    def sent(self) -> list:
+        return [n for call in self.calls for n in call]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(event_emitter.time, 'sleep', lambda seconds: None)
+
+
+def emit_all(emitter: EventEmitter, count: int):
+    # Queued before the worker starts, so batching is deterministic
+    for n in range(count):
+        emitter._queue.put(({'Detail': json.dumps({'n': n})}, False))
+    emitter.flush(timeout=5)
+
+
+def test_entries_are_batched_up_to_the_put_events_limit():
+    events = Events()
+    emitter = EventEmitter(events, 'bus')
+    emit_all(emitter, 25)
+    assert [len(call) for call in events.calls] == [PUT_EVENTS_MAX_ENTRIES, PUT_EVENTS_MAX_ENTRIES, 5]
+    assert events.sent == list(range(25))
+
+
+def test_emit_fills_the_entry():
+    events = Events()
+    emitter = EventEmitter(events, 'bus', source='src', detail_type='type')
+    sent = []
+    events.put_events = lambda Entries: sent.extend(Entries) or {'Entries': [{}] * len(Entries)}
+    emitter.emit({'n': 1})
+    emitter.flush(timeout=5)
+    assert sent == [{'Source': 'src', 'DetailType': 'type', 'Detail': '{"n": 1}', 'EventBusName': 'bus'}]
+
+
+def test_failed_entries_are_retried_individually():
+    events = Events(failures={3: 2})
+    emitter = EventEmitter(events, 'bus')
+    emit_all(emitter, 5)
+    assert events.calls == [[0, 1, 2, 3, 4], [3], [3]]
+
+
+def test_entry_is_dropped_after_max_retries():
+    events = Events(failures={0: event_emitter.MAX_ENTRY_RETRIES + 1})
+    emitter = EventEmitter(events, 'bus')
+    emit_all(emitter, 1)
+    assert events.calls == [[0]] * (event_emitter.MAX_ENTRY_RETRIES + 1)
+    assert emitter._queue.unfinished_tasks == 0
+
+
+def test_failing_callback_does_not_stop_the_worker():
+    events = Events()
+    batches = []
+
+    def on_batch_sent(latency_ms, entry_count, replaying):
+        batches.append(entry_count)
+        raise RuntimeError("metrics down")
+
+    emitter = EventEmitter(events, 'bus', on_batch_sent=on_batch_sent)
+    emit_all(emitter, 3)
+    emit_all(emitter, 2)
+    assert emitter._queue.unfinished_tasks == 0
+    assert batches == [3, 2] and events.sent == [0, 1, 2, 0, 1]
+
+
+def test_client_errors_do_not_stop_the_worker():
+    emitter = EventEmitter(None, 'bus')
+    emit_all(emitter, 2)
+    assert emitter._queue.unfinished_tasks == 0
@@ -0,0 +1,48 @@
+"""
+Recall of the compressed local search paths against exact float32 search.
+"""
+import numpy as np
+import pytest
+
+from local_search import LocalVectorIndex
+from pq_index import IVFPQIndex
+from quantization import recall_at_k
+from vector_snapshot import quantize_snapshot, write_snapshot
+
+ROWS, DIMENSION, CLUSTERS = 8000, 128, 100
+
+
+@pytest.fixture(scope='module')
+def snapshot(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(CLUSTERS, DIMENSION))
+    vectors = centers[rng.integers(CLUSTERS, size=ROWS)] + 1.5 * rng.normal(size=(ROWS, DIMENSION))
+    return write_snapshot(str(tmp_path_factory.mktemp('snapshot')), [f"v-{i}" for i in range(ROWS)], vectors,
+                          [{'s3_uri': 's3://media/a.mp4'}] * ROWS)
+
+
+def mean_recall(index: LocalVectorIndex, exact: LocalVectorIndex, queries, k: int = 10) -> float:
+    return float(np.mean([
+        recall_at_k([r['key'] for r in exact.search(query, k, exact=True)], [r['key'] for r in index.search(query, k)])
+        for query in queries
+    ]))
+
+
+def test_ivf_pq_recall_matches_ivf(snapshot):
+    pq = IVFPQIndex.build(snapshot.vectors, iterations=10)
+    exact = LocalVectorIndex(snapshot)
+    queries = [np.asarray(snapshot.vectors[row]) for row in range(0, ROWS, ROWS // 50)]
+
+    ivf_recall = mean_recall(LocalVectorIndex(snapshot, ivf=pq.ivf), exact, queries)
+    pq_recall = mean_recall(LocalVectorIndex(snapshot, ivf=pq.ivf, pq=pq), exact, queries)
+    assert pq_recall >= 0.95
+    # The float32 re-scoring shortlist is long enough that PQ loses almost nothing over its IVF lists
+    assert pq_recall >= ivf_recall - 0.01
+
+
+def test_int8_recall(snapshot, tmp_path):
+    path = str(tmp_path / 'int8')
+    write_snapshot(path, [snapshot.key(row) for row in range(ROWS)], snapshot.vectors, [{}] * ROWS)
+    quantized = quantize_snapshot(path)
+    queries = [np.asarray(snapshot.vectors[row]) for row in range(0, ROWS, ROWS // 50)]
+    assert mean_recall(LocalVectorIndex(quantized), LocalVectorIndex(quantized), queries) >= 0.99
@@ -0,0 +1,33 @@
+"""
+Part size and thread count of S3 media transfers (transfer_plan).
+"""
+import pytest
+
+from media_transfer import MAX_PARTS, MIB, MIN_PART_BYTES, TRANSFER_MEMORY_FRACTION, transfer_plan
+
+GIB = 1024 * MIB
+
+
+def test_small_object_is_one_part_on_one_thread():
+    assert transfer_plan(MIB, memory_mb=1769, max_threads=10) == (MIN_PART_BYTES, 1)
+
+
+def test_parts_are_spread_over_the_threads():
+    # About PARTS_PER_THREAD parts per thread, rounded up to whole MiB
+    assert transfer_plan(GIB, memory_mb=1769, max_threads=10) == (26 * MIB, 10)
+
+
+def test_threads_are_limited_by_memory():
+    # A quarter of 128 MB holds two 16 MiB parts
+    assert transfer_plan(GIB, memory_mb=128, max_threads=10) == (16 * MIB, 2)
+
+
+@pytest.mark.parametrize('size', [1, 8 * MIB, 100 * MIB, 5 * GIB, 100 * GIB, 400 * GIB])
+@pytest.mark.parametrize('memory_mb,max_threads', [(128, 2), (1769, 10), (10240, 64)])
+def test_plan_limits(size, memory_mb, max_threads):
+    part, threads = transfer_plan(size, memory_mb=memory_mb, max_threads=max_threads)
+    assert part >= MIN_PART_BYTES and part % MIB == 0
+    assert -(-size // part) <= MAX_PARTS
+    assert 1 <= threads <= min(max_threads, -(-size // part))
+    if threads > 1:
+        assert part * threads <= memory_mb * MIB * TRANSFER_MEMORY_FRACTION
@@ -0,0 +1,109 @@
+"""
+Ingestion of Bedrock segmented-embedding JSONL outputs: vectors are written in
+batches while the file streams, each stamped with the source duration.
+"""
+import json
+
+import pytest
+
+import save_embeddings
+from fakes import LocalS3, RecordingS3Vectors
+from search_filters import SOURCE_DURATION_KEY
+
+BUCKET = 'media'
+SEGMENTS = 45
+
+
+class StreamingS3(LocalS3):
+    """Counts the lines handed out by iter_lines, so writes can be checked against reads."""
+
+    lines_read = 0
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        response = super().get_object(Bucket, Key, Range=Range, **kwargs)
+        if not Range:
+            body = response['Body']
+
+            def iter_lines():
+                for line in body.iter_lines():
+                    self.lines_read += 1
+                    yield line
+            response['Body'] = type('Body', (), {'iter_lines': staticmethod(iter_lines)})()
+        return response
+
+
+class ProgressVectors(RecordingS3Vectors):
+    def __init__(self, s3: StreamingS3):
+        super().__init__(keep_vectors=True)
+        self.s3 = s3
+        self.lines_read_at_put = []
+
+    def put_vectors(self, vectorBucketName, indexName, vectors, **kwargs):
+        self.lines_read_at_put.append(self.s3.lines_read)
+        return super().put_vectors(vectorBucketName, indexName, vectors, **kwargs)
+
+
+def jsonl(segments: int, segment_seconds: float = 2.0) -> str:
+    return "\n".join(json.dumps({
+        'id': 'job', 'embedding': [0.1] * 256,
+        'segmentMetadata': {'segmentStartSeconds': i * segment_seconds, 'segmentEndSeconds': (i + 1) * segment_seconds},
+    }) for i in range(segments)) + "\n"
+
+
+@pytest.fixture
+def ingestion(monkeypatch, tmp_path):
+    s3 = StreamingS3(str(tmp_path))
+    vectors = ProgressVectors(s3)
+    monkeypatch.setattr(save_embeddings, 's3_client', s3)
+    monkeypatch.setattr(save_embeddings, 's3_vectors_client', vectors)
+    monkeypatch.setattr(save_embeddings, 'SOURCE_BUCKET_NAME', BUCKET)
+    monkeypatch.setattr(save_embeddings, 'describe_source', lambda uri: {})
+    # Smaller than one line, so the probe has to widen its range
+    monkeypatch.setattr(save_embeddings, 'DURATION_PROBE_BYTES', 1024)
+    s3.put_object(Bucket=BUCKET, Key='out/job/output.jsonl', Body=jsonl(SEGMENTS))
+    return s3, vectors
+
+
+def test_last_segment_end_is_read_from_the_tail(ingestion):
+    s3, _ = ingestion
+    assert save_embeddings.last_segment_end('out/job/output.jsonl') == SEGMENTS * 2.0
+    assert s3.lines_read == 0
+
+
+def test_vectors_are_written_while_streaming(ingestion):
+    s3, vectors = ingestion
+    assert save_embeddings.ingest_outputs([(f's3://{BUCKET}/out/job/', 0.0)], f's3://{BUCKET}/a.mp4') == 1
+
+    assert vectors.batch_sizes == [20, 20, 5]
+    # Each batch goes out as soon as it is full, not after the whole file was read
+    assert vectors.lines_read_at_put == [20, 40, SEGMENTS]
+    written = list(vectors.vectors.values())
+    assert len(written) == SEGMENTS
+    assert {vector['metadata'][SOURCE_DURATION_KEY] for vector in written} == {SEGMENTS * 2.0}
+
+
+def test_passed_duration_and_offset_are_used(ingestion):
+    _, vectors = ingestion
+    keys = save_embeddings.process_jsonl_file('out/job/output.jsonl', f's3://{BUCKET}/a.mp4',
+                                              offset_seconds=100.0, source_duration=500.0)
+    assert len(keys) == SEGMENTS
+    first = vectors.vectors[(save_embeddings.VECTOR_BUCKET_NAME, save_embeddings.VECTOR_INDEX_NAME, keys[0])]
+    assert first['metadata']['segmentStartSeconds'] == 100.0
+    assert first['metadata'][SOURCE_DURATION_KEY] == 500.0
+
+
+def test_shot_vectors_pool_windows_across_files(ingestion):
+    s3, vectors = ingestion
+    # A second chunk starting at 90 s; shot 1 spans both files
+    s3.put_object(Bucket=BUCKET, Key='out/job2/output.jsonl', Body=jsonl(5))
+    shots = [{'start': 0.0, 'end': 80.0}, {'start': 80.0, 'end': 95.0}, {'start': 95.0, 'end': 100.0}]
+    keys = save_embeddings.process_shots([('out/job/output.jsonl', 0.0), ('out/job2/output.jsonl', 90.0)],
+                                         f's3://{BUCKET}/a.mp4', shots)
+
+    assert keys == ['job-shot-0', 'job-shot-1', 'job-shot-2']
+    written = [vectors.vectors[(save_embeddings.VECTOR_BUCKET_NAME, save_embeddings.VECTOR_INDEX_NAME, key)]
+               for key in keys]
+    assert [(v['metadata']['segmentStartSeconds'], v['metadata']['segmentEndSeconds'], v['metadata']['shotIndex'])
+            for v in written] == [(0.0, 80.0, 0), (80.0, 95.0, 1), (95.0, 100.0, 2)]
+    assert {v['metadata'][SOURCE_DURATION_KEY] for v in written} == {100.0}
+    assert len(written[0]['data']['float32']) == 256
@@ -0,0 +1,44 @@
+"""
+Translation of the GraphQL SearchFilters input into S3 Vectors metadata filters.
+"""
+from local_search import matches_filter
+from search_filters import (SOURCE_DURATION_KEY, SOURCE_URI_KEY, TAGS_KEY, UPLOADED_AT_KEY, build_filter,
+                            to_epoch_seconds)
+
+
+def test_no_filters_searches_everything():
+    assert build_filter(None) is None
+    assert build_filter({}) is None
+    assert build_filter({'tags': [], 'sourceUri': None}) is None
+
+
+def test_single_condition_is_not_wrapped():
+    assert build_filter({'sourceUri': 's3://media/a.mp4'}) == {SOURCE_URI_KEY: {'$eq': 's3://media/a.mp4'}}
+
+
+def test_conditions_are_combined_with_and():
+    assert build_filter({
+        'uploadedAfter': '2024-01-01T00:00:00Z',
+        'uploadedBefore': 1735689600,
+        'minDurationSeconds': 0,
+        'maxDurationSeconds': '90',
+        'tags': ('dogs', 'park'),
+    }) == {'$and': [
+        {UPLOADED_AT_KEY: {'$gte': 1704067200}},
+        {UPLOADED_AT_KEY: {'$lte': 1735689600}},
+        {SOURCE_DURATION_KEY: {'$gte': 0.0}},
+        {SOURCE_DURATION_KEY: {'$lte': 90.0}},
+        {TAGS_KEY: {'$in': ['dogs', 'park']}},
+    ]}
+
+
+def test_timestamps_accept_epoch_and_iso_with_offset():
+    assert to_epoch_seconds(1704067200.9) == 1704067200
+    assert to_epoch_seconds('2024-01-01T01:00:00+01:00') == 1704067200
+
+
+def test_filter_selects_matching_metadata():
+    expression = build_filter({'minDurationSeconds': 60, 'tags': ['dogs']})
+    assert matches_filter({SOURCE_DURATION_KEY: 120.0, TAGS_KEY: ['cats', 'dogs']}, expression)
+    assert not matches_filter({SOURCE_DURATION_KEY: 30.0, TAGS_KEY: ['dogs']}, expression)
+    assert not matches_filter({SOURCE_DURATION_KEY: 120.0, TAGS_KEY: ['cats']}, expression)
@@ -0,0 +1,54 @@
+"""
+Turning detected cuts into shots, and pooling embedding windows per shot.
+"""
+import math
+
+import pytest
+
+from shot_segmentation import clamp_shots, parse_scene_changes, pool_windows
+
+
+def spans(shots: list) -> list:
+    return [(shot['start'], shot['end']) for shot in shots]
+
+
+def test_cuts_become_contiguous_shots():
+    assert spans(clamp_shots([4.0, 9.0], 12.0, min_seconds=2, max_seconds=10)) == [(0.0, 4.0), (4.0, 9.0),
+                                                                                    (9.0, 12.0)]
+
+
+def test_cuts_outside_the_media_and_duplicates_are_ignored():
+    assert spans(clamp_shots([0.0, 5.0, 5.0, 12.0, 30.0], 12.0, min_seconds=2, max_seconds=10)) == [(0.0, 5.0),
+                                                                                                  (5.0, 12.0)]
+
+
+def test_short_shots_are_merged_into_the_previous_one():
+    # 5.0-5.5 is a flash cut; 11.5-12 is too short to stand alone at the end
+    assert spans(clamp_shots([5.0, 5.5, 11.5], 12.0, min_seconds=2, max_seconds=10)) == [(0.0, 5.5), (5.5, 12.0)]
+
+
+def test_long_shots_are_split_into_equal_parts():
+    assert spans(clamp_shots([], 25.0, min_seconds=2, max_seconds=10)) == [(0.0, 8.333), (8.333, 16.667),
+                                                                           (16.667, 25.0)]
+
+
+def test_scene_changes_are_read_from_showinfo():
+    log = ("[Parsed_showinfo_2 @ 0x1] n:   0 pts:  12800 pts_time:1.0   duration:512\n"
+           "frame=  10 fps=0.0 q=-0.0 size=N/A time=00:00:03.00\n"
+           "[Parsed_showinfo_2 @ 0x1] n:   1 pts:  96000 pts_time:7.5   duration:512\n")
+    assert parse_scene_changes(log) == [1.0, 7.5]
+
+
+def test_windows_are_pooled_by_overlap():
+    windows = [(2.0, 4.0, [0.0, 1.0]), (0.0, 2.0, [1.0, 0.0]), (4.0, 6.0, [0.0, 1.0])]
+    pooled = dict(pool_windows(windows, [{'start': 0.0, 'end': 3.0}, {'start': 3.0, 'end': 6.0}]))
+
+    # First shot: 2 s of [1, 0] and 1 s of [0, 1], normalized
+    assert pooled[0] == pytest.approx([2 / math.sqrt(5), 1 / math.sqrt(5)])
+    assert pooled[1] == pytest.approx([0.0, 1.0])
+
+
+def test_shots_without_windows_are_skipped():
+    windows = [(0.0, 2.0, [1.0, 0.0])]
+    shots = [{'start': 0.0, 'end': 2.0}, {'start': 2.0, 'end': 4.0}]
+    assert [index for index, _ in pool_windows(windows, shots)] == [0]
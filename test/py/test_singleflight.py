@@ -0,0 +1,84 @@
+"""
+Coalescing of identical searches: the in-flight record, the search mutation
+attaching to it, and the workflow releasing it when approval starts.
+"""
+import json
+
+import pytest
+
+import invoke_search_cut_workflow
+import search_cut_workflow
+from fakes import LocalDurableService
+from singleflight import InMemoryLockStore, query_hash
+
+
+class RecordingLambda:
+    def __init__(self):
+        self.payloads = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.payloads.append(json.loads(Payload))
+        return {'StatusCode': 202}
+
+
+def test_query_hash_normalizes_query_but_not_filters():
+    assert query_hash('A  Dog ') == query_hash('a dog')
+    assert query_hash('a dog', {'tags': ['x']}) != query_hash('a dog')
+    assert query_hash('a dog', {'b': 1, 'a': 2}) == query_hash('a dog', {'a': 2, 'b': 1})
+
+
+def test_acquire_returns_the_owner_until_released():
+    store = InMemoryLockStore()
+    assert store.acquire('k', 'r1') is None
+    assert store.acquire('k', 'r2')['requestId'] == 'r1'
+    store.release('k', 'r2')
+    assert store.acquire('k', 'r3')['requestId'] == 'r1'
+    store.release('k', 'r1')
+    assert store.acquire('k', 'r3') is None
+
+
+def test_expired_record_is_taken_over():
+    store = InMemoryLockStore()
+    assert store.acquire('k', 'r1', ttl_seconds=-1) is None
+    assert store.acquire('k', 'r2') is None
+
+
+@pytest.fixture
+def mutation(monkeypatch):
+    lambda_client = RecordingLambda()
+    monkeypatch.setattr(invoke_search_cut_workflow, 'lambda_client', lambda_client)
+    monkeypatch.setattr(invoke_search_cut_workflow, 'lock_store', InMemoryLockStore())
+    return lambda_client
+
+
+def test_identical_search_attaches_to_the_running_execution(mutation):
+    first = invoke_search_cut_workflow.handler({'arguments': {'text': 'a dog'}}, None)
+    attached = invoke_search_cut_workflow.handler({'arguments': {'text': 'A dog'}}, None)
+    other = invoke_search_cut_workflow.handler({'arguments': {'text': 'a cat'}}, None)
+    assert attached == first != other
+    assert [payload['requestId'] for payload in mutation.payloads] == [first, other]
+    assert mutation.payloads[0]['inflightKey'] == query_hash('a dog')
+
+
+def test_workflow_stops_coalescing_when_it_waits_for_approval(mutation, monkeypatch):
+    monkeypatch.setattr(search_cut_workflow, 'lock_store', invoke_search_cut_workflow.lock_store)
+    match = {'s3_uri': 's3://media/a.mp4', 'start_time': 1.0, 'end_time': 5.0, 'score': 0.9}
+    monkeypatch.setattr(search_cut_workflow, 'embed_text', lambda client, text, dimension: [0.0] * dimension)
+    monkeypatch.setattr(search_cut_workflow, 'query_index', lambda *args, **kwargs: [{'key': 'k1'}])
+    monkeypatch.setattr(search_cut_workflow, 'extract_match', lambda vector: match)
+    monkeypatch.setattr(search_cut_workflow, 'cut_clip', lambda client, match_data, key, on_stream_ready=None: {
+        'cut_key': key, 'presigned_url': 'https://media.example/clip.mp4'})
+    monkeypatch.setattr(search_cut_workflow, 'make_previews', lambda client, match_data, prefix: {})
+    events = []
+    monkeypatch.setattr(search_cut_workflow, 'send_event',
+                        lambda request_id, status, **detail: events.append(status))
+
+    first = invoke_search_cut_workflow.handler({'arguments': {'text': 'a dog'}}, None)
+    durable = LocalDurableService()
+    durable.start(search_cut_workflow.lambda_handler, mutation.payloads[0])
+    assert events[-1] == 'WAITING_FOR_APPROVAL'
+
+    # The clip's URLs and callback belong to the callers already attached
+    later = invoke_search_cut_workflow.handler({'arguments': {'text': 'a dog'}}, None)
+    assert later != first
+    assert [payload['requestId'] for payload in mutation.payloads] == [first, later]
@@ -0,0 +1,75 @@
+"""
+Checkpoint sizes of the search/cut workflow with OffloadSerDes, run on the
+bench's in-memory durable service. Run with `python -m pytest test/py` (needs
+the packages in src/py/requirements.txt).
+"""
+import json
+
+import pytest
+from aws_durable_execution_sdk_python.lambda_service import OperationType
+
+import search_cut_workflow
+from fakes import LocalDurableService, LocalS3
+from step_results import CHECKPOINT_PREFIX, POINTER_KEY
+
+BUCKET = 'media'
+INLINE_BYTES = 512
+# Long enough that every result holding it has to be offloaded
+LONG_URL = 'https://media.example/cuts/clip.mp4?' + 'X' * 4096
+SERDES = ('search_serdes', 'cut_serdes', 'preview_serdes', 'branch_serdes', 'batch_serdes')
+
+
+@pytest.fixture
+def workflow(monkeypatch, tmp_path):
+    s3 = LocalS3(str(tmp_path))
+    monkeypatch.setattr(search_cut_workflow, 's3_client', s3)
+    for name in SERDES:
+        serdes = getattr(search_cut_workflow, name)
+        monkeypatch.setattr(serdes, 'bucket', BUCKET)
+        monkeypatch.setattr(serdes, 'inline_bytes', INLINE_BYTES)
+        monkeypatch.setattr(serdes, '_cache', {})
+    match = {'s3_uri': f's3://{BUCKET}/videos/a.mp4', 'start_time': 1.0, 'end_time': 5.0, 'score': 0.9}
+    monkeypatch.setattr(search_cut_workflow, 'embed_text', lambda client, text, dimension: [0.0] * dimension)
+    monkeypatch.setattr(search_cut_workflow, 'query_index', lambda *args, **kwargs: [{'key': 'k1'}])
+    monkeypatch.setattr(search_cut_workflow, 'extract_match', lambda vector: match)
+    monkeypatch.setattr(search_cut_workflow, 'cut_clip', lambda client, match_data, key, on_stream_ready=None: {
+        'cut_key': key, 'presigned_url': LONG_URL, 'timings': {'cut': 1.0}})
+    monkeypatch.setattr(search_cut_workflow, 'make_previews', lambda client, match_data, prefix: {
+        'thumbnail_url': LONG_URL, 'preview_url': LONG_URL, 'timings': {'preview': 1.0}})
+    events = []
+    monkeypatch.setattr(search_cut_workflow, 'send_event',
+                        lambda request_id, status, **detail: events.append(status) or detail)
+    return s3, events
+
+
+def checkpointed_results(durable: LocalDurableService, arn: str) -> list:
+    """(type, name, payload) of every step and child context result in the operation log."""
+    results = []
+    for op in durable.executions[arn]['operations'].values():
+        if op.operation_type is OperationType.STEP and op.step_details and op.step_details.result:
+            results.append((op.operation_type, op.name, op.step_details.result))
+        elif op.operation_type is OperationType.CONTEXT and op.context_details and op.context_details.result:
+            results.append((op.operation_type, op.name, op.context_details.result))
+    return results
+
+
+def test_cut_and_preview_checkpoints_are_pointers(workflow):
+    s3, events = workflow
+    durable = LocalDurableService()
+    arn = durable.start(search_cut_workflow.lambda_handler, {'query': 'a dog', 'requestId': 'r1'})
+    assert durable.status(arn) == 'PENDING' and events[-1] == 'WAITING_FOR_APPROVAL'
+
+    results = checkpointed_results(durable, arn)
+    # The cut and preview steps, both parallel branches, and the BatchResult
+    offloaded = [(kind, name) for kind, name, payload in results if POINTER_KEY in json.loads(payload)]
+    assert sum(kind is OperationType.STEP for kind, _ in offloaded) == 2
+    assert sum(kind is OperationType.CONTEXT for kind, _ in offloaded) == 3
+    assert all(len(payload) <= INLINE_BYTES for _, _, payload in results)
+    assert len(s3.list_objects_v2(Bucket=BUCKET, Prefix=CHECKPOINT_PREFIX).get('Contents', [])) == 5
+
+    # Replay after the approval reads the offloaded results back
+    search_cut_workflow.branch_serdes._cache.clear()
+    search_cut_workflow.batch_serdes._cache.clear()
+    durable.complete_callback(durable.pending_callbacks(arn)[0], json.dumps({'action': 'approve'}))
+    assert durable.status(arn) == 'SUCCEEDED'
+    assert durable.result(arn)['final_video'] == LONG_URL
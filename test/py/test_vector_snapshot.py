@@ -0,0 +1,49 @@
+"""
+Snapshots written by SnapshotWriter read back as the rows and metadata that
+went in, including rows appended after the first commit.
+"""
+import numpy as np
+
+from vector_snapshot import SnapshotWriter, VectorSnapshot, normalize_rows, write_snapshot
+
+
+def metadata(uri: str, start: float, end: float, **fields) -> dict:
+    return {'s3_uri': uri, 'segmentStartSeconds': start, 'segmentEndSeconds': end, **fields}
+
+
+def test_round_trip(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(3, 8)).astype(np.float32)
+    metadatas = [metadata('s3://media/a.mp4', 0.0, 5.0, tags=['a']),
+                 metadata('s3://media/a.mp4', 5.0, 10.0, tags=['a']),
+                 metadata('s3://media/b.mp4', 0.0, 2.5, tags=[])]
+    snapshot = write_snapshot(str(tmp_path), ['a-0', 'a-1', 'b-0'], vectors, metadatas)
+
+    reopened = VectorSnapshot(str(tmp_path))
+    assert (snapshot.count, reopened.count, reopened.dimension) == (3, 3, 8)
+    assert [reopened.key(row) for row in range(3)] == ['a-0', 'a-1', 'b-0']
+    assert [reopened.metadata(row) for row in range(3)] == metadatas
+    np.testing.assert_allclose(reopened.vectors, normalize_rows(vectors), rtol=1e-6)
+    # Identical source fields are stored once
+    assert len(reopened.sources) == 2
+
+
+def test_same_uri_with_different_fields_keeps_each_rows_metadata(tmp_path):
+    metadatas = [metadata('s3://media/a.mp4', 0.0, 5.0, tags=['a'], shotIndex=0),
+                 metadata('s3://media/a.mp4', 5.0, 9.0, tags=['b'], shotIndex=1)]
+    write_snapshot(str(tmp_path), ['a-0', 'a-1'], np.eye(2, 4, dtype=np.float32), metadatas)
+
+    snapshot = VectorSnapshot(str(tmp_path))
+    assert [snapshot.metadata(row) for row in range(2)] == metadatas
+
+
+def test_append_after_commit(tmp_path):
+    writer = SnapshotWriter(str(tmp_path))
+    writer.append(['a-0'], np.ones((1, 4)), [metadata('s3://media/a.mp4', 0.0, 5.0, shotIndex=0)])
+    first = writer.commit()
+
+    writer = SnapshotWriter(str(tmp_path))
+    writer.append(['a-1'], np.ones((1, 4)), [metadata('s3://media/a.mp4', 5.0, 9.0, shotIndex=1)])
+    snapshot = writer.commit()
+
+    assert first.count == 1 and snapshot.count == 2
+    assert [snapshot.metadata(row)['shotIndex'] for row in range(2)] == [0, 1]